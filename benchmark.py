@@ -0,0 +1,551 @@
+"""
+Benchmarks run against the built-in mesh backend (no Aspen needed).
+
+    python benchmark.py com_calls
+    python benchmark.py warm_start
+    python benchmark.py case_loading
+    python benchmark.py sessions
+    python benchmark.py replay
+    python benchmark.py hydraulics
+    python benchmark.py surrogate
+    python benchmark.py suite --output results.json
+    python benchmark.py compare baseline.json results.json
+
+The suite measures the hot paths on every case with fixed designs and writes
+its results, with the commit and library versions they were measured at, to
+a JSON file; compare reports the metrics that got worse between two of them.
+"""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import contextlib
+import argparse
+import tempfile
+import numpy as np
+import scipy
+import model as m
+import bkp
+import simulator
+import sessions
+import replay
+import initialize
+import optimize
+import evaluator
+import surrogate
+import costing
+
+CASES = ["Simulation 1.bkp", "Simulation 2.bkp", "Simulation 3.bkp", "Simulation 4.bkp", "Case Study 1.bkp", "Case Study 2.bkp"]
+# Distinct problems of the suite. Simulation 2 and 4 are Simulation 1 and 3 with
+# four tray passes and a top/bottom pressure profile, which the mesh backend
+# ignores and the model overwrites: on the mesh backend they are the same column.
+# The slsqp benchmarks have no target (simulations_to_target None) on
+# Case Study 1, whose 1.013 bar feed is below the pressure of any feed stage
+# within the optimizer bounds (P_cond >= 1.013 bar), and on Case Study 2, whose
+# shortcut start point is outside the bounds and fails to simulate.
+SUITE_CASES = ["Simulation 1.bkp", "Simulation 3.bkp", "Case Study 1.bkp", "Case Study 2.bkp"]
+# Feed stage of the suite columns. With hydraulics the pressure drop is at least
+# 0.01 bar per stage, so a feed below stage 11 would sit above the 1.12 bar feed
+# pressure of the Simulation cases and inputPresCheck could not be met.
+FEED_STAGE = 10
+
+def case_path(case):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), case)
+
+def load_model(case, **kwargs):
+    """
+    Model of a bundled case, on the mesh backend unless another is given,
+    with a distillate rate of half the feed.
+    """
+    model = m.Model(case_path(case), backend=kwargs.pop("backend", "mesh"), RR=kwargs.pop("RR", 3.0), **kwargs)
+    model.distilate_rate = 0.5 * model.getValue("\\Data\\Streams\\1\\Input\\TOTFLOW\\MIXED")
+    return model
+
+def legacy_read_outputs(model):
+    """
+    Output readback as done before snapshot.py: getLeafs on every output variable.
+    """
+    for var in ["COND_DUTY", "REB_DUTY", "B_PRES", "B_TEMP", "B_K", "PROD_LFLOW", \
+            "HYD_MWL", "HYD_MWV", "HYD_RHOL", "HYD_RHOV", "HYD_VVF", "HYD_LVF"]:
+        model.getLeafs("\\Data\\Blocks\\B1\\Output\\" + var)
+    for var in ["DIAM4", "DCLENG1", "TOT_AREA", "SIDE_AREA"]:
+        model.getLeafs("\\Data\\Blocks\\B1\\Subobjects\\Tray Sizing\\1\\Output\\" + var + "\\1")
+    for i in range(1, 4):
+        for var in ["MOLEFLMX", "MOLEFLOW", "STR_MAIN"]:
+            model.getLeafs("\\Data\\Streams\\" + str(i) + "\\Output\\" + var)
+    model.getValue("\\Data\\Streams\\1\\Input\\TOTFLOW\\MIXED")
+    model.getValue("\\Data\\Streams\\1\\Input\\PRES\\MIXED")
+    for component in model.components:
+        model.getValue("\\Data\\Streams\\1\\Input\\FLOW\\MIXED\\" + component)
+
+def com_calls(case, N=40):
+    """
+    Automation calls needed to read back the results of one evaluation, before
+    (recursive getLeafs) and after (snapshot readers), and for a full simulate()
+    once the node handle cache is warm. Input calls are counted for a repeated
+    evaluation and for a finite difference probe.
+    """
+    model = load_model(case, N=N, feed_stage=N // 2)
+    model.run()
+    model.obj = counter = simulator.CountingDocument(model.obj)
+    model.invalidate_nodes()
+    model.simulate()
+    counter.calls.clear()
+
+    legacy_read_outputs(model)
+    legacy = counter.total()
+    counter.calls.clear()
+    model.read_outputs()
+    bulk = counter.total()
+    counter.calls.clear()
+    model.simulate()
+    evaluation = counter.total()
+    evaluation_calls = dict(counter.calls)
+
+    # Finite difference probe: only RR changes
+    counter.calls.clear()
+    model.RR += 1e-8
+    model.simulate()
+    probe = counter.total() - bulk - counter.calls["Reinit"] - counter.calls["Run2"]
+    return dict(case=case, N=N, components=len(model.components), legacy_readback=legacy,
+        snapshot_readback=bulk, inputs=evaluation - bulk - evaluation_calls["Reinit"] - evaluation_calls["Run2"],
+        probe_inputs=probe, evaluation=evaluation, evaluation_calls=evaluation_calls)
+
+def warm_start(case, N=40, steps=5, eps=1.4901161193847656e-08):
+    """
+    Run2 iterations and time per evaluation along an SLSQP-like sequence of
+    steps in RR, each followed by a forward difference probe of RR, P_cond
+    and both tray efficiencies, cold and warm started.
+    """
+    results = dict()
+    for warm in [False, True]:
+        model = load_model(case, N=N, feed_stage=N // 2, warm_start=warm)
+        base_RR = model.RR
+        for step in range(steps):
+            model.RR = base_RR * (1 + 0.01 * step)
+            model.run()
+            for var in ["RR", "P_cond", "tray_eff_1", "tray_eff_2"]:
+                setattr(model, var, getattr(model, var) + eps)
+                model.run()
+                setattr(model, var, getattr(model, var) - eps)
+        summary = model.warm_start_summary()
+        runs = summary["warm"]["runs"] + summary["cold"]["runs"]
+        results["warm" if warm else "cold"] = dict(
+            runs = runs,
+            warm_runs = summary["warm"]["runs"],
+            time = (model.run_stats["warm_time"] + model.run_stats["cold_time"]) / runs,
+            iterations = (model.run_stats["warm_iterations"] + model.run_stats["cold_iterations"]) / runs,
+        )
+        model.close()
+    return results
+
+def case_loading(case, repeat=20):
+    """
+    Seconds to read the components, feed and column setup of a case from its
+    archive, and to set up the shortcut initialization from it, no simulator involved.
+    """
+    filepath = case_path(case)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        bkp.read_case(filepath)
+    archive = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        initialize.Case(filepath)
+    shortcut = (time.perf_counter() - start) / repeat
+    return dict(archive=archive, shortcut=shortcut)
+
+def session_reuse(cases, rounds=2):
+    """
+    Seconds to open and run every case in turn, rounds times, with a new
+    document per model and with documents leased from a session manager.
+    """
+    results = dict()
+    for leased in [False, True]:
+        manager = sessions.SessionManager("mesh") if leased else None
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for case in cases:
+                model = load_model(case, N=40, feed_stage=20, sessions=manager)
+                model.run()
+                model.close()
+        results["leased" if leased else "fresh"] = time.perf_counter() - start
+        if leased:
+            results["report"] = manager.report()
+            manager.close()
+    return results
+
+def python_overhead(case, N=40, steps=5, eps=1.4901161193847656e-08):
+    """
+    Python side cost of an evaluation: a sequence of steps in RR with forward
+    difference probes is recorded on the mesh backend, then replayed with
+    simulate() and calc_tac() timed separately.
+    """
+    designs = []
+    for step in range(steps):
+        RR = 3.0 * (1 + 0.01 * step)
+        designs.append(dict(RR=RR))
+        designs += [dict(RR=RR + eps), dict(RR=RR, P_cond=1.013 + eps), dict(RR=RR, tray_eff_1=0.5 + eps)]
+
+    def evaluate(model, timings):
+        for design in designs:
+            model.update_manipulated(**dict(dict(RR=3.0, P_cond=1.013, tray_eff_1=0.5), **design))
+            start = time.perf_counter()
+            model.simulate()
+            middle = time.perf_counter()
+            model.calc_tac()
+            timings["simulate"] += middle - start
+            timings["calc_tac"] += time.perf_counter() - middle
+
+    filepath = os.path.join(tempfile.mkdtemp(), "benchmark.replay")
+    recorded, replayed = dict(simulate=0.0, calc_tac=0.0), dict(simulate=0.0, calc_tac=0.0)
+    model = load_model(case, N=N, feed_stage=N // 2, backend=replay.RecordingBackend("mesh", filepath))
+    evaluate(model, recorded)
+    model.close()
+    size = os.path.getsize(filepath)
+    backend = replay.ReplayBackend(filepath)
+    model = load_model(case, N=N, feed_stage=N // 2, backend=backend)
+    evaluate(model, replayed)
+    model.close()
+    os.remove(filepath)
+    run_time = sum(run["run_time"] for run in backend.recording.runs.values())
+    return dict(evaluations=len(designs), size=size, recorded=recorded["simulate"] / len(designs), run=run_time / len(designs),
+        simulate=replayed["simulate"] / len(designs), calc_tac=replayed["calc_tac"] / len(designs))
+
+def hydraulic_constraints(case, tray_type="SIEVE", N=40, repeat=200):
+    """
+    Seconds per SLSQP iteration spent in the hydraulic constraint callbacks:
+    each is called at the iterate and at one finite difference probe per
+    design variable, all on the same model state. Timed with the hydraulics
+    engine memoizing the state, unmemoized (its state recomputed for every
+    callback), and memoizing a check of every stage. The unmemoized time is a
+    lower bound of the func_* chains hydraulics.py replaced, which recomputed
+    shared terms several times within a callback as well.
+    """
+    model = load_model(case, N=N, feed_stage=N // 2, hydraulics=True, tray_type=tray_type)
+    model.run()
+    names = ["weepingCheck", "downcomerResidenceTimeCheck", "entrainmentCheck", "entrainmentFracCheck"] if tray_type == "SIEVE" else \
+        ["entrainmentCheck", "entrainmentFracCheck", "slotOpeningCheck", "slotSealLBCheck", "slotSealUBCheck", "downcomerLiquidBackupCheck", "downcomerResidenceTimeCheck"]
+    calls = 8 # Iterate and 7 probes
+    results = dict(callbacks=2 * len(names) * calls)
+    for mode in ["unmemoized", "memoized", "stages"]:
+        optimizer = optimize.Optimizer(model, stage_hydraulics=mode == "stages")
+        constraints = [getattr(optimizer, name + section) for section in ["Top", "Bottom"] for name in names]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            model.version += 1
+            for _ in range(calls):
+                for constraint in constraints:
+                    if mode == "unmemoized":
+                        optimizer.hydraulics_engine.key = None
+                    constraint(None)
+        results[mode] = (time.perf_counter() - start) / repeat
+    model.close()
+    return results
+
+def constraints(optimizer, x):
+    """
+    Constraint values of the design optimizer simulated last, None when it
+    failed or they cannot be computed from its results.
+    """
+    if optimizer.failed:
+        return None
+    try:
+        return optimizer.constraint_values(x)
+    except evaluator.CONSTRAINT_ERRORS:
+        return None
+
+def surrogate_search(case, hydraulics=False, N=40, max_simulations=60, tolerance=0.01):
+    """
+    Simulations needed by SLSQP and by the surrogate trust region search to
+    reach the best design SLSQP finds. Designs are compared on the merit of
+    surrogate.SurrogateSearch, TAC plus the penalized constraint violation,
+    and the target is within tolerance of the best SLSQP merit.
+    Measured on Simulation 1: 43 SLSQP and 6 surrogate simulations to the
+    target without hydraulics, 58 and 7 with them (7.2 and 8.3 times fewer).
+    No target when no design SLSQP simulates is feasible or within the penalty.
+    """
+    results = dict()
+    for method in ["slsqp", "surrogate"]:
+        model = load_model(case, N=N, feed_stage=N // 2, hydraulics=hydraulics)
+        model.run()
+        optimizer = optimize.Optimizer(model, opt_tolerance=1e-3, purityLB=0.95, recoveryLB=0.95)
+        search = surrogate.SurrogateSearch(optimizer, max_simulations=max_simulations)
+        merits, objective = [], optimizer.objective
+        def traced(x):
+            f = objective(x)
+            values = constraints(optimizer, x)
+            merits.append(search.merit([f] + list(values.values())) if values is not None else np.inf)
+            return f
+        optimizer.objective = traced
+        with contextlib.redirect_stdout(io.StringIO()):
+            optimizer.optimize() if method == "slsqp" else search.optimize()
+        model.close()
+        best = np.minimum.accumulate(merits)
+        results[method] = dict(simulations=len(merits), best=best)
+    target = results["slsqp"]["best"][-1] + tolerance * abs(results["slsqp"]["best"][-1])
+    for result in results.values():
+        reached = np.flatnonzero(result["best"] <= target) if np.isfinite(target) else []
+        result["to_target"] = int(reached[0]) + 1 if len(reached) else None
+        result["merit"] = result["best"][-1]
+    return results
+
+def case_stages(case):
+    # Number of stages of the column in the case archive
+    return bkp.read_case(case_path(case))["N"]
+
+def model_runs(case, N=40, hydraulics=False, evaluations=20, repeat=3, feed_stage=None):
+    """
+    Evaluations per second of Model.run (simulation and TAC) over a fixed
+    sequence of designs stepping RR and the tray efficiencies, best of repeat.
+    """
+    designs = [dict(RR=3.0 * (1 + 0.01 * i), tray_eff_1=0.5 + 0.005 * i, tray_eff_2=0.5 - 0.005 * i) for i in range(evaluations)]
+    rates = []
+    for _ in range(repeat):
+        model = load_model(case, N=N, feed_stage=feed_stage or N // 2, hydraulics=hydraulics)
+        model.run()
+        start = time.perf_counter()
+        for design in designs:
+            model.update_manipulated(**design)
+            model.run()
+        rates.append(evaluations / (time.perf_counter() - start))
+        model.close()
+    return dict(evaluations_per_second=max(rates))
+
+def constraint_sweep(case, N=40, hydraulics=True, repeat=200, feed_stage=None):
+    """
+    Seconds per sweep of every optimizer constraint at one simulated design,
+    the hydraulic state recomputed for every sweep as after a new simulation.
+    """
+    model = load_model(case, N=N, feed_stage=feed_stage or N // 2, hydraulics=hydraulics)
+    model.run()
+    optimizer = optimize.Optimizer(model, purityLB=0.95, recoveryLB=0.95)
+    with contextlib.redirect_stdout(io.StringIO()):
+        x0, constraints, bounds = optimizer.problem()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.version += 1
+        optimizer.constraint_values(x0)
+    sweep = (time.perf_counter() - start) / repeat
+    model.close()
+    return dict(constraints=len(constraints), sweep_seconds=sweep)
+
+def time_to_tac(case, hydraulics=False, N=40, tolerance=0.01, feasibility_tol=1e-3, feed_stage=None):
+    """
+    Wall time and simulations SLSQP takes to converge, and to first reach a
+    feasible design within tolerance of the best feasible TAC it finds.
+    Evaluations are timed from the start of optimize(), setup included.
+    :param feasibility_tol: largest violation of a constraint of a feasible design, the SLSQP
+        tolerance: SLSQP meets the constraints to about its tolerance
+    """
+    model = load_model(case, N=N, feed_stage=feed_stage or N // 2, hydraulics=hydraulics)
+    model.run()
+    optimizer = optimize.Optimizer(model, opt_tolerance=1e-3, purityLB=0.95, recoveryLB=0.95)
+    trace, objective = [], optimizer.objective
+    def traced(x):
+        f = objective(x)
+        values = constraints(optimizer, x)
+        feasible = values is not None and all(value >= -feasibility_tol for value in values.values())
+        trace.append((time.perf_counter() - start, f if feasible else np.inf))
+        return f
+    optimizer.objective = traced
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = optimizer.optimize()
+    wall = time.perf_counter() - start
+    model.close()
+    times, values = np.array(trace).T if trace else (np.zeros(0), np.zeros(0))
+    best = np.minimum.accumulate(values)
+    target = best[-1] + tolerance * abs(best[-1]) if len(best) else np.inf
+    reached = np.flatnonzero(best <= target) if np.isfinite(target) else []
+    return dict(
+        converged = bool(result.success),
+        TAC = float(result.fun * 1000000),
+        simulations = optimizer.evaluator.stats["simulations"],
+        seconds = wall,
+        simulations_to_target = int(reached[0]) + 1 if len(reached) else None,
+        seconds_to_target = float(times[reached[0]]) if len(reached) else None,
+    )
+
+def shortcut(case, repeat=20):
+    """
+    Seconds per call of each shortcut estimate of initialize.py on the case
+    read from its archive, best of repeat.
+    """
+    feed = initialize.Case(case_path(case))
+    results = dict()
+    for name in ["min_N", "min_RR", "actual_N", "feed_stage", "distilate_rate"]:
+        function = getattr(initialize, name)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(feed)
+            times.append(time.perf_counter() - start)
+        results[name + "_seconds"] = min(times)
+    return results
+
+def repricing(case, N=40, designs=1000, scenarios=100, repeat=3, feed_stage=None):
+    """
+    Seconds to re-price the results of a run, copied designs times, under
+    scenarios utility price and payback scenarios with costing.tac, best of repeat.
+    """
+    model = load_model(case, N=N, feed_stage=feed_stage or N // 2)
+    model.run()
+    stored = costing.designs([model.export_results()] * designs, dict((name, getattr(model, name)) for name in costing.SETTINGS))
+    prices = costing.scenarios(lp_steam=np.linspace(6.0, 10.0, scenarios), n_years=np.linspace(2, 10, scenarios))
+    model.close()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        costing.tac(stored, **prices)
+        times.append(time.perf_counter() - start)
+    return dict(designs=designs, scenarios=scenarios, seconds=min(times))
+
+def environment():
+    """
+    Commit and versions the results were measured at.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return dict(commit=commit, dirty=dirty, time=time.strftime("%Y-%m-%dT%H:%M:%S"), python=platform.python_version(),
+        numpy=np.__version__, scipy=scipy.__version__, platform=platform.platform(), backend="mesh")
+
+def suite(cases, N=None, feed_stage=FEED_STAGE, repeat=3):
+    """
+    Every suite benchmark on every case, without and with hydraulics.
+    :param N: number of stages of every column, the number in each case archive by default
+    :param feed_stage: feed stage of every column, see FEED_STAGE
+    :return: dict with the environment, the stages of each case and, per case and benchmark,
+        a dict of metrics, or of the error that benchmark raised
+    """
+    benchmarks = dict(
+        model_run = lambda case, N: model_runs(case, N, repeat=repeat, feed_stage=feed_stage),
+        model_run_hydraulics = lambda case, N: model_runs(case, N, hydraulics=True, repeat=repeat, feed_stage=feed_stage),
+        constraint_sweep = lambda case, N: constraint_sweep(case, N, hydraulics=False, feed_stage=feed_stage),
+        constraint_sweep_hydraulics = lambda case, N: constraint_sweep(case, N, feed_stage=feed_stage),
+        slsqp = lambda case, N: time_to_tac(case, N=N, feed_stage=feed_stage),
+        slsqp_hydraulics = lambda case, N: time_to_tac(case, hydraulics=True, N=N, feed_stage=feed_stage),
+        shortcut = lambda case, N: shortcut(case),
+        repricing = lambda case, N: repricing(case, N, repeat=repeat, feed_stage=feed_stage),
+    )
+    results = dict(environment=environment(), stages=dict(), feed_stage=feed_stage, cases=dict())
+    for case in cases:
+        print ("%s ..." % case, file=sys.stderr)
+        results["stages"][case] = N if N is not None else case_stages(case)
+        results["cases"][case] = dict()
+        for name, benchmark in benchmarks.items():
+            try:
+                results["cases"][case][name] = benchmark(case, results["stages"][case])
+            except Exception as e:
+                print ("%s %s: %s" % (case, name, e), file=sys.stderr)
+                results["cases"][case][name] = dict(error="%s: %s" % (type(e).__name__, e))
+    return results
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Metrics present in both results that changed by more than threshold,
+    relative to baseline. Rates are better higher, times and simulation
+    counts lower.
+    :return: list of (case, benchmark, metric, baseline value, current value, relative change, regression)
+    """
+    changes = []
+    for case, benchmarks in current["cases"].items():
+        for benchmark, metrics in benchmarks.items():
+            before = baseline["cases"].get(case, dict()).get(benchmark, dict())
+            for metric, value in metrics.items():
+                old = before.get(metric)
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                    continue
+                change = (value - old) / abs(old)
+                if abs(change) > threshold:
+                    regression = change < 0 if metric.endswith("per_second") else change > 0
+                    changes.append((case, benchmark, metric, old, value, change, regression))
+    return changes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=["com_calls", "warm_start", "case_loading", "sessions", "replay", "hydraulics", "surrogate", "suite", "compare"])
+    parser.add_argument("files", nargs="*", help="compare: baseline and current results")
+    parser.add_argument("--cases", nargs="+", help="cases benchmarked, default all of them (the distinct ones for the suite)")
+    parser.add_argument("--output", help="suite: results file, standard output by default")
+    parser.add_argument("--repeat", type=int, default=3, help="suite: repetitions of the timed benchmarks")
+    parser.add_argument("--threshold", type=float, default=0.1, help="compare: relative change reported")
+    args = parser.parse_args()
+    args.cases = args.cases or (SUITE_CASES if args.benchmark == "suite" else CASES)
+
+    if args.benchmark == "com_calls":
+        print ('{0:18s}   {1:>4s}   {2:>10s}   {3:>15s}   {4:>15s}   {5:>12s}   {6:>12s}   {7:>10s}'.format('Case', 'N', 'Components', 'getLeafs calls', 'Snapshot calls', 'Input calls', 'Probe calls', 'Evaluation'))
+        for case in args.cases:
+            result = com_calls(case)
+            print ('{0:18s}   {1:4d}   {2:10d}   {3:15d}   {4:15d}   {5:12d}   {6:12d}   {7:10d}'.format(case, result["N"], result["components"], result["legacy_readback"], result["snapshot_readback"], result["inputs"], result["probe_inputs"], result["evaluation"]))
+
+    elif args.benchmark == "warm_start":
+        print ('{0:18s}   {1:>5s}   {2:>10s}   {3:>15s}   {4:>15s}   {5:>15s}   {6:>15s}'.format('Case', 'Runs', 'Warm runs', 'Cold iter/run', 'Warm iter/run', 'Cold ms/run', 'Warm ms/run'))
+        for case in args.cases:
+            result = warm_start(case)
+            print ('{0:18s}   {1:5d}   {2:10d}   {3:15.2f}   {4:15.2f}   {5:15.2f}   {6:15.2f}'.format(case, result["cold"]["runs"], result["warm"]["warm_runs"], result["cold"]["iterations"], result["warm"]["iterations"], 1000 * result["cold"]["time"], 1000 * result["warm"]["time"]))
+
+    elif args.benchmark == "case_loading":
+        print ('{0:18s}   {1:>15s}   {2:>15s}'.format('Case', 'Archive ms', 'Shortcut ms'))
+        for case in args.cases:
+            result = case_loading(case)
+            print ('{0:18s}   {1:15.2f}   {2:15.2f}'.format(case, 1000 * result["archive"], 1000 * result["shortcut"]))
+
+    elif args.benchmark == "sessions":
+        result = session_reuse(args.cases)
+        report = result["report"]
+        print ('Fresh documents: {0:.3f} s   Leased sessions: {1:.3f} s'.format(result["fresh"], result["leased"]))
+        print ('Sessions: {0:d}   Leases: {1:d}   Startup: {2:.2f} ms   Case load: {3:.2f} ms   Startup time saved: {4:.3f} s'.format(report["sessions"], report["leases"], 1000 * report["startup_time"], 1000 * report["load_time"], report["saved_time"]))
+
+    elif args.benchmark == "replay":
+        print ('{0:18s}   {1:>11s}   {2:>12s}   {3:>15s}   {4:>12s}   {5:>15s}   {6:>15s}'.format('Case', 'Evaluations', 'Recording kB', 'Recorded ms/ev', 'Run2 ms/ev', 'simulate ms/ev', 'calc_tac ms/ev'))
+        for case in args.cases:
+            result = python_overhead(case)
+            print ('{0:18s}   {1:11d}   {2:12.1f}   {3:15.2f}   {4:12.2f}   {5:15.2f}   {6:15.2f}'.format(case, result["evaluations"], result["size"] / 1000, 1000 * result["recorded"], 1000 * result["run"], 1000 * result["simulate"], 1000 * result["calc_tac"]))
+
+    elif args.benchmark == "hydraulics":
+        print ('{0:18s}   {1:>4s}   {2:>9s}   {3:>9s}   {4:>15s}   {5:>15s}   {6:>15s}'.format('Case', 'N', 'Tray type', 'Callbacks', 'Unmemoized ms', 'Memoized ms', 'All stages ms'))
+        for case in args.cases:
+            for N in [40, 101]:
+                for tray_type in ["SIEVE", "CAPS"]:
+                    result = hydraulic_constraints(case, tray_type, N)
+                    print ('{0:18s}   {1:4d}   {2:>9s}   {3:9d}   {4:15.3f}   {5:15.3f}   {6:15.3f}'.format(case, N, tray_type, result["callbacks"], 1000 * result["unmemoized"], 1000 * result["memoized"], 1000 * result["stages"]))
+
+    elif args.benchmark == "surrogate":
+        print ('{0:18s}   {1:>10s}   {2:>15s}   {3:>15s}   {4:>12s}   {5:>18s}   {6:>18s}   {7:>15s}'.format('Case', 'Hydraulics', 'SLSQP sims', 'SLSQP to target', 'SLSQP merit', 'Surrogate sims', 'Surrogate to target', 'Surrogate merit'))
+        for case in args.cases:
+            for hydraulics in [False, True]:
+                result = surrogate_search(case, hydraulics)
+                slsqp, search = result["slsqp"], result["surrogate"]
+                print ('{0:18s}   {1:>10s}   {2:15d}   {3:>15s}   {4:12.6f}   {5:18d}   {6:>18s}   {7:15.6f}'.format(case, str(hydraulics), slsqp["simulations"], str(slsqp["to_target"]), slsqp["merit"], search["simulations"], str(search["to_target"]), search["merit"]))
+
+    elif args.benchmark == "suite":
+        results = suite(args.cases, repeat=args.repeat)
+        text = json.dumps(results, indent=1)
+        if args.output is None:
+            print (text)
+        else:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+
+    elif args.benchmark == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs a baseline and a current results file")
+        with open(args.files[0]) as f:
+            baseline = json.load(f)
+        with open(args.files[1]) as f:
+            current = json.load(f)
+        print ("Baseline: %s   Current: %s" % (baseline["environment"]["commit"], current["environment"]["commit"]))
+        changes = compare(baseline, current, args.threshold)
+        print ('{0:18s}   {1:28s}   {2:24s}   {3:>12s}   {4:>12s}   {5:>8s}'.format('Case', 'Benchmark', 'Metric', 'Baseline', 'Current', 'Change'))
+        for case, benchmark, metric, old, value, change, regression in changes:
+            print ('{0:18s}   {1:28s}   {2:24s}   {3:12.6g}   {4:12.6g}   {5:+7.1f}%{6:s}'.format(case, benchmark, metric, old, value, 100 * change, "   REGRESSION" if regression else ""))
+        sys.exit(1 if any(change[-1] for change in changes) else 0)
@@ -0,0 +1,183 @@
+"""
+Reader for Aspen Plus backup (.bkp) archives.
+
+The input part of an archive is plain text: sections opened by a header
+between "?" markers (e.g. "? BLOCK RADFRAC B1 ?"), made of paragraphs
+separated by "\\" whose records are separated by "/" and hold KEY = VALUE
+pairs. Lines are wrapped at a fixed width, also in the middle of a token.
+
+The file is tokenized line by line and parsing stops as soon as the wanted
+sections are read, so the case setup is available in milliseconds without
+starting a simulator.
+"""
+import re
+
+TOKEN = re.compile(r"\"[^\"]*\"|[^\s\"]+")
+ATTRIBUTE = re.compile(r"<-?\d+>$") # Unit and display attributes following a value
+END = "GRAPHICS_BACKUP" # Start of the flowsheet drawing, nothing of interest follows
+
+# Sections read_case needs
+CASE_SECTIONS = ("COMPONENTS MAIN", "STREAM MATERIAL 1", "BLOCK RADFRAC B1")
+
+def tokens(filepath):
+    """
+    Tokens of the input part of an archive, quotes kept. Wrapped lines are
+    joined as they are read. The version and library preamble before the
+    first section is skipped.
+    """
+    carry = None
+    with open(filepath) as f:
+        for line in f:
+            if carry is None:
+                if not line.startswith("? "):
+                    continue
+                carry = ""
+            text = carry + line.rstrip("\r\n")
+            end = text.find(END)
+            if end >= 0:
+                yield from (match.group() for match in TOKEN.finditer(text[:end]))
+                return
+            # Keep the last token, or an open quoted string, until the next line
+            if text.count('"') % 2:
+                cut = text.rindex('"')
+            elif not text or text[-1] in ' "':
+                cut = len(text)
+            else:
+                cut = max(text.rfind(" "), text.rfind('"')) + 1
+            yield from (match.group() for match in TOKEN.finditer(text[:cut]))
+            carry = text[cut:]
+    yield from (match.group() for match in TOKEN.finditer(carry or ""))
+
+def unquote(token):
+    return token[1:-1] if token.startswith('"') else token
+
+def parse_records(body):
+    """
+    Paragraphs of a section.
+    :param body: tokens of the section
+    :return: list of (paragraph name, list of record dicts)
+    """
+    paragraphs = []
+    for paragraph in split(body, "\\"):
+        if not paragraph:
+            continue
+        name = None
+        if len(paragraph) < 2 or paragraph[1] != "=":
+            name = unquote(paragraph[0])
+            paragraph = paragraph[1:]
+        records = []
+        for record in split(paragraph, "/"):
+            values = dict()
+            i = 0
+            while i < len(record):
+                if i + 2 < len(record) and record[i + 1] == "=":
+                    key = unquote(record[i])
+                    if record[i + 2] == "(":
+                        close = record.index(")", i + 2)
+                        values[key] = [unquote(t) for t in record[i + 3:close]]
+                        i = close + 1
+                    else:
+                        values[key] = unquote(record[i + 2])
+                        i += 3
+                else:
+                    i += 1
+            records.append(values)
+        paragraphs.append((name, records))
+    return paragraphs
+
+def split(tokens, separator):
+    parts = [[]]
+    for token in tokens:
+        if token == separator:
+            parts.append([])
+        else:
+            parts[-1].append(token)
+    return parts
+
+def read_sections(filepath, wanted=None):
+    """
+    Parse the sections of an archive.
+    :param wanted: section headers to read, e.g. ("BLOCK RADFRAC B1",); None for all of them.
+        Reading stops once all wanted sections are parsed.
+    :return: dict of header -> list of (paragraph name, list of record dicts)
+    """
+    remaining = set(wanted) if wanted is not None else None
+    sections = dict()
+    header, body = None, None
+    in_header = in_comment = False
+    for token in tokens(filepath):
+        if token == "?":
+            if in_header:
+                header = " ".join(body)
+                body = []
+            else:
+                if header is not None and (remaining is None or header in remaining):
+                    sections[header] = parse_records(body)
+                    if remaining is not None:
+                        remaining.discard(header)
+                        if not remaining:
+                            return sections
+                body = []
+            in_header = not in_header
+        elif token == ";":
+            # Units set and options annotations between semicolons
+            in_comment = not in_comment
+        elif body is not None and not in_comment and not ATTRIBUTE.match(token):
+            body.append(unquote(token) if in_header else token)
+    if header is not None and (remaining is None or header in remaining):
+        sections[header] = parse_records(body)
+    return sections
+
+def records(section, paragraph):
+    """
+    Records of the named paragraph of a parsed section, empty if it is missing.
+    """
+    return [record for name, records in section for record in records if name == paragraph]
+
+def value(section, paragraph, key, default=None):
+    """
+    First value of key in the named paragraph of a parsed section.
+    """
+    for record in records(section, paragraph):
+        if key in record:
+            return record[key]
+    return default
+
+def read_case(filepath):
+    """
+    Components, feed and column setup of a case with a single RadFrac block B1 fed by stream 1.
+    Temperatures are in K, pressures in bar, flows in kmol/hr (METCBAR units).
+    """
+    sections = read_sections(filepath, CASE_SECTIONS)
+    missing = [header for header in CASE_SECTIONS if header not in sections]
+    if missing:
+        raise ValueError("%s has no %s section" % (filepath, ", ".join(missing)))
+    components, stream, block = (sections[header] for header in CASE_SECTIONS)
+
+    cids = [record["CID"] for record in records(components, "COMPONENTS")]
+    dbnames = dict((record["CID"], record["DBNAME1"]) for record in records(components, "COMPONENTS") if "DBNAME1" in record)
+    flows = dict((record["CID"], float(record["FLOW"])) for record in records(stream, "MOLE-FLOW"))
+
+    N = int(value(block, "PARAM", "NSTAGE"))
+    feed_stage = int(value(block, "FEEDS", "FEED-STAGE"))
+    return dict(
+        components=cids,
+        dbnames=dbnames,
+        feed_flow=[flows.get(c, 0.0) for c in cids],
+        feed_T=float(value(stream, "SUBSTREAM", "TEMP")),
+        feed_P=float(value(stream, "SUBSTREAM", "PRES")),
+        N=N,
+        feed_stage=feed_stage,
+        P_cond=float(value(block, "P-SPEC2", "PRES1")),
+        D=float(value(block, "COL-SPECS", "BASIS-D")),
+        RR=float(value(block, "COL-SPECS", "BASIS-RR")),
+        stage_eff=dict((int(r["SEFF-STAGE"]), float(r["STAGE-EFF"])) for r in records(block, "STAGE-EFF")),
+        pdrop_sec=[(int(r["PRES-STAGE1"]), int(r["PRES-STAGE2"]), float(r["PDROP-SEC"])) for r in records(block, "PDROP-SEC")] or \
+            [(2, feed_stage - 1, 0.0), (feed_stage, N - 1, 0.0)],
+        view_pres=value(block, "PARAM", "VIEW-PRES", "TOP/BOTTOM"),
+        tray_type=value(block, "TRAY-SIZE", "TS-TRAYTYPE", "SIEVE"),
+        num_pass=int(value(block, "TRAY-SIZE", "TS-NPASS", 1)),
+        tray_spacing=float(value(block, "TRAY-SIZE", "TS-TSPACE", 0.6096)),
+        ts_stage1=int(value(block, "TRAY-SIZE", "TS-STAGE1", 2)),
+        ts_stage2=int(value(block, "TRAY-SIZE", "TS-STAGE2", N - 1)),
+    )
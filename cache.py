@@ -0,0 +1,138 @@
+"""
+Evaluation cache for Optimizer.objective.
+
+Results are keyed on the case file contents, the backend and every model input
+after the design vector has been applied, quantized so that the same design
+reached through different float round-off hits the same entry. Entries hold the
+full model results (see model.Model.export_results), so the constraints and
+calc_tac work on a hit exactly as after a simulation.
+
+Two tiers: an in-memory LRU and an SQLite file that survives restarts and can
+be shared by several processes on the same machine. The on-disk tier is only
+used when a file is given.
+
+Results are stored pickled, and reading an entry unpickles it: a cache file
+can run arbitrary code when it is read. Only open cache files written by your
+own runs, never one received or copied from elsewhere.
+"""
+import os
+import pickle
+import sqlite3
+import hashlib
+import collections
+import numpy as np
+
+# Continuous inputs of a run, in key order
+CONTINUOUS = ("P_cond", "P_drop_1", "P_drop_2", "RR", "distilate_rate", "tray_spacing", "tray_eff_1", "tray_eff_2")
+# Resolution of each: 1e-10 of its usual size, the mesh solver tolerance (squared residual below 1e-20), so that
+# closer inputs give the same results to solver accuracy, while finite difference probes (1.5e-8) get entries of their own
+QUANTA = dict(P_cond=1e-10, P_drop_1=1e-12, P_drop_2=1e-12, RR=1e-10, distilate_rate=1e-9,
+    tray_spacing=1e-10, tray_eff_1=1e-10, tray_eff_2=1e-10)
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def design(model):
+    """
+    Inputs that determine the results of a run of model, in a fixed order.
+    """
+    continuous = np.array([getattr(model, name) for name in CONTINUOUS], dtype=float)
+    discrete = (int(model.N), int(model.feed_stage), model.tray_type, int(model.num_pass), bool(model.hydraulics), int(model.n_years),
+        model.main_component)
+    return discrete, continuous
+
+class EvaluationCache:
+    def __init__(self, filepath: str = None, maxsize: int = 4096, quanta: dict = None):
+        """
+        :param filepath: SQLite file of the on-disk tier, None for memory only; it is trusted, see above
+        :param maxsize: number of entries kept in memory
+        :param quanta: resolution of continuous inputs, to change from QUANTA
+        """
+        self.filepath = filepath
+        self.maxsize = maxsize
+        self.quanta = np.array([dict(QUANTA, **(quanta or dict()))[name] for name in CONTINUOUS])
+        self.memory = collections.OrderedDict()
+        self.case_hashes = dict()
+        self.stats = collections.Counter()
+        self.db = None
+        if filepath is not None:
+            self.db = sqlite3.connect(filepath, timeout=60)
+            self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, results BLOB)")
+            self.db.commit()
+
+    def key(self, model):
+        if model.filepath not in self.case_hashes:
+            self.case_hashes[model.filepath] = file_hash(model.filepath)
+        discrete, continuous = design(model)
+        quantized = tuple(int(v) for v in np.rint(continuous / self.quanta))
+        backend = getattr(model.backend, "name", model.backend)
+        return hashlib.sha256(repr((self.case_hashes[model.filepath], backend, discrete, quantized)).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        :return: stored results, None on a miss
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return self.memory[key]
+        if self.db is not None:
+            row = self.db.execute("SELECT results FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.stats["disk_hits"] += 1
+                results = pickle.loads(row[0])
+                self.remember(key, results)
+                return results
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key, results):
+        self.remember(key, results)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (key, pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL)))
+            self.db.commit()
+
+    def remember(self, key, results):
+        self.memory[key] = results
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def load(self, model):
+        """
+        Load the cached results of the current model inputs into model.
+        :return: True on a hit
+        """
+        results = self.get(self.key(model))
+        if results is None:
+            return False
+        model.load_results(results)
+        return True
+
+    def store(self, model):
+        self.put(self.key(model), model.export_results())
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def __len__(self):
+        if self.db is not None:
+            return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return len(self.memory)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+def default_path(filepath):
+    """
+    Cache file stored next to a case file, e.g. "Simulation 3.bkp" -> "Simulation 3.cache.sqlite".
+    """
+    return os.path.splitext(filepath)[0] + ".cache.sqlite"
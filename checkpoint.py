@@ -0,0 +1,109 @@
+"""
+Checkpoints of an optimization run, to resume it after a crash.
+
+Every few SLSQP iterations the iterate, the iteration and evaluation counters
+and the history run id are written to a pickle, replacing the previous
+checkpoint atomically. Results of the evaluations are kept by the evaluation
+cache: an on-disk cache persists them by itself, the entries of a memory-only
+cache are saved in the checkpoint. A resumed run restarts SLSQP from the
+checkpointed iterate, and the designs simulated before the crash come back
+from the cache instead of the simulator:
+
+    optimizer = optimize.Optimizer(model, cache=cache.EvaluationCache(path), checkpoint=checkpoint.Checkpoint("run.ckpt"))
+    optimizer.run(resume=True) # starts afresh when there is no checkpoint yet
+
+SLSQP restarts with a fresh Hessian estimate, so a resumed run does not retrace
+the steps the uninterrupted run would have taken.
+
+The checkpoint of a finished run keeps its result, and resuming it returns
+that result instead of optimizing again. Only SLSQP runs are checkpointed: the
+surrogate, integer, multistart and pareto searches start afresh every time.
+"""
+import os
+import time
+import pickle
+
+VERSION = 2
+
+class Checkpoint:
+    def __init__(self, filepath: str, every: int = 1):
+        """
+        :param filepath: checkpoint file
+        :param every: number of SLSQP iterations between checkpoints
+        """
+        self.filepath = filepath
+        self.every = every
+        self.saves = 0
+
+    def save(self, optimizer, x, result=None):
+        """
+        Write the state of optimizer at iterate x.
+        :param result: scipy OptimizeResult of the run, once it has finished
+        """
+        model = optimizer.model
+        state = dict(
+            version = VERSION,
+            case = os.path.basename(model.filepath),
+            hydraulics = model.hydraulics,
+            x = [float(v) for v in x],
+            N = model.N,
+            feed_stage = model.feed_stage,
+            opt_iter = optimizer.opt_iter,
+            func_iter = optimizer.func_iter,
+            evaluations = optimizer.evaluations,
+            time = optimizer.time,
+            elapsed = time.time() - optimizer.start_time,
+            run_id = optimizer.run_id,
+            finished = result is not None,
+            result = None,
+            cache = None,
+        )
+        if result is not None:
+            state["result"] = dict(fun=float(result.fun), success=bool(result.success), status=int(result.status),
+                message=str(result.message), nit=int(result.nit), nfev=int(result.nfev))
+        if optimizer.cache is not None and optimizer.cache.db is None:
+            state["cache"] = dict(optimizer.cache.memory)
+        if optimizer.history is not None:
+            optimizer.history.flush()
+        temporary = self.filepath + ".tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, self.filepath)
+        self.saves += 1
+
+    def load(self):
+        """
+        :return: the saved state, None when there is no checkpoint
+        """
+        if not os.path.exists(self.filepath):
+            return None
+        with open(self.filepath, "rb") as f:
+            state = pickle.load(f)
+        if state["version"] != VERSION:
+            raise ValueError("%s is a version %s checkpoint, expected %d" % (self.filepath, state["version"], VERSION))
+        return state
+
+    def restore(self, optimizer):
+        """
+        Put the counters, stage numbers and cache entries of the checkpoint back into optimizer.
+        :return: the saved state, whose "x" is the checkpointed iterate and "result" the
+            result of a finished run, None when there is no checkpoint
+        """
+        state = self.load()
+        if state is None:
+            return None
+        model = optimizer.model
+        if state["case"] != os.path.basename(model.filepath) or state["hydraulics"] != model.hydraulics:
+            raise ValueError("%s is a checkpoint of %s (hydraulics %s), not of %s (hydraulics %s)" % (self.filepath,
+                state["case"], state["hydraulics"], os.path.basename(model.filepath), model.hydraulics))
+        model.N, model.feed_stage = state["N"], state["feed_stage"]
+        optimizer.opt_iter = state["opt_iter"]
+        optimizer.func_iter = state["func_iter"]
+        optimizer.evaluations = state["evaluations"]
+        optimizer.time = state["time"]
+        optimizer.start_time = time.time() - state["elapsed"]
+        optimizer.run_id = state["run_id"]
+        if state["cache"] is not None and optimizer.cache is not None:
+            for key, results in state["cache"].items():
+                optimizer.cache.remember(key, results)
+        return state
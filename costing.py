@@ -0,0 +1,156 @@
+"""
+Vectorized costing: TAC of many designs under many economic scenarios from
+stored simulation outputs, without running the simulator.
+
+TAC depends on a simulation only through the condenser and reboiler duties,
+the four temperatures at the ends of the column and the column diameter
+(COSTING_INPUTS); the stage count, tray spacing, efficiencies and tray type are
+inputs. tac() takes every one of them as an array and every economic parameter
+(ECONOMICS: payback years, utility prices, U values and the capital cost
+correlations) as a scalar or array, and broadcasts them against each other:
+
+    designs = costing.designs(results)                        # arrays over D stored runs
+    prices = costing.scenarios(lp_steam=np.linspace(6, 10, 50), n_years=[3] * 50)
+    costs = costing.tac(designs, **prices)                    # costs["TAC"].shape == (50, D)
+
+Model.calc_tac calls tac() for a single design with the default economics,
+so re-pricing stored runs with the defaults gives the TAC of the simulation
+(to the last bit for a single design, within rounding for arrays).
+"""
+import numpy as np
+import conversions
+
+# Economic parameters and their defaults
+ECONOMICS = dict(
+    n_years = 3, # Payback period
+    cooling_water = 0.354, # USD/GJ
+    lp_steam = 7.78, # USD/GJ, at 160 C
+    hp_steam = 9.88, # USD/GJ, at 254 C
+    U_cond = 0.852, # kW/m2/K
+    U_reb = 0.568, # kW/m2/K
+    hx_coefficient = 7296.0, # Heat exchanger cost per area ** hx_exponent
+    hx_exponent = 0.65,
+    column_coefficient = 17640.0, # Column shell cost per diameter ** 1.066 per height ** 0.802
+    column_diameter_exponent = 1.066,
+    column_height_exponent = 0.802,
+    sieve_tray = (130.0, 440.0, 1.8), # Tray cost: base + coefficient * diameter ** exponent per actual tray
+    caps_tray = (340.0, 640.0, 1.9),
+)
+
+# Simulation outputs costing needs, see inputs
+COSTING_INPUTS = ("Q_cond", "Q_reb", "T_cond_in", "T_cond_out", "T_reb_in", "T_reb_out", "diameter")
+# Model settings costing needs
+SETTINGS = ("N", "tray_spacing", "tray_eff_1", "tray_eff_2", "tray_type")
+TRAY_TYPES = ("SIEVE", "CAPS")
+
+def inputs(results):
+    """
+    Costing outputs of one simulation, from model results (see model.Model.export_results).
+    """
+    T_stage = results["T_stage"]
+    return dict(Q_cond=results["Q_cond"], Q_reb=results["Q_reb"], T_cond_in=T_stage[1], T_cond_out=T_stage[0],
+        T_reb_in=T_stage[-2], T_reb_out=T_stage[-1], diameter=results["diameter"])
+
+def designs(results, settings=None):
+    """
+    Costing arrays of several simulations.
+    :param results: list of model results, or of dicts with COSTING_INPUTS (e.g. sweep rows)
+    :param settings: SETTINGS of the runs missing from results: a dict for all of them or a list of dicts
+    :return: dict of arrays, one entry per run
+    """
+    results = list(results)
+    if not isinstance(settings, list):
+        settings = [settings if settings is not None else dict()] * len(results)
+    rows = [inputs(r) if "T_stage" in r else dict((name, r[name]) for name in COSTING_INPUTS) for r in results]
+    arrays = dict((name, np.array([row[name] for row in rows], dtype=float)) for name in COSTING_INPUTS)
+    for name in SETTINGS:
+        values = [r[name] if name in r else s[name] for r, s in zip(results, settings)]
+        arrays[name] = np.array(values, dtype=object if name == "tray_type" else float)
+    return arrays
+
+def scenarios(**values):
+    """
+    Economic scenarios as columns, to broadcast against designs in tac():
+    each keyword is a sequence of values, the i-th scenario made of the i-th
+    value of each; parameters not given keep their default.
+    """
+    lengths = set(len(v) for v in values.values())
+    if len(lengths) > 1:
+        raise ValueError("Scenario parameters have different lengths: %s" % sorted(lengths))
+    economics = dict()
+    for name, value in values.items():
+        if name not in ECONOMICS or isinstance(ECONOMICS[name], tuple):
+            raise ValueError("%s is not a scalar economic parameter" % name)
+        value = np.asarray(value, dtype=float)
+        economics[name] = value.reshape(value.shape + (1,))
+    return economics
+
+def values(x):
+    # Float array, or numpy scalar for a single design: scalar powers round as the scalar calc_tac always did
+    return np.asarray(x, dtype=float)[()]
+
+def log_mean(t_in_hot, t_out_cold, t_out_hot, t_in_cold):
+    """
+    Mean temperature difference of a heat exchanger (Chen approximation),
+    NaN where the temperatures cross and there is none.
+    """
+    base = 0.5 * (t_in_hot - t_out_cold) * (t_out_hot - t_in_cold) * (t_in_hot - t_out_cold + t_out_hot - t_in_cold)
+    return values(np.where(base > 0, base, np.nan)) ** (1./3)
+
+def hp_steam(T_reb_in):
+    """
+    Whether the reboiler needs high pressure steam: its inlet within 10 C of the low pressure steam (160 C) or above it.
+    """
+    return np.asarray(T_reb_in)[()] > 160.0 - 10.0
+
+def energy_cost(Q_cond, Q_reb, hp, cooling_water=ECONOMICS["cooling_water"], lp_steam=ECONOMICS["lp_steam"], hp_steam=ECONOMICS["hp_steam"]):
+    """
+    Annual utility cost [USD].
+    :param Q_cond: condenser duty [cal/s]
+    :param Q_reb: reboiler duty [cal/s]
+    :param hp: whether the reboiler uses high pressure steam
+    """
+    cost = cooling_water * conversions.calPerSec_to_GJPerYear(abs(values(Q_cond)))
+    return cost + values(np.where(hp, hp_steam, lp_steam)) * conversions.calPerSec_to_GJPerYear(abs(values(Q_reb)))
+
+def tac(designs, **economics):
+    """
+    Total annualized cost of designs under economic scenarios.
+    :param designs: dict of arrays (or scalars) of COSTING_INPUTS and SETTINGS, see designs
+    :param economics: ECONOMICS to change, scalars or arrays broadcasting against the designs, see scenarios
+    :return: dict of arrays: TAC, energy_cost, capital (total, not annualized), height,
+        A_cond, A_reb, hp (high pressure steam), valid (False where the temperatures of
+        the condenser or reboiler cross, TAC and the areas being NaN there)
+    """
+    for name in economics:
+        if name not in ECONOMICS:
+            raise ValueError("Unknown economic parameter %s" % name)
+    tray_type = np.asarray(designs["tray_type"])
+    unknown = set(np.ravel(tray_type).tolist()) - set(TRAY_TYPES)
+    if unknown:
+        raise ValueError("Tray type must be one of %s, not %s" % (", ".join(TRAY_TYPES), ", ".join(sorted(map(str, unknown)))))
+    e = dict(ECONOMICS, **economics)
+    Q_cond, Q_reb, diameter = values(designs["Q_cond"]), values(designs["Q_reb"]), values(designs["diameter"])
+
+    # Cooling water at 25 C -> 35 C, steam condensing at 254 or 160 C
+    hp = hp_steam(designs["T_reb_in"])
+    t_in_hot_reb = values(np.where(hp, 254.0, 160.0))
+    del_t_mean_cond = log_mean(values(designs["T_cond_in"]), 35.0, values(designs["T_cond_out"]), 25.0)
+    del_t_mean_reb = log_mean(t_in_hot_reb, values(designs["T_reb_out"]), t_in_hot_reb - 1.0, values(designs["T_reb_in"]))
+    A_cond = np.abs(conversions.calPerSec_to_kJPerSec(Q_cond)) / (e["U_cond"] * del_t_mean_cond)
+    A_reb = np.abs(conversions.calPerSec_to_kJPerSec(Q_reb)) / (e["U_reb"] * del_t_mean_reb)
+
+    N = values(designs["N"])
+    efficiency = values(designs["tray_eff_1"]) + values(designs["tray_eff_2"])
+    height = 1.2 * values(designs["tray_spacing"]) * N * 0.5 * efficiency
+
+    C_cap_hx = e["hx_coefficient"] * (A_cond ** e["hx_exponent"]) + e["hx_coefficient"] * (A_reb ** e["hx_exponent"])
+    C_cap_col = e["column_coefficient"] * (diameter ** e["column_diameter_exponent"]) * (height ** e["column_height_exponent"])
+    sieve = tray_type == "SIEVE"
+    base, coefficient, exponent = [values(np.where(sieve, s, c)) for s, c in zip(e["sieve_tray"], e["caps_tray"])]
+    C_cap_tray = base + coefficient * (diameter ** exponent) * N * 0.5 * efficiency
+
+    capital = C_cap_hx + C_cap_col + C_cap_tray
+    energy = energy_cost(Q_cond, Q_reb, hp, e["cooling_water"], e["lp_steam"], e["hp_steam"])
+    return dict(TAC=capital / e["n_years"] + energy, energy_cost=energy + np.zeros_like(capital), capital=capital,
+        height=height, A_cond=A_cond, A_reb=A_reb, hp=hp, valid=~(np.isnan(del_t_mean_cond) | np.isnan(del_t_mean_reb)))
@@ -0,0 +1,136 @@
+"""
+One simulation per design vector, shared by the objective and the constraints.
+
+SLSQP calls the objective and the constraints separately, at the iterate and
+at every finite difference probe. The Evaluator simulates each x once and keeps
+the objective and the whole constraint vector computed from that model state,
+so the constraint callbacks always see the simulation of the x they are given
+instead of whichever design the model ran last.
+
+A design whose simulation failed, or whose constraints cannot be computed
+from its results, has every constraint at FAILED_CONSTRAINT: violated, so
+SLSQP steps away from it rather than taking it as feasible as its neighbours.
+"""
+import collections
+import numpy as np
+import failures
+
+# Errors of a constraint computed from the results of a bad simulation: missing
+# stages or components, divisions by zero flows or areas, complex or NaN values
+# (see optimize.Optimizer.constraint_values). Any other error is a bug and is raised.
+CONSTRAINT_ERRORS = (ArithmeticError, IndexError, KeyError, ValueError)
+# Value of every constraint of a failed design
+FAILED_CONSTRAINT = -1.0
+
+class Evaluation:
+    """
+    Objective and constraint values of one design vector.
+    """
+    def __init__(self, x, objective, constraints, results, failed=False):
+        self.x = x
+        self.objective = objective
+        self.constraints = constraints # dict of constraint name -> value
+        self.results = results # model results, see model.Model.export_results
+        self.failed = failed
+
+    @property
+    def vector(self):
+        return np.array(list(self.constraints.values()))
+
+class Evaluator:
+    def __init__(self, optimizer, size: int = 64, remote: bool = False):
+        """
+        :param optimizer: optimize.Optimizer whose objective and constraints are evaluated
+        :param size: number of design vectors kept, enough for an iterate and its finite difference probes
+        :param remote: simulate every design on the optimizer pool, the model only holds the results loaded from it
+        """
+        self.optimizer = optimizer
+        self.size = size
+        self.remote = remote
+        self.evaluations = collections.OrderedDict()
+        self.stats = collections.Counter()
+
+    def key(self, x):
+        # The stage numbers are not part of x, see integer.StageSearch
+        model = self.optimizer.model
+        return (model.N, model.feed_stage) + tuple(float(v) for v in x)
+
+    def add(self, key, evaluation):
+        self.evaluations[key] = evaluation
+        if len(self.evaluations) > self.size:
+            self.evaluations.popitem(last=False)
+        return evaluation
+
+    def failure(self, x, objective):
+        # Evaluation of a design that could not be simulated, every constraint violated
+        constraints = dict((name, FAILED_CONSTRAINT) for name in self.optimizer.constraint_names())
+        return Evaluation(np.array(x, dtype=float), objective, constraints, None, True)
+
+    def current(self, x, objective, failed):
+        # Evaluation of x from the model state
+        if failed:
+            return self.failure(x, objective)
+        try:
+            constraints = self.optimizer.constraint_values(x)
+        except CONSTRAINT_ERRORS as e:
+            self.optimizer.log(e)
+            self.stats["constraint_failures"] += 1
+            self.optimizer.add_failure(x, failures.classify(e))
+            return self.failure(x, objective)
+        return Evaluation(np.array(x, dtype=float), objective, constraints, self.optimizer.model.export_results())
+
+    def evaluate(self, x):
+        """
+        Evaluation of x, simulated unless x was evaluated recently.
+        """
+        if self.remote:
+            return self.evaluate_batch([x])[0]
+        key = self.key(x)
+        if key in self.evaluations:
+            self.stats["hits"] += 1
+            self.evaluations.move_to_end(key)
+            return self.evaluations[key]
+        self.stats["simulations"] += 1
+        objective = self.optimizer.objective(x)
+        return self.add(key, self.current(x, objective, self.optimizer.failed))
+
+    def evaluate_batch(self, xs):
+        """
+        Evaluations of several design vectors, those not evaluated recently
+        simulated at once on the optimizer pool.
+        """
+        keys = [self.key(x) for x in xs]
+        missing = [i for i, key in enumerate(keys) if key not in self.evaluations]
+        self.stats["hits"] += len(xs) - len(missing)
+        self.stats["simulations"] += len(missing)
+        output = [self.evaluations.get(key) for key in keys]
+        for i, results in zip(missing, self.optimizer.evaluate_batch([xs[i] for i in missing])):
+            if results is None and self.remote:
+                # Kept with the penalty of optimize.Optimizer.objective, there is no local simulation to retry it on
+                output[i] = self.add(keys[i], self.failure(xs[i], self.optimizer.model.TAC/1000000 + 2 * self.optimizer.opt_tolerance))
+                continue
+            if results is None:
+                # Not kept, evaluate retries it
+                output[i] = self.current(xs[i], None, True)
+                continue
+            self.optimizer.set_design(xs[i])
+            self.optimizer.model.load_results(results)
+            output[i] = self.add(keys[i], self.current(xs[i], self.optimizer.model.TAC/1000000, False))
+        return output
+
+    def objective(self, x):
+        return self.evaluate(x).objective
+
+    def constraints(self, x):
+        return self.evaluate(x).vector
+
+    def restore(self, x):
+        """
+        Put the model back in the state of the simulation of x, simulating it
+        again only if it is no longer kept.
+        """
+        evaluation = self.evaluate(x)
+        if evaluation.results is not None:
+            self.optimizer.set_design(x)
+            self.optimizer.model.load_results(evaluation.results)
+        return evaluation
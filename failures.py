@@ -0,0 +1,108 @@
+"""
+Failure index: designs whose evaluation failed, looked up by distance.
+
+When a simulation fails, SLSQP tends to probe the same neighbourhood again,
+and each probe costs a full simulator attempt. Failed designs are recorded
+with their failure class, and any later design within radius (max norm,
+relative to the scale of each variable) of a recorded failure is reported
+as failing at once, without simulating it.
+
+Only failures are recorded: simulations that raised, and designs whose
+constraints could not be computed from their results. Designs that simulate
+but violate a constraint are not. SLSQP has to evaluate infeasible designs to
+follow the constraint boundaries, and a penalty in place of their constraint
+values would hide the direction back to feasibility.
+
+Points are kept in a k-d tree per discrete setting (the stage numbers),
+rebuilt when enough new points have been added; the newest points are
+searched linearly until then.
+"""
+import collections
+import numpy as np
+from scipy.spatial import cKDTree
+
+def classify(exception):
+    """
+    Failure class of an exception raised by an evaluation.
+    """
+    if isinstance(exception, IndexError):
+        return "index"
+    if "converge" in str(exception).lower():
+        return "convergence"
+    return type(exception).__name__
+
+class FailureIndex:
+    def __init__(self, radius: float = 1e-3, scale=None, rebuild: int = 32):
+        """
+        :param radius: largest distance to a failure at which a design is taken as failing, relative to scale
+        :param scale: range of each design variable, set from the optimizer bounds when None
+        :param rebuild: number of points added before the k-d tree is rebuilt
+        """
+        self.radius = radius
+        self.scale = None if scale is None else np.asarray(scale, dtype=float)
+        self.rebuild = rebuild
+        self.points = collections.defaultdict(list) # context -> scaled points
+        self.failures = collections.defaultdict(list) # context -> failure classes
+        self.trees = dict() # context -> (tree, number of points in it)
+        self.runtime = 0.0 # Time spent on the recorded failures
+        self.stats = collections.Counter()
+
+    def scaled(self, x):
+        x = np.asarray(x, dtype=float)
+        return x / self.scale if self.scale is not None else x
+
+    def add(self, x, failure: str, runtime: float = None, context=None):
+        """
+        Record a failed design; infeasible designs are not recorded, see above.
+        :param failure: failure class, see classify
+        :param runtime: seconds the failed attempt took
+        :param context: discrete settings x belongs to
+        """
+        self.points[context].append(self.scaled(x))
+        self.failures[context].append(failure)
+        self.stats["failures"] += 1
+        self.stats["failures_" + failure] += 1
+        if runtime is not None:
+            self.runtime += runtime
+            self.stats["timed_failures"] += 1
+
+    def find(self, x, context=None):
+        """
+        :return: failure class of a recorded failure near x, None if there is none
+        """
+        points = self.points.get(context)
+        if not points:
+            self.stats["misses"] += 1
+            return None
+        tree, indexed = self.trees.get(context, (None, 0))
+        if len(points) - indexed >= self.rebuild:
+            tree, indexed = cKDTree(np.array(points)), len(points)
+            self.trees[context] = (tree, indexed)
+        u = self.scaled(x)
+        if tree is not None:
+            distance, i = tree.query(u, p=np.inf, distance_upper_bound=self.radius)
+            if i < indexed:
+                self.stats["hits"] += 1
+                return self.failures[context][i]
+        for i in range(indexed, len(points)):
+            if np.max(np.abs(points[i] - u)) <= self.radius:
+                self.stats["hits"] += 1
+                return self.failures[context][i]
+        self.stats["misses"] += 1
+        return None
+
+    def report(self):
+        """
+        Lookups answered from the index, and the simulator time they saved
+        (at the mean duration of the recorded failures).
+        """
+        hits, misses = self.stats["hits"], self.stats["misses"]
+        timed = self.stats["timed_failures"]
+        return dict(
+            failures = self.stats["failures"],
+            classes = dict((name[len("failures_"):], count) for name, count in self.stats.items() if name.startswith("failures_")),
+            hits = hits,
+            misses = misses,
+            hit_rate = hits / (hits + misses) if hits + misses else 0.0,
+            saved_time = hits * self.runtime / timed if timed else 0.0,
+        )
@@ -0,0 +1,95 @@
+"""
+Run history: every evaluation of an optimization stored in an SQLite file.
+
+Records are buffered and written in batches, the tables are only ever
+appended to. History.frame() returns the evaluations as a pandas DataFrame,
+which can be saved as Parquet with DataFrame.to_parquet.
+"""
+import json
+import time
+import uuid
+import sqlite3
+import pandas as pd
+
+INPUTS = ("P_cond", "P_drop_1", "P_drop_2", "RR", "distilate_rate", "N", "feed_stage", "tray_spacing", "tray_type",
+    "num_pass", "tray_eff_1", "tray_eff_2", "n_years")
+OUTPUTS = ("TAC", "energy_cost", "Q_cond", "Q_reb", "diameter", "height", "iterations")
+
+class History:
+    def __init__(self, filepath: str, batch_size: int = 100):
+        """
+        :param filepath: SQLite file, created if missing
+        :param batch_size: number of evaluations buffered before they are written
+        """
+        self.filepath = filepath
+        self.batch_size = batch_size
+        self.buffer = []
+        self.db = sqlite3.connect(filepath, timeout=60)
+        columns = ", ".join(["%s %s" % (name, "TEXT" if name == "tray_type" else "REAL") for name in INPUTS + OUTPUTS])
+        self.db.execute("CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, case_file TEXT, started REAL, settings TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS evaluations (run_id TEXT, evaluation INTEGER, timestamp REAL, "
+            "status TEXT, error TEXT, runtime REAL, %s, purity REAL, recovery REAL, constraints TEXT)" % columns)
+        self.db.commit()
+
+    def start_run(self, model, **settings):
+        """
+        Register an optimization run.
+        :param settings: run settings to store with it (bounds, tolerances, ...)
+        :return: run id
+        """
+        run_id = uuid.uuid4().hex
+        self.db.execute("INSERT INTO runs VALUES (?, ?, ?, ?)", (run_id, model.filepath, time.time(), json.dumps(settings, default=str)))
+        self.db.commit()
+        return run_id
+
+    def record(self, run_id, evaluation, model, status, runtime=None, error=None, constraints=None):
+        """
+        Buffer one evaluation of model.
+        :param status: "ok", "cached", "error" or "skipped" (near a known failure, see failures.py); outputs are only read from model when "ok" or "cached"
+        :param constraints: dict of constraint values
+        """
+        row = [run_id, evaluation, time.time(), status, error, runtime]
+        row += [getattr(model, name) for name in INPUTS]
+        if status in ("error", "skipped"):
+            row += [None] * (len(OUTPUTS) + 2)
+        else:
+            row += [getattr(model, name, None) for name in OUTPUTS]
+            row += [model.purity[model.main_component], model.recovery[model.main_component]]
+        row.append(json.dumps(constraints) if constraints is not None else None)
+        self.buffer.append([float(v) if hasattr(v, "dtype") else v for v in row])
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.db.executemany("INSERT INTO evaluations VALUES (%s)" % ", ".join("?" * len(self.buffer[0])), self.buffer)
+            self.db.commit()
+            self.buffer = []
+
+    def frame(self, run_id: str = None, case_file: str = None):
+        """
+        Evaluations as a DataFrame, joined with the case file of their run.
+        Constraint values are expanded into one column each.
+        """
+        self.flush()
+        query = "SELECT runs.case_file, evaluations.* FROM evaluations JOIN runs USING (run_id)"
+        conditions, parameters = [], []
+        if run_id is not None:
+            conditions.append("run_id = ?")
+            parameters.append(run_id)
+        if case_file is not None:
+            conditions.append("runs.case_file = ?")
+            parameters.append(case_file)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        frame = pd.read_sql_query(query + " ORDER BY timestamp", self.db, params=parameters)
+        # Failed and skipped evaluations have no constraints, read back as NaN when others do
+        constraints = pd.DataFrame([json.loads(c) if isinstance(c, str) else {} for c in frame.pop("constraints")], index=frame.index)
+        return pd.concat([frame, constraints], axis=1)
+
+    def runs(self):
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY started", self.db)
+
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -0,0 +1,219 @@
+"""
+Tray hydraulics of the rectifying (top) and stripping (bottom) sections.
+
+HydraulicsEngine computes every derived quantity of both sections in one pass
+and keeps the result until the model results or the inputs it reads change
+(model.Model.version counts the results loaded into the model). The Optimizer
+constraint callbacks all read from it instead of recomputing the chains of
+intermediate quantities for every call.
+
+By default the top section is checked at the top stage and the bottom section
+at the bottom stages, as in the original two point check. With stages=True
+every stage from the condenser down to the stage above the reboiler is checked
+at once from the stage profiles (array operations over stages), and each
+section constraint is its worst stage margin.
+
+Sieve tray correlations follow Towler & Sinnott, bubble cap correlations
+"Design of equilibrium stage processes" (Smith).
+"""
+import collections
+import numpy as np
+import conversions
+import graph
+
+SECTIONS = {"top": 0, "bottom": 1}
+
+class HydraulicsEngine:
+    def __init__(self, stages: bool = False):
+        """
+        :param stages: check every stage of the column from the stage profiles, instead of the top
+            and bottom of the column only
+        """
+        self.stages = stages
+        self.h_w = 50 #mm (Assumption)
+        self.hole_diameter = 5 #mm (Assumption)
+        self.plate_thickness = 5 #mm (Assumption)
+        self.frac_appr_flooding = 0.8 #Assumption
+
+        # Assumptions from "Design of equilibrium stage processes" Pg 527 Table 14.3
+        self.slot_shape_ratio = 0.5 #Assume trapezoidal slots
+        self.slot_height = conversions.inch_to_m(1.250) #Assume 1.25 inch slot height
+        self.riser_area_per_tray = conversions.sqft_to_m2(18.7) #Assume 18.7 sq ft riser area per tray
+        self.static_seal = conversions.inch_to_m(0.5) #Assume 0.5 inch static seal
+        self.annular_riser_area_ratio = 1.25 #Assume 1.25:1 annular riser area ratio
+        self.A_da = conversions.sqft_to_m2(1.0) # Minimum area under downflow apron = 1sqft
+        self.slot_area_per_tray = conversions.sqft_to_m2(31.5) #Assume 31.5 sq ft total slot area per tray
+        self.delta = conversions.inch_to_m(1.3) #Assume delta of 1.3 inches
+
+        self.key = None
+        self.state = None
+        self.stats = collections.Counter()
+
+    def evaluate(self, model):
+        """
+        Hydraulics of the current model state, computed once per state.
+        :return: dict of quantity name -> (top, bottom) values, or a single value for quantities
+            shared by both sections, including the constraint values (see constraints()).
+            When checking every stage, constraint values are the worst (smallest) margin over the
+            stages of each section, and the other quantities are arrays over stages 1 to N - 1.
+        """
+        key = (model.version, model.RR, model.tray_spacing, model.tray_type, model.feed_stage)
+        if key == self.key:
+            self.stats["hits"] += 1
+            return self.state
+        self.stats["evaluations"] += 1
+        shared = self.shared(model)
+        state = self.stage_profile(model, shared) if self.stages else self.two_point(model, shared)
+        state.update(shared)
+        self.key, self.state = key, state
+        return state
+
+    def two_point(self, model, shared):
+        sections = [self.section(model, self.section_flows(model, i), shared) for i in SECTIONS.values()]
+        shared["net_area_required"] = max(h["volume_flow_vapour"] / h["u_n"] for h in sections)
+        for h in sections:
+            h["percent_flooding"] = h["volume_flow_vapour"] / shared["net_area_required"] / h["flooding_vapour_velocity"]
+            h.update(self.constraints(model, h))
+        return dict((name, tuple(h[name] for h in sections)) for name in sections[0])
+
+    def stage_profile(self, model, shared):
+        h = self.section(model, self.stage_flows(model), shared)
+        shared["net_area_required"] = (h["volume_flow_vapour"] / h["u_n"]).max()
+        h["percent_flooding"] = h["volume_flow_vapour"] / shared["net_area_required"] / h["flooding_vapour_velocity"]
+        constraints = self.constraints(model, h)
+        # Stages above the feed make up the top section
+        top = slice(0, model.feed_stage - 1)
+        bottom = slice(model.feed_stage - 1, None)
+        state = dict((name, (values[top].min(), values[bottom].min())) for name, values in constraints.items())
+        state.update(h)
+        return state
+
+    def shared(self, model):
+        h = dict()
+        # Areas [m2]
+        h["net_area"] = float(model.A_c - model.A_d)
+        h["active_area"] = h["net_area"] - model.A_d
+        h["hole_area"] = 0.1 * h["active_area"]
+        h["A_ap"] = (self.h_w - 10) * model.weir_length * (10 ** -3) # Change to m
+        if model.tray_type == 'SIEVE':
+            h["orifice_coeff"] = graph.orifice(h["hole_area"] / h["active_area"], self.plate_thickness / self.hole_diameter)
+        return h
+
+    def section_flows(self, model, i):
+        """
+        Flows of section i, the liquid leaving the top (0) or bottom (1) stage and the vapour
+        leaving the top stage or the stage above the reboiler. Liquid flows from the reflux ratio.
+        """
+        L = float(model.RR * model.D[0] + (model.feed_flow_rate if i else 0.0))
+        return dict(
+            L = L,
+            V = float(model.D[0] * (1 + model.RR)),
+            density_liquid = conversions.gmCc_to_kgM3(float(model.density_liquid[-i])),
+            density_vapour = conversions.gmCc_to_kgM3(float(model.density_vapour[-2 * i])),
+            volume_flow_vapour = conversions.lMin_to_m3Sec(float(model.volume_flow_vapour[-2 * i])),
+            max_liquid_flow_rate = L * float(model.molecular_weight_liquid[-i]) / 3600, # Conversion from kmol/hr to kg/s
+        )
+
+    def stage_flows(self, model):
+        """
+        Flows of stages 1 to N - 1 from the stage profiles: liquid leaving and vapour entering each stage.
+        """
+        stages = slice(0, len(model.density_liquid) - 1)
+        density_liquid = conversions.gmCc_to_kgM3(np.asarray(model.density_liquid[stages], dtype=float))
+        density_vapour = conversions.gmCc_to_kgM3(np.asarray(model.density_vapour[stages], dtype=float))
+        volume_flow_vapour = conversions.lMin_to_m3Sec(np.asarray(model.volume_flow_vapour[stages], dtype=float))
+        max_liquid_flow_rate = conversions.lMin_to_m3Sec(np.asarray(model.volume_flow_liquid[stages], dtype=float)) * density_liquid # kg/s
+        return dict(
+            L = max_liquid_flow_rate * 3600 / np.asarray(model.molecular_weight_liquid[stages], dtype=float), # kmol/hr
+            V = volume_flow_vapour * density_vapour * 3600 / np.asarray(model.molecular_weight_vapour[stages], dtype=float),
+            density_liquid = density_liquid,
+            density_vapour = density_vapour,
+            volume_flow_vapour = volume_flow_vapour,
+            max_liquid_flow_rate = max_liquid_flow_rate,
+        )
+
+    def section(self, model, flows, shared):
+        """
+        Hydraulics for the given flows, scalars for one section or arrays over stages.
+        """
+        h = dict(flows)
+        rho_L, rho_V, Q_V = h["density_liquid"], h["density_vapour"], h["volume_flow_vapour"]
+        h["min_liquid_flow_rate"] = 0.7 * h["max_liquid_flow_rate"]
+
+        # Weir crest [mm]
+        h["h_ow_max"] = ((h["max_liquid_flow_rate"] / (rho_L * model.weir_length)) ** (2./3)) * 1000
+        h["h_ow_min"] = ((h["min_liquid_flow_rate"] / (rho_L * model.weir_length)) ** (2./3)) * 1000
+
+        # Weeping
+        h["actual_min_vapour_vel"] = 0.7 * Q_V / shared["hole_area"]
+        h["min_vapour_vel"] = (graph.K2(self.h_w + h["h_ow_min"]) - 0.9 * (25.4 - self.hole_diameter)) / (rho_V ** (1./2))
+
+        # Flooding
+        h["f_lv"] = (h["L"] / h["V"]) * ((rho_V / rho_L) ** (1./2))
+        h["flooding_vapour_velocity"] = graph.K1(h["f_lv"], model.tray_spacing, model.tray_type) * (((rho_L - rho_V) / rho_V) ** (1./2))
+        h["u_n"] = self.frac_appr_flooding * h["flooding_vapour_velocity"]
+
+        if model.tray_type == 'SIEVE':
+            # Pressure drop [mm liquid]
+            h["max_vapour_vel"] = Q_V / shared["hole_area"]
+            h["h_d"] = 51 * ((h["max_vapour_vel"] / shared["orifice_coeff"]) ** 2) * (rho_V / rho_L)
+            h["h_r"] = 12500 / rho_L
+            h["h_t"] = h["h_d"] + self.h_w + h["h_ow_max"] + h["h_r"]
+            h["h_dc"] = 166 * ((h["max_liquid_flow_rate"] / (rho_L * min(model.A_d, shared["A_ap"]))) ** 2)
+        elif model.tray_type == 'CAPS':
+            density_liquid = conversions.kgM3_to_lbFt3(rho_L)
+            density_vapour = conversions.kgM3_to_lbFt3(rho_V)
+            volume_flow_vapour = conversions.m3Sec_to_cfs(Q_V)
+            # Maximum vapour flow through the slots
+            As = 0.12 * conversions.m2_to_sqft(self.slot_area_per_tray)
+            Rs = self.slot_shape_ratio
+            slot_height = conversions.m_to_inch(self.slot_height)
+            h["q_max"] = conversions.cfs_to_m3Sec(2.36 * As * ((2./3) * (Rs/(1+Rs)) + (4./15) * ((1-Rs)/(1+Rs))) * \
+                ((slot_height * (density_liquid - density_vapour) / density_vapour) ** (1./2)))
+            h["slot_opening_ratio"] = graph.slot_opening_corelation(Q_V / h["q_max"]) # Fig 14.6 Pg 504, slot opening / slot height
+            # Dry cap, slot and aerated liquid heads
+            riser_area = conversions.m2_to_sqft(self.riser_area_per_tray)
+            h["h_cd"] = conversions.inch_to_m(graph.dry_cap_coeff(self.annular_riser_area_ratio) * density_vapour / density_liquid * (volume_flow_vapour / riser_area) ** 2)
+            h["h_so"] = self.slot_height * h["slot_opening_ratio"]
+            F_va = volume_flow_vapour / conversions.m2_to_sqft(shared["active_area"]) * (density_vapour ** (1./2))
+            h["h_al"] = graph.aeration_factor(F_va) # Fig 14.15
+            h["h_c"] = h["h_cd"] + h["h_so"]
+            h["h_t"] = h["h_cd"] + h["h_so"] + h["h_al"]
+            h["h_ds"] = conversions.inch_to_m(conversions.m_to_inch(self.static_seal) + conversions.m_to_inch(h["h_ow_max"] / 1000) + \
+                conversions.m_to_inch(self.delta) / 2)
+            # Head loss under the downcomer apron for the liquid load, and flow under the apron
+            A_da = conversions.m2_to_sqft(self.A_da)
+            Lw = conversions.m3Sec_to_gpm(h["max_liquid_flow_rate"] / rho_L)
+            h["h_da"] = conversions.inch_to_m(0.03 * (Lw / 2 / 100 / A_da) ** 2)
+            g = conversions.m_to_ft(9.81)
+            h["q"] = conversions.cfs_to_m3Sec(0.6 * A_da * ((2 * g * conversions.m_to_inch(h["h_da"]) / 12) ** (1./2)))
+            h["h_dc"] = h["h_t"] + self.h_w + h["h_ow_max"] + self.delta + h["h_da"]
+            h["h_fd"] = h["h_dc"] / 0.5
+            h["t_dc"] = conversions.m2_to_sqft(model.A_d) * conversions.m_to_inch(h["h_dc"]) / (12 * conversions.m3Sec_to_cfs(h["q"]))
+        else:
+            raise AssertionError("Tray type must be either SIEVE or CAPS")
+
+        h["h_b"] = self.h_w + h["h_ow_max"] + h["h_t"] + h["h_dc"]
+        return h
+
+    def constraints(self, model, h):
+        """
+        Constraint values of a section, feasible when >= 0, some scaled for the optimizer.
+        """
+        c = dict()
+        c["entrainment"] = self.frac_appr_flooding - h["percent_flooding"] # percent of flooding should be less than frac_appr_flooding
+        c["entrainment_frac"] = 0.1 - graph.frac(h["f_lv"], h["percent_flooding"], model.tray_type) # frac_entrainment should be less than 0.1
+        c["weeping"] = (h["actual_min_vapour_vel"] - h["min_vapour_vel"]) / 5.0 # actual_min_vapour_vel > min_vapour_vel
+        if model.tray_type == 'SIEVE':
+            c["downcomer_liquid_backup"] = 0.5 * (model.tray_spacing + (self.h_w/1000)) - h["h_b"]/1000 # (pg 882 towler sinnot)
+            c["residence_time"] = (model.A_d * h["h_b"] * (10 ** -3) * h["density_liquid"]) / h["max_liquid_flow_rate"]
+            c["downcomer_residence_time"] = (c["residence_time"] - 3) / 100.0 # Should be larger than 3s
+        else:
+            c["slot_opening"] = 1 - h["slot_opening_ratio"]
+            c["slot_seal_LB"] = conversions.m_to_inch(h["h_ds"]) - 1.0
+            c["slot_seal_UB"] = (2.6 - conversions.m_to_inch(h["h_ds"])) / 10.0
+            c["vapour_dist_ratio"] = (0.5 - (self.delta / h["h_c"])) / 10.0
+            c["downcomer_liquid_backup"] = model.tray_spacing + (self.h_w/1000) - h["h_fd"]/1000
+            c["residence_time"] = h["t_dc"]
+            c["downcomer_residence_time"] = (c["residence_time"] - 3) / 1000.0 # Should be larger than 3s
+        return c
@@ -2,6 +2,40 @@ import numpy as np
 import model
 import scipy.optimize as opt
 import math
+import collections
+import bkp
+import mesh
+
+class Case:
+    def __init__(self, filepath: str, main_component: str = None, P: float = None):
+        """
+        Feed of a case read from its archive, with the attributes the shortcut
+        methods below use, so they can run without a simulator.
+        K values are ideal (Raoult's law) at the bubble point of the feed, from the
+        constants of mesh.COMPONENTS: cases with other components raise ValueError.
+        :param filepath: path to the .bkp file
+        :param main_component: light key, default the first component
+        :param P: pressure of the K values [bar], default the condenser pressure of the case
+        """
+        self.filepath = filepath
+        self.case = bkp.read_case(filepath)
+        self.components = self.case["components"]
+        self.main_component = main_component if main_component is not None else self.components[0]
+
+        flows = np.array(self.case["feed_flow"])
+        self.mole_flow = dict(zip(self.components, flows))
+        self.mole_frac = dict(zip(self.components, flows / flows.sum()))
+        self.feed_flow_rate = flows.sum()
+
+        P = P if P is not None else self.case["P_cond"]
+        props = mesh.component_properties(self.components, self.case["dbnames"])
+        T = mesh.bubble_point((flows / flows.sum())[None, :], np.array([P]), [self.case["feed_T"]], props)
+        K = mesh.vapour_pressure(T[0], props)[0] / P
+
+        # Order K by component K
+        self.K = collections.OrderedDict(sorted(zip(self.components, K), key=lambda t: t[1]))
+        self.LK = self.main_component
+        self.HK = list(self.K.items())[list(self.K).index(self.main_component) - 1][0]
 
 def relative_volatility(model: model, component: str):
     """
@@ -28,6 +62,12 @@ def theta(model: model):
         x1 = 1.5, 
         options={'disp': False},
     )
+    # The root lies between the relative volatilities of HK (1) and LK:
+    # bracket it there when the secant method converged elsewhere
+    alpha_LK = relative_volatility(model, model.LK)
+    if not 1.0 < result.root < alpha_LK:
+        eps = 1e-9 * (alpha_LK - 1.0)
+        result = opt.root_scalar(obj, bracket=(1.0 + eps, alpha_LK - eps), method="brentq")
     return result.root
 
 def min_RR(model: model, recovery_LB = 0.99):
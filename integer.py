@@ -0,0 +1,149 @@
+"""
+Mixed-integer search over the number of stages and the feed stage.
+
+The continuous optimizer moves the section tray efficiencies in place of the
+stage numbers, so many designs share one column and SLSQP differentiates
+across the steps. StageSearch keeps N and feed_stage integer instead: an outer
+compass search over (N, feed_stage) starts from the initialize.actual_N and
+initialize.feed_stage estimates, and each candidate column is optimized by
+SLSQP over the remaining continuous variables (pressures, RR and tray spacing)
+with the tray efficiencies held at the model values. Every candidate starts
+from the optimum of its nearest solved neighbour, and candidates are never
+solved twice; with an evaluation cache, simulations repeated across
+candidates are not run again either.
+
+    optimizer = optimize.Optimizer(model, ...)
+    optimizer.run("integer")
+"""
+import numpy as np
+import scipy.optimize as opt
+import initialize
+
+class StageSearch:
+    def __init__(self, optimizer, N: int = None, feed_stage: int = None, step: int = None, min_N: int = 5,
+            max_N: int = None, penalty: float = 100.0, feasibility_tol: float = 1e-6, maxiter: int = 200):
+        """
+        :param optimizer: optimize.Optimizer whose objective, constraints and bounds are searched
+        :param N: first number of stages, the initialize.actual_N estimate by default
+        :param feed_stage: first feed stage, the initialize.feed_stage estimate by default
+        :param step: first step of the search in N, a quarter of N by default; the feed stage step is scaled from it
+        :param min_N: fewest stages searched
+        :param max_N: most stages searched, no limit by default
+        :param penalty: weight of the constraint violation when comparing columns (TAC in million USD per unit of violation)
+        :param feasibility_tol: largest violation of a constraint still taken as feasible
+        :param maxiter: SLSQP iterations per column
+        """
+        self.optimizer = optimizer
+        self.N = N
+        self.feed_stage = feed_stage
+        self.step = step
+        self.min_N = min_N
+        self.max_N = max_N
+        self.penalty = penalty
+        self.feasibility_tol = feasibility_tol
+        self.maxiter = maxiter
+        self.solutions = dict() # (N, feed_stage) -> solution dict
+
+    def full(self, z):
+        # Design vector of the optimizer, tray efficiencies fixed
+        x = self.fixed.copy()
+        x[self.free] = z
+        return x
+
+    def valid(self, N, feed_stage):
+        return self.min_N <= N <= (self.max_N if self.max_N is not None else N) and 2 <= feed_stage <= N - 2
+
+    def start(self, N, feed_stage):
+        # Optimum of the nearest solved column, or the optimizer start point
+        if not self.solutions:
+            return self.z0
+        nearest = min(self.solutions, key=lambda key: abs(key[0] - N) + abs(key[1] - feed_stage))
+        return self.solutions[nearest]["z"]
+
+    def solve(self, N, feed_stage):
+        """
+        Optimize the continuous variables of the column with N stages fed at feed_stage.
+        """
+        if (N, feed_stage) in self.solutions:
+            return self.solutions[(N, feed_stage)]
+        model, evaluator = self.optimizer.model, self.optimizer.evaluator
+        z0 = self.start(N, feed_stage)
+        model.N, model.feed_stage = N, feed_stage
+        simulations = evaluator.stats["simulations"]
+        result = opt.minimize(
+            lambda z: evaluator.objective(self.full(z)),
+            z0,
+            constraints = {'type': 'ineq', 'fun': lambda z: evaluator.constraints(self.full(z))},
+            bounds = self.bounds,
+            method = 'SLSQP',
+            options = {'maxiter': self.maxiter},
+            tol = self.optimizer.opt_tolerance,
+        )
+        evaluation = evaluator.evaluate(self.full(result.x))
+        violation = float(np.sum(np.maximum(0.0, -evaluation.vector)))
+        solution = dict(
+            N = N,
+            feed_stage = feed_stage,
+            z = np.asarray(result.x, dtype=float),
+            fun = evaluation.objective,
+            maxcv = violation,
+            merit = evaluation.objective + self.penalty * violation if not evaluation.failed else np.inf,
+            simulations = evaluator.stats["simulations"] - simulations,
+        )
+        self.solutions[(N, feed_stage)] = solution
+        print ('{0:4d}   {1:4d}   {2:10d}   {3:11.2f}   {4:11.6f}   {5:11d}'.format(len(self.solutions), N, feed_stage,
+            solution["fun"] * 1000000, violation, solution["simulations"]))
+        return solution
+
+    def optimize(self):
+        optimizer = self.optimizer
+        model = optimizer.model
+        x0, constraints, bounds = optimizer.problem()
+        N = self.N if self.N is not None else initialize.actual_N(model, optimizer.recoveryLB)
+        feed_stage = self.feed_stage if self.feed_stage is not None else initialize.feed_stage(model, optimizer.recoveryLB)
+        feed_stage = min(max(feed_stage, 2), N - 2)
+        if not self.valid(N, feed_stage):
+            raise ValueError("No valid feed stage for a column of %d stages" % N)
+
+        # Tray efficiencies are x[4], x[5] with hydraulics and x[2], x[3] without
+        efficiencies = [4, 5] if model.hydraulics else [2, 3]
+        self.free = np.array([i for i in range(len(x0)) if i not in efficiencies])
+        self.fixed = np.array(x0, dtype=float)
+        self.fixed[efficiencies] = [model.tray_eff_1, model.tray_eff_2]
+        self.z0 = self.fixed[self.free]
+        self.bounds = opt.Bounds(np.asarray(bounds.lb)[self.free], np.asarray(bounds.ub)[self.free], keep_feasible=True)
+        simulations = optimizer.evaluator.stats["simulations"]
+
+        print ('{0:4s}   {1:>4s}   {2:>10s}   {3:>11s}   {4:>11s}   {5:>11s}'.format('Cand', 'N', 'Feed stage', 'TAC', 'Violation', 'Simulations'))
+        current = self.solve(N, feed_stage)
+        step = self.step if self.step is not None else max(1, N // 4)
+        while True:
+            N, feed_stage = current["N"], current["feed_stage"]
+            feed_step = max(1, round(step * feed_stage / N))
+            neighbours = [(N + step, feed_stage), (N - step, feed_stage), (N, feed_stage + feed_step), (N, feed_stage - feed_step),
+                (N + step, feed_stage + feed_step), (N - step, feed_stage - feed_step)]
+            candidates = [self.solve(*neighbour) for neighbour in neighbours if self.valid(*neighbour)]
+            best = min(candidates, key=lambda solution: solution["merit"], default=current)
+            if best["merit"] < current["merit"]:
+                current = best
+            elif step > 1:
+                step = max(1, step // 2)
+            else:
+                break
+
+        # Leave the model at the best column, as after the last SLSQP iteration
+        model.N, model.feed_stage = current["N"], current["feed_stage"]
+        x = self.full(current["z"])
+        optimizer.evaluator.restore(x)
+        return opt.OptimizeResult(
+            x = x,
+            fun = current["fun"],
+            success = current["maxcv"] <= self.feasibility_tol,
+            status = 0 if current["maxcv"] <= self.feasibility_tol else 1,
+            message = "Integer search converged" if current["maxcv"] <= self.feasibility_tol else "No feasible column found",
+            nfev = optimizer.evaluator.stats["simulations"] - simulations,
+            nit = len(self.solutions),
+            maxcv = current["maxcv"],
+            N = current["N"],
+            feed_stage = current["feed_stage"],
+        )
@@ -0,0 +1,500 @@
+"""
+Equilibrium-stage column solver standing in for Aspen Plus RadFrac.
+
+MeshDocument mimics the part of the "Apwn.Document" automation interface that
+model.Model uses (Tree.FindNode, Reinit, Run2, Close), so the optimizer can be
+run, profiled and benchmarked without Aspen. Phase equilibrium is ideal
+(Raoult's law with Lee-Kesler vapour pressures) and the MESH equations are
+solved with the Wang-Henke bubble-point method, vectorized over stages and
+components.
+
+Pure component constants are not read from the case: only the components of
+COMPONENTS can be simulated, cases with any other component need their
+constants added there, or the Aspen backend.
+"""
+import numpy as np
+import scipy.linalg
+import scipy.optimize as opt
+import bkp
+import conversions
+import graph
+
+R = 8.314462618 # kJ/kmol/K
+T_REF = 298.15 # K, enthalpy reference temperature
+
+# Pure component constants, by component ID or databank name
+# MW [kg/kmol], Tc [K], Pc [bar], omega [-], liquid molar volume [cm3/mol], liquid heat capacity [kJ/kmol/K]
+COMPONENTS = {
+    "BENZENE": (78.11, 562.05, 48.95, 0.210, 89.4, 136.0),
+    "TOLUENE": (92.14, 591.75, 41.08, 0.264, 106.9, 157.0),
+    "METHANOL": (32.04, 512.50, 80.84, 0.565, 40.7, 81.0),
+    "1,2-DIMETHOXYETHANE": (90.12, 536.15, 38.70, 0.346, 104.5, 193.0),
+    "2-METHYL-1-HEPTENE": (112.21, 566.00, 26.00, 0.380, 155.8, 235.0),
+    # User defined components of Case Study 2 (values from the archive)
+    "C9H20O": (144.25, 597.85, 23.11, 0.427, 171.9, 300.0),
+    "C8H18O": (130.23, 640.26, 28.44, 0.747, 115.8, 280.0),
+}
+
+FLOODING_FACTOR = 0.8 # Design approach to flooding used for tray sizing
+DOWNCOMER_FRAC = 0.1 # Downcomer area / column area
+ANDERSON_DEPTH = 5 # Number of previous iterations used to accelerate the column solution
+
+
+def component_properties(components, dbnames=None):
+    """
+    Collect pure component constants for the given components.
+    :param components: list of component IDs
+    :param dbnames: optional dict of component ID to databank name, used when the ID is not in COMPONENTS
+    :return: dict of property name to array over components
+    :raises ValueError: components missing from COMPONENTS, all of them named
+    """
+    dbnames = dbnames if dbnames is not None else dict()
+    names = [component if component in COMPONENTS else dbnames.get(component) for component in components]
+    missing = [component for component, name in zip(components, names) if name not in COMPONENTS]
+    if missing:
+        raise ValueError("No property data for component%s %s in mesh.COMPONENTS (known: %s); add their constants or use the aspen backend"
+            % ("s" if len(missing) > 1 else "", ", ".join(missing), ", ".join(COMPONENTS)))
+    rows = np.array([COMPONENTS[name] for name in names], dtype=float)
+    return dict(MW=rows[:, 0], Tc=rows[:, 1], Pc=rows[:, 2], omega=rows[:, 3], Vm=rows[:, 4], CpL=rows[:, 5])
+
+
+def vapour_pressure(T, props):
+    """
+    Lee-Kesler vapour pressure.
+    :param T: temperature [K], broadcast against the component axis (last axis)
+    :return: vapour pressure [bar] and d ln(Psat) / dT [1/K]
+    """
+    Tr = T / props["Tc"]
+    f0 = 5.92714 - 6.09648 / Tr - 1.28862 * np.log(Tr) + 0.169347 * Tr ** 6
+    f1 = 15.2518 - 15.6875 / Tr - 13.4721 * np.log(Tr) + 0.43577 * Tr ** 6
+    df0 = 6.09648 / Tr ** 2 - 1.28862 / Tr + 1.016082 * Tr ** 5
+    df1 = 15.6875 / Tr ** 2 - 13.4721 / Tr + 2.61462 * Tr ** 5
+    psat = props["Pc"] * np.exp(f0 + props["omega"] * f1)
+    return psat, (df0 + props["omega"] * df1) / props["Tc"]
+
+
+def heat_of_vaporization(T, props):
+    """
+    Pitzer corresponding states heat of vaporization [kJ/kmol], zero above Tc.
+    """
+    tau = np.clip(1 - T / props["Tc"], 0, None)
+    return R * props["Tc"] * (7.08 * tau ** 0.354 + 10.95 * props["omega"] * tau ** 0.456)
+
+
+def enthalpy_liquid(T, x, props):
+    # Molar liquid enthalpy [kJ/kmol] relative to liquid at T_REF
+    return (x * props["CpL"] * (T[..., None] - T_REF)).sum(-1)
+
+
+def enthalpy_vapour(T, y, props):
+    # Molar vapour enthalpy [kJ/kmol] relative to liquid at T_REF
+    T = T[..., None]
+    return (y * (props["CpL"] * (T - T_REF) + heat_of_vaporization(T, props))).sum(-1)
+
+
+def bubble_point(x, P, T, props, tol=1e-9, max_iter=50):
+    """
+    Bubble point temperature of every stage at once (Newton on ln(sum x Psat / P)).
+    :param x: liquid mole fractions, stages x components
+    :param P: pressure of each stage [bar]
+    :param T: initial temperatures [K]
+    """
+    T = np.array(T, dtype=float)
+    for _ in range(max_iter):
+        psat, dlnpsat = vapour_pressure(T[:, None], props)
+        s = (x * psat).sum(1)
+        step = np.clip(np.log(s / P) / ((x * psat * dlnpsat).sum(1) / s), -25.0, 25.0)
+        T -= step
+        if np.max(np.abs(step)) < tol:
+            break
+    return T
+
+
+def flash(z, T, P, props):
+    """
+    Isothermal flash of the feed.
+    :return: vapour fraction, liquid and vapour mole fractions
+    """
+    K = vapour_pressure(T, props)[0] / P
+    if (z * K).sum() <= 1.0:
+        return 0.0, z, K * z / (K * z).sum()
+    if (z / K).sum() <= 1.0:
+        return 1.0, (z / K) / (z / K).sum(), z
+    rachford_rice = lambda beta: (z * (K - 1) / (1 + beta * (K - 1))).sum()
+    beta = opt.brentq(rachford_rice, 0.0, 1.0)
+    x = z / (1 + beta * (K - 1))
+    return beta, x, K * x
+
+
+def solve_component_balances(L, V, U, K, eff, f):
+    """
+    Solve the component material balances together with the Murphree vapour
+    efficiency relations y_j = E_j K_j x_j + (1 - E_j) y_j+1 for all
+    components in a single banded solve. Unknowns are interleaved per stage
+    (x_j, y_j) and each component is one block of the stacked system.
+    :param L: liquid flow to the stage below [kmol/hr]
+    :param V: vapour flow leaving each stage [kmol/hr]
+    :param U: liquid side draw of each stage [kmol/hr]
+    :param K: K values, stages x components
+    :param eff: Murphree vapour efficiency of each stage
+    :param f: feed component flows, stages x components
+    :return: liquid and vapour mole fractions (not normalized), stages x components
+    """
+    N, C = K.shape
+    j = np.arange(N)
+    block = 2 * N * np.arange(C)[:, None]
+    row_x = block + 2 * j # component balance of stage j
+    row_y = row_x + 1 # efficiency relation of stage j
+    rows, cols, values = [], [], []
+    def add(row, col, value, stages=slice(None)):
+        rows.append(row[:, stages].ravel())
+        cols.append(col[:, stages].ravel())
+        values.append(np.broadcast_to(value, (C, N))[:, stages].ravel())
+    add(row_x, row_x - 2, L[j - 1][None, :], slice(1, None))
+    add(row_x, row_x, -(L + U)[None, :])
+    add(row_x, row_x + 1, -V[None, :])
+    add(row_x, row_x + 3, np.append(V[1:], 0)[None, :], slice(None, -1))
+    add(row_y, row_x, (eff[:, None] * K).T)
+    add(row_y, row_y, -1.0)
+    add(row_y, row_y + 2, (1 - eff)[None, :], slice(None, -1))
+    rows, cols, values = np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+    ab = np.zeros((6, 2 * N * C))
+    ab[3 + rows - cols, cols] = values
+    rhs = np.zeros(2 * N * C)
+    rhs[row_x.ravel()] = -f.T.ravel()
+    solution = scipy.linalg.solve_banded((2, 3), ab, rhs, check_finite=False).reshape(C, N, 2)
+    return solution[:, :, 0].T, solution[:, :, 1].T
+
+
+def solve_column(props, feed_flow, feed_T, feed_P, N, feed_stage, D, RR, P, eff, tol=1e-20, max_iter=200, guess=None):
+    """
+    Wang-Henke bubble-point solution of a column with a total condenser (stage 1)
+    and a partial reboiler (stage N), reflux ratio and distillate rate specified.
+    :param feed_flow: feed component flows [kmol/hr]
+    :param feed_T: feed temperature [K]
+    :param feed_P: feed pressure [bar]
+    :param P: stage pressures [bar]
+    :param eff: Murphree vapour efficiency of each stage
+    :param guess: converged result of a column with the same number of stages to start from
+    :return: dict of converged stage profiles and duties [kW]
+    """
+    F = feed_flow.sum()
+    B = F - D
+    if D <= 0 or B <= 0:
+        raise RuntimeError("Distillate rate must be between 0 and the feed rate (%.4f kmol/hr)" % F)
+    if not 1 < feed_stage < N:
+        raise RuntimeError("Feed stage must be between 2 and %d" % (N - 1))
+    z = feed_flow / F
+    beta, x_F, y_F = flash(z, feed_T, feed_P, props)
+    h_F = (1 - beta) * enthalpy_liquid(np.array(feed_T), x_F, props) + beta * enthalpy_vapour(np.array(feed_T), y_F, props)
+
+    f = np.zeros((N, len(z)))
+    f[feed_stage - 1] = feed_flow
+    F_cum = np.zeros(N)
+    F_cum[feed_stage - 1:] = F
+    U = np.zeros(N)
+    U[0] = D
+    L = np.empty(N)
+    L[-1] = B
+
+    def sweep(T, V):
+        # One bubble-point iteration: component balances, bubble points, energy balances
+        L[:-1] = V[1:] + F_cum[:-1] - D
+        K = vapour_pressure(T[:, None], props)[0] / P[:, None]
+        x, y = solve_component_balances(L, V, U, K, eff, f)
+        x = np.clip(x, 0, None)
+        y = np.clip(y, 0, None)
+        x /= x.sum(1)[:, None]
+        y /= y.sum(1)[:, None]
+        T = bubble_point(x, P, T, props)
+
+        # Energy balances around the top of the column give the vapour profile directly
+        h = enthalpy_liquid(T, x, props)
+        H = enthalpy_vapour(T, y, props)
+        Q_c = (RR + 1) * D * (H[1] - h[0])
+        V = V.copy()
+        V[1] = (RR + 1) * D
+        V[2:] = (D * h[0] + Q_c - F_cum[1:-1] * h_F + (F_cum[1:-1] - D) * h[1:-1]) / (H[2:] - h[1:-1])
+        if np.any(V[1:] <= 0):
+            raise RuntimeError("Column energy balance gives negative vapour flows")
+        return T, V, x, y, h, Q_c
+
+    if guess is not None and len(guess["T"]) == N:
+        T, V = guess["T"].copy(), guess["V"].copy()
+    else:
+        # Initial guess: constant molal overflow and the feed bubble point on every stage
+        T = bubble_point(np.tile(z, (N, 1)), P, np.full(N, feed_T), props)
+        V = np.full(N, (RR + 1) * D)
+        V[0] = 0
+
+    # The plain bubble-point iteration oscillates on pinched columns, so the fixed
+    # point of the sweep is found with Anderson acceleration on (T, ln V)
+    state = np.concatenate([T, np.log(V[1:])])
+    states, residuals = [], []
+    for iteration in range(1, max_iter + 1):
+        T, V[1:] = state[:N], np.exp(state[N:])
+        T_new, V_new, x, y, h, Q_c = sweep(T, V)
+        residual = np.concatenate([T_new, np.log(V_new[1:])]) - state
+        if np.sum(residual ** 2) < tol:
+            T, V = T_new, V_new
+            break
+        states.append(state)
+        residuals.append(residual)
+        if len(states) > ANDERSON_DEPTH + 1:
+            states.pop(0)
+            residuals.pop(0)
+        state = state + residual
+        if len(states) > 1:
+            dS = np.diff(states, axis=0).T
+            dR = np.diff(residuals, axis=0).T
+            gamma = np.linalg.lstsq(dR, residual, rcond=None)[0]
+            state -= (dS + dR) @ gamma
+    else:
+        raise RuntimeError("Column did not converge in %d iterations" % max_iter)
+
+    K = vapour_pressure(T[:, None], props)[0] / P[:, None]
+    L[:-1] = V[1:] + F_cum[:-1] - D
+    Q_r = D * h[0] + B * h[-1] + Q_c - F * h_F
+    return dict(T=T, P=P, x=x, y=y, K=K, L=L, V=V, D=D, B=B, Q_cond=Q_c / 3600, Q_reb=Q_r / 3600, iterations=iteration)
+
+
+def hydraulics(result, props):
+    """
+    Liquid leaving and vapour entering each stage, as reported by RadFrac.
+    :return: dict of molecular weights [kg/kmol], densities [kg/m3] and volume flows [m3/s]
+    """
+    x, y, T, P = result["x"], result["y"], result["T"], result["P"]
+    MW_L = x @ props["MW"]
+    MW_V = y @ props["MW"]
+    density_liquid = MW_L / (x @ props["Vm"]) * 1000
+    density_vapour = P * 1e5 * MW_V / (R * 1000 * T)
+
+    hyd = dict(MW_L=MW_L, density_L=density_liquid, volume_L=result["L"] * MW_L / 3600 / density_liquid)
+    # Vapour to stage j comes from stage j + 1, nothing enters the reboiler
+    hyd["MW_V"] = np.append(MW_V[1:], 0.0)
+    hyd["density_V"] = np.append(density_vapour[1:], 0.0)
+    hyd["volume_V"] = np.append(result["V"][1:] * MW_V[1:] / 3600 / density_vapour[1:], 0.0)
+    # Vapour leaving each stage, used for tray sizing
+    hyd["mass_V_out"] = result["V"] * MW_V / 3600
+    hyd["density_V_out"] = density_vapour
+    return hyd
+
+
+def size_trays(result, hyd, first, last, tray_spacing, tray_type):
+    """
+    Size stages first..last (1-indexed) for the design approach to flooding.
+    :return: dict of column area and downcomer area of each sized stage [m2], diameter and weir length [m]
+    """
+    j = np.arange(first - 1, last)
+    density_liquid = hyd["density_L"][j]
+    density_vapour = hyd["density_V_out"][j]
+    mass_L = result["L"][j] * hyd["MW_L"][j] / 3600
+    mass_V = hyd["mass_V_out"][j]
+    f_lv = mass_L / mass_V * np.sqrt(density_vapour / density_liquid)
+    K1 = np.maximum(graph.K1(f_lv, tray_spacing, tray_type), 1e-3)
+    u_flood = K1 * np.sqrt((density_liquid - density_vapour) / density_vapour)
+    net_area = mass_V / density_vapour / (FLOODING_FACTOR * u_flood)
+    total_area = net_area / (1 - DOWNCOMER_FRAC)
+    diameter = np.sqrt(4 * total_area.max() / np.pi)
+    # Chord of the segmental downcomer: theta - sin(theta) = 2 pi Ad/Ac
+    theta = opt.brentq(lambda t: t - np.sin(t) - 2 * np.pi * DOWNCOMER_FRAC, 0.0, np.pi)
+    return dict(stages=j + 1, total_area=total_area, side_area=DOWNCOMER_FRAC * total_area,
+        diameter=diameter, weir_length=diameter * np.sin(theta / 2))
+
+
+class Node:
+    """
+    Node of the variable tree, with the attributes of an Aspen tree node used by model.Model.
+    """
+    def __init__(self, name, value=None):
+        self.Name = name
+        self.Value = value
+        self.children = dict()
+
+    @property
+    def Elements(self):
+        return list(self.children.values())
+
+    def AttributeValue(self, attribute):
+        # Attribute 38 is queried to check whether the node has child elements
+        return 1 if self.children else 0
+
+    def child(self, name):
+        if name not in self.children:
+            self.children[name] = Node(name)
+        return self.children[name]
+
+
+class Tree(Node):
+    def FindNode(self, path):
+        """
+        Walk a backslash separated path. Like Aspen, list entries below an
+        Input node are created on first access; missing outputs return None.
+        """
+        names = path.strip("\\").split("\\")
+        create = "Input" in names
+        node = self
+        for name in names:
+            if name not in node.children and not create:
+                return None
+            node = node.child(name)
+        return node
+
+    def set(self, path, value):
+        node = self
+        for name in path.strip("\\").split("\\"):
+            node = node.child(name)
+        node.Value = value
+        return node
+
+
+class MeshDocument:
+    """
+    Stand-in for an "Apwn.Document" running the equilibrium-stage column model.
+    """
+    def __init__(self, filepath=None):
+        self.Visible = 0
+        self.SuppressDialogs = 1
+        self.Tree = Tree("Root")
+        self.result = None
+        if filepath is not None:
+            self.InitFromArchive2(filepath)
+
+    def InitFromArchive2(self, filepath):
+        case = bkp.read_case(filepath)
+        self.result = None
+        self.components = case["components"]
+        self.props = component_properties(self.components, case["dbnames"])
+
+        tree = self.Tree = Tree("Root")
+        stream = "\\Data\\Streams\\1\\Input\\"
+        for component, flow in zip(self.components, case["feed_flow"]):
+            tree.set(stream + "FLOW\\MIXED\\" + component, flow)
+        tree.set(stream + "TOTFLOW\\MIXED", sum(case["feed_flow"]))
+        tree.set(stream + "TEMP\\MIXED", conversions.kelvin_to_celcius(case["feed_T"]))
+        tree.set(stream + "PRES\\MIXED", case["feed_P"])
+
+        block = "\\Data\\Blocks\\B1\\Input\\"
+        tree.set(block + "NSTAGE", case["N"])
+        tree.set(block + "FEED_STAGE\\1", case["feed_stage"])
+        tree.set(block + "PRES1", case["P_cond"])
+        tree.set(block + "BASIS_D", case["D"])
+        tree.set(block + "BASIS_RR", case["RR"])
+        tree.set(block + "VIEW_PRES", case["view_pres"])
+        tree.set(block + "DP_COL", 0.0)
+        for stage, eff in case["stage_eff"].items():
+            tree.set(block + "STAGE_EFF\\%d" % stage, eff)
+        for i, (start, end, dp) in enumerate(case["pdrop_sec"], 1):
+            tree.set(block + "PRES_STAGE1\\%d" % i, start)
+            tree.set(block + "PRES_STAGE2\\%d" % i, end)
+            tree.set(block + "PDROP_SEC\\%d" % i, dp)
+
+        sizing = "\\Data\\Blocks\\B1\\Subobjects\\Tray Sizing\\1\\Input\\"
+        tree.set(sizing + "TS_STAGE1\\1", case["ts_stage1"])
+        tree.set(sizing + "TS_STAGE2\\1", case["ts_stage2"])
+        tree.set(sizing + "TS_TRAYTYPE\\1", case["tray_type"])
+        tree.set(sizing + "TS_NPASS\\1", case["num_pass"])
+        tree.set(sizing + "TS_TSPACE\\1", case["tray_spacing"])
+
+    def getInput(self, path):
+        return self.Tree.FindNode("\\Data\\Blocks\\B1\\Input\\" + path).Value
+
+    def stage_pressures(self, N):
+        P = np.full(N, float(self.getInput("PRES1")))
+        if self.getInput("VIEW_PRES") == "PDROP":
+            dp = np.zeros(N)
+            for key in self.Tree.FindNode("\\Data\\Blocks\\B1\\Input\\PDROP_SEC").children:
+                start = int(self.getInput("PRES_STAGE1\\" + key))
+                end = int(self.getInput("PRES_STAGE2\\" + key))
+                if not 2 <= start <= end <= N or np.any(dp[start - 1:end]):
+                    raise RuntimeError("Pressure drop section %s (stages %d to %d) is not valid" % (key, start, end))
+                dp[start - 1:end] = float(self.getInput("PDROP_SEC\\" + key))
+            P += np.cumsum(dp)
+        else:
+            P[1:] += float(self.getInput("DP_COL")) * np.arange(N - 1) / (N - 2)
+        return P
+
+    def stage_efficiencies(self, N):
+        node = self.Tree.FindNode("\\Data\\Blocks\\B1\\Input\\STAGE_EFF")
+        specified = sorted((int(k), float(n.Value)) for k, n in node.children.items() if 1 <= int(k) <= N)
+        eff = np.ones(N)
+        if specified:
+            stages, values = zip(*specified)
+            eff = np.interp(np.arange(1, N + 1), stages, values)
+        eff[0] = eff[-1] = 1.0
+        return eff
+
+    def Reinit(self):
+        # Drop the converged profile, the next run starts from the constant molal overflow guess
+        self.result = None
+
+    def Run2(self):
+        """
+        Solve the column, starting from the last converged profile unless
+        reinitialized. All results of the previous run are removed first.
+        """
+        tree = self.Tree
+        for path in ["\\Data\\Blocks\\B1", "\\Data\\Blocks\\B1\\Subobjects\\Tray Sizing\\1"] + ["\\Data\\Streams\\%d" % i for i in range(1, 4)]:
+            node = tree.FindNode(path)
+            if node is not None:
+                node.children.pop("Output", None)
+        guess, self.result = self.result, None
+
+        N = int(self.getInput("NSTAGE"))
+        feed_flow = np.array([float(tree.FindNode("\\Data\\Streams\\1\\Input\\FLOW\\MIXED\\" + c).Value) for c in self.components])
+        feed_T = conversions.celcius_to_kelvin(float(tree.FindNode("\\Data\\Streams\\1\\Input\\TEMP\\MIXED").Value))
+        feed_P = float(tree.FindNode("\\Data\\Streams\\1\\Input\\PRES\\MIXED").Value)
+        result = solve_column(self.props, feed_flow, feed_T, feed_P, N, int(self.getInput("FEED_STAGE\\1")),
+            float(self.getInput("BASIS_D")), float(self.getInput("BASIS_RR")), self.stage_pressures(N), self.stage_efficiencies(N),
+            guess=guess)
+        self.result = result
+
+        sizing = "\\Data\\Blocks\\B1\\Subobjects\\Tray Sizing\\1\\"
+        hyd = hydraulics(result, self.props)
+        trays = size_trays(result, hyd,
+            int(tree.FindNode(sizing + "Input\\TS_STAGE1\\1").Value),
+            int(tree.FindNode(sizing + "Input\\TS_STAGE2\\1").Value),
+            float(tree.FindNode(sizing + "Input\\TS_TSPACE\\1").Value),
+            tree.FindNode(sizing + "Input\\TS_TRAYTYPE\\1").Value)
+
+        block = "\\Data\\Blocks\\B1\\Output\\"
+        tree.set(block + "ITERATIONS", result["iterations"])
+        tree.set(block + "COND_DUTY", -conversions.kJPerSec_to_calPerSec(result["Q_cond"]))
+        tree.set(block + "REB_DUTY", conversions.kJPerSec_to_calPerSec(result["Q_reb"]))
+        product = np.zeros(N)
+        product[0], product[-1] = result["D"], result["B"]
+        profiles = dict(
+            B_TEMP=conversions.kelvin_to_celcius(result["T"]),
+            B_PRES=result["P"],
+            PROD_LFLOW=product,
+            HYD_MWL=hyd["MW_L"],
+            HYD_MWV=hyd["MW_V"],
+            HYD_RHOL=conversions.kgM3_to_gmCc(hyd["density_L"]),
+            HYD_RHOV=conversions.kgM3_to_gmCc(hyd["density_V"]),
+            HYD_VVF=conversions.m3Sec_to_lMin(hyd["volume_V"]),
+            HYD_LVF=conversions.m3Sec_to_lMin(hyd["volume_L"]),
+        )
+        for var, values in profiles.items():
+            for stage, value in enumerate(values, 1):
+                tree.set(block + "%s\\%d" % (var, stage), float(value))
+        for stage in range(1, N + 1):
+            for component, K in zip(self.components, result["K"][stage - 1]):
+                tree.set(block + "B_K\\%d\\%s" % (stage, component), float(K))
+
+        tray = sizing + "Output\\"
+        tree.set(tray + "DIAM4\\1", float(trays["diameter"]))
+        tree.set(tray + "DCLENG1\\1", float(trays["weir_length"]))
+        for stage, total, side in zip(trays["stages"], trays["total_area"], trays["side_area"]):
+            tree.set(tray + "TOT_AREA\\1\\%d" % stage, float(total))
+            tree.set(tray + "SIDE_AREA\\1\\%d" % stage, float(side))
+
+        streams = {"1": feed_flow, "2": result["D"] * result["x"][0], "3": result["B"] * result["x"][-1]}
+        for stream, flows in streams.items():
+            for prefix in ["", "STR_MAIN\\"]:
+                path = "\\Data\\Streams\\%s\\Output\\%s" % (stream, prefix)
+                tree.set(path + "MOLEFLMX\\MIXED", float(flows.sum()))
+                for component, flow in zip(self.components, flows):
+                    tree.set(path + "MOLEFLOW\\MIXED\\" + component, float(flow))
+
+    def Close(self):
+        self.Tree = Tree("Root")
@@ -0,0 +1,140 @@
+"""
+Instrumentation of the evaluation loop: per-phase timers, simulator call
+counters and the statistics of caches and indexes, in one registry.
+
+A model given a Metrics registry times the phases of every run (input
+writes, Reinit, Run2, output readback, calc_tac) and counts the calls made
+on its simulator document; its optimizer times each constraint callback and
+counts failed simulations. Without a registry nothing is wrapped and every
+phase is a shared no-op context, so the cost is one function call per phase.
+
+    registry = metrics.Metrics("run.prom")
+    model = m.Model(..., metrics=registry)
+    optimizer = optimize.Optimizer(model, ...)
+    optimizer.run() # prints registry.summary() at the end; run.prom is rewritten every iteration
+
+Snapshots are JSON (Metrics.json) or Prometheus text exposition format
+(Metrics.prometheus), chosen by the extension of the export file.
+"""
+import os
+import json
+import time
+import contextlib
+import collections
+import simulator
+
+NULL = contextlib.nullcontext()
+
+def phase(metrics, name):
+    """
+    Context timing a phase in metrics, a no-op when metrics is None.
+    """
+    return metrics.phase(name) if metrics is not None else NULL
+
+class Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.metrics.timers[self.name] += time.perf_counter() - self.start
+        self.metrics.calls[self.name] += 1
+
+class Metrics:
+    def __init__(self, filepath: str = None):
+        """
+        :param filepath: file rewritten by export(), Prometheus text unless it ends in .json
+        """
+        self.filepath = filepath
+        self.timers = collections.defaultdict(float)
+        self.calls = collections.Counter()
+        self.counters = collections.Counter()
+        self.com = collections.Counter()
+        self.sources = dict()
+        self.start = time.time()
+
+    def phase(self, name):
+        return Timer(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def instrument(self, obj):
+        """
+        Wrap a simulator document so that the calls made on it are counted (see simulator.CountingDocument).
+        """
+        return simulator.CountingDocument(obj, self.com)
+
+    def register(self, name, source):
+        """
+        Add the statistics of another component to the snapshots.
+        :param source: callable returning a dict of numbers, e.g. lambda: cache.stats
+        """
+        self.sources[name] = source
+
+    def snapshot(self):
+        sources = dict()
+        for name, source in self.sources.items():
+            sources[name] = dict((key, value) for key, value in source().items() if isinstance(value, (int, float)))
+        return dict(
+            elapsed = time.time() - self.start,
+            phases = dict((name, dict(calls=self.calls[name], seconds=self.timers[name],
+                mean=self.timers[name] / self.calls[name] if self.calls[name] else 0.0)) for name in self.timers),
+            com_calls = dict(self.com),
+            counters = dict(self.counters),
+            sources = sources,
+        )
+
+    def json(self):
+        return json.dumps(self.snapshot(), indent=1, default=float)
+
+    def prometheus(self, prefix: str = "distillation"):
+        """
+        Snapshot in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = ["# TYPE %s_phase_seconds_total counter" % prefix]
+        lines += ['%s_phase_seconds_total{phase="%s"} %.9g' % (prefix, name, phase["seconds"]) for name, phase in sorted(snapshot["phases"].items())]
+        lines.append("# TYPE %s_phase_calls_total counter" % prefix)
+        lines += ['%s_phase_calls_total{phase="%s"} %d' % (prefix, name, phase["calls"]) for name, phase in sorted(snapshot["phases"].items())]
+        lines.append("# TYPE %s_com_calls_total counter" % prefix)
+        lines += ['%s_com_calls_total{call="%s"} %d' % (prefix, name, count) for name, count in sorted(snapshot["com_calls"].items())]
+        for name, count in sorted(snapshot["counters"].items()):
+            lines.append("# TYPE %s_%s_total counter" % (prefix, name))
+            lines.append("%s_%s_total %d" % (prefix, name, count))
+        for source, values in sorted(snapshot["sources"].items()):
+            lines += ['%s_%s{stat="%s"} %.9g' % (prefix, source, name, value) for name, value in sorted(values.items())]
+        lines.append("%s_elapsed_seconds %.3f" % (prefix, snapshot["elapsed"]))
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """
+        Rewrite the export file with the current snapshot, if there is one.
+        """
+        if self.filepath is None:
+            return
+        text = self.json() if self.filepath.endswith(".json") else self.prometheus()
+        temporary = self.filepath + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(text)
+        os.replace(temporary, self.filepath)
+
+    def summary(self):
+        """
+        Table of the time spent per phase, simulator calls and counters.
+        """
+        snapshot = self.snapshot()
+        lines = ['{0:46s}   {1:>8s}   {2:>10s}   {3:>10s}'.format('Phase', 'Calls', 'Seconds', 'Mean ms')]
+        for name, phase in sorted(snapshot["phases"].items(), key=lambda item: -item[1]["seconds"]):
+            lines.append('{0:46s}   {1:8d}   {2:10.3f}   {3:10.3f}'.format(name, phase["calls"], phase["seconds"], 1000 * phase["mean"]))
+        if snapshot["com_calls"]:
+            lines.append("Simulator calls: " + ", ".join("%s %d" % item for item in sorted(snapshot["com_calls"].items())))
+        if snapshot["counters"]:
+            lines.append("Counters: " + ", ".join("%s %d" % item for item in sorted(snapshot["counters"].items())))
+        for source, values in sorted(snapshot["sources"].items()):
+            lines.append("%s: %s" % (source.capitalize(), ", ".join("%s %g" % item for item in sorted(values.items()))))
+        return "\n".join(lines)
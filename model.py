@@ -1,19 +1,42 @@
 import os
-import win32com.client as win32
-import conversions
+import bkp
+import costing
 import time
 import collections
 import initialize
+import simulator
+import snapshot
+import metrics as mt
+import numpy as np
+
+# Inputs whose value changes the shape of the input tree (the STAGE_EFF and
+# PRES_STAGE entries are renumbered when NSTAGE changes)
+STRUCTURAL_INPUTS = (r"\Data\Blocks\B1\Input\NSTAGE",)
+
+# Attributes set by simulate() and calc_tac(), everything the optimizer reads after a run
+RESULTS = ("Q_cond", "Q_reb", "T_stage", "P_stage", "D", "molecular_weight_liquid", "molecular_weight_vapour",
+    "density_liquid", "density_vapour", "volume_flow_vapour", "volume_flow_liquid", "K_stage", "A_c", "A_d",
+    "weir_length", "diameter", "stream_flows", "feed_flow_rate", "stream_input_pres", "iterations",
+    "K", "recovery", "purity", "mole_flow", "mole_frac", "LK", "HK", "height", "energy_cost", "TAC")
+
 class Model:
     def __init__(self, filepath: str, main_component: str = None, hydraulics: bool = None,\
         P_cond: float = None, P_drop_1: float = None, P_drop_2: float = None,\
             RR: float = None, distilate_rate: float = None, N: float = None, feed_stage: float = None, \
                 tray_spacing: float = None, tray_type: str = None, num_pass: int = None, \
-                    tray_eff_1: float = None, tray_eff_2: float = None, n_years: int = None):
+                    tray_eff_1: float = None, tray_eff_2: float = None, n_years: int = None, backend = None, \
+                        warm_start: bool = None, warm_start_step: float = None, sessions = None, \
+                            metrics = None):
         """
         Design Parameters
         :param filepath: path to the model file
         :param components: list of component names [ordered]
+        :param backend: simulator backend, "aspen", "mesh" or a simulator backend instance
+        :param warm_start: start each run from the last converged column instead of reinitializing
+        :param warm_start_step: largest relative change of the column inputs to warm start from
+        :param sessions: sessions.SessionManager to lease the simulator from instead of starting one,
+            its backend is used
+        :param metrics: metrics.Metrics registry timing the phases of every run and counting simulator calls
 
         Manipulated Variables
         :param P_cond: condenser pressure [bar]
@@ -51,15 +74,31 @@ class Model:
         self.tray_eff_1 = tray_eff_1 if tray_eff_1 is not None else self.init_var()["tray_eff_1"]
         self.tray_eff_2 = tray_eff_2 if tray_eff_2 is not None else self.init_var()["tray_eff_2"]
         self.n_years = n_years if n_years is not None else self.init_var()["n_years"]
-
-        # Create COM object (Import Aspen File as an Object)
-        self.obj = win32.Dispatch("Apwn.Document")
-        self.obj.InitFromArchive2(self.filepath)
-        self.obj.Visible = 1
-        self.obj.SuppressDialogs = 1
-
-        # Get all components
-        self.components = list(self.getLeafs("\\Data\\Streams\\1\\Input\\FLOW\\MIXED").keys())
+        self.backend = backend if backend is not None else self.init_var()["backend"]
+        self.backend = sessions.backend.name if sessions is not None else self.backend
+        self.warm_start = warm_start if warm_start is not None else self.init_var()["warm_start"]
+        self.warm_start_step = warm_start_step if warm_start_step is not None else self.init_var()["warm_start_step"]
+
+        # Create simulator document (Import Aspen File as an Object), or lease a running one
+        self.lease = sessions.acquire(self.filepath) if sessions is not None else None
+        self.obj = self.lease.document if self.lease is not None else simulator.get_backend(self.backend).open(self.filepath)
+        self.metrics = metrics
+        if metrics is not None:
+            self.obj = metrics.instrument(self.obj)
+        # Node handles by path, and the last value pushed to each input
+        self.nodes = dict()
+        self.pushed = dict()
+        # Column inputs of the last converged run, None after a failed run
+        self.converged_state = None
+        self.run_stats = collections.Counter()
+        # Incremented whenever new results are read or loaded, for caches of derived quantities
+        self.version = 0
+
+        # Get all components, from the archive when there is one
+        if os.path.splitext(self.filepath)[1].lower() == ".bkp":
+            self.components = bkp.read_case(self.filepath)["components"]
+        else:
+            self.components = snapshot.read_leaves(self.obj.Tree.FindNode("\\Data\\Streams\\1\\Input\\FLOW\\MIXED"))[0]
         self.main_component = main_component if main_component is not None else self.components[0]
         
     def init_var(self):
@@ -78,7 +117,10 @@ class Model:
             P_drop_1 = 0,
             P_drop_2 = 0,
             n_years = 3,
-            hydraulics = True
+            hydraulics = True,
+            backend = "aspen",
+            warm_start = False,
+            warm_start_step = 0.05
         )
 
     def update_manipulated(self, hydraulics: bool = None, P_cond: float = None, P_drop_1: float = None, P_drop_2: float = None, \
@@ -105,11 +147,40 @@ class Model:
         self.P_drop_1 = 0.01 if self.P_drop_1 == 0 else self.P_drop_1
         self.P_drop_2 = 0.01 if self.P_drop_2 == 0 else self.P_drop_2
     
+    def node(self, path):
+        """
+        Tree node at path. The handle is resolved once and reused until the
+        tree structure changes.
+        """
+        node = self.nodes.get(path)
+        if node is None:
+            node = self.nodes[path] = self.obj.Tree.FindNode(path)
+        return node
+
+    def invalidate_nodes(self):
+        self.nodes.clear()
+
     def setValue(self, path, value):
-        self.obj.Tree.FindNode(path).Value = value
+        """
+        Write an input; nothing is sent if the value was already pushed.
+        """
+        if path in self.pushed and self.pushed[path] == value:
+            return
+        self.node(path).Value = value
+        if path in STRUCTURAL_INPUTS:
+            # Stage numbered handles and values may not survive the reshape
+            self.invalidate_nodes()
+            self.pushed.clear()
+        self.pushed[path] = value
 
     def getValue(self, path):
-        return self.obj.Tree.FindNode(path).Value
+        return self.node(path).Value
+
+    def current(self, path):
+        """
+        Current value of an input, from the pushed values when known.
+        """
+        return self.pushed[path] if path in self.pushed else self.getValue(path)
 
     def getLeafs(self, path):
         output = dict()
@@ -131,8 +202,8 @@ class Model:
             self.setValue(r"\Data\Blocks\B1\Input\PDROP_SEC\2", self.P_drop_2)
             # If current 2nd start stage is smaller then upcoming 1st end stage, then set the upcoming 2nd start stage first
             self.setValue(r"\Data\Blocks\B1\Input\PRES_STAGE1\1", self.P_start_1)
-            curr2start = self.getValue(r"\Data\Blocks\B1\Input\PRES_STAGE1\2")
-            curr2end = self.getValue(r"\Data\Blocks\B1\Input\PRES_STAGE2\2")
+            curr2start = self.current(r"\Data\Blocks\B1\Input\PRES_STAGE1\2")
+            curr2end = self.current(r"\Data\Blocks\B1\Input\PRES_STAGE2\2")
             if (self.P_end_1 >= curr2start):
                 if (self.P_end_2 >= curr2end):
                     self.setValue(r"\Data\Blocks\B1\Input\PRES_STAGE2\2", self.P_end_2)
@@ -179,146 +250,169 @@ class Model:
         self.P_end_1 = self.feed_stage
         self.P_end_2 = self.N - 1
 
-        currN = self.getValue(r"\Data\Blocks\B1\Input\NSTAGE")
-        if currN > self.N:
-            self.set_pressure_stages()
-            self.set_general_variables()
-        else:
-            self.set_general_variables()
-            self.set_pressure_stages()
+        with mt.phase(self.metrics, "inputs"):
+            currN = self.current(r"\Data\Blocks\B1\Input\NSTAGE")
+            if currN > self.N:
+                self.set_pressure_stages()
+                self.set_general_variables()
+            else:
+                self.set_general_variables()
+                self.set_pressure_stages()
 
-        # Reinit before run
-        self.obj.Reinit()
+        # Reinit before run, unless warm starting from a nearby converged column
+        state = self.column_state()
+        self.warm = self.warm_start and self.near_converged_state(state)
+        if not self.warm:
+            with mt.phase(self.metrics, "reinit"):
+                self.obj.Reinit()
+        self.converged_state = None
 
         # Run model
-        self.obj.Run2()
-
-        # List of output variables
-        blockOutput = ["COND_DUTY", "REB_DUTY", "B_PRES", "B_TEMP", "B_K", "PROD_LFLOW", \
-            "HYD_MWL", "HYD_MWV", "HYD_RHOL", "HYD_RHOV", "HYD_VVF", "HYD_LVF"]
-
-        streamOutput = ["MOLEFLMX", "MOLEFLOW", "STR_MAIN"]
-
-        trayOutput = ["DIAM4", "DCLENG1", "TOT_AREA", "SIDE_AREA"]
-        
-        self.blockOutput = dict()
-        self.streamOutput = dict()
-        self.trayOutput = dict()
-        
-        # Get output values
-        for var in blockOutput:
-            self.blockOutput[var] = self.getLeafs("\\Data\\Blocks\\B1\\Output\\" + var)
-
-        for var in trayOutput:
-            self.trayOutput[var] = self.getLeafs("\\Data\\Blocks\\B1\\Subobjects\\Tray Sizing\\1\\Output\\" + var + "\\1")
-        
-        for i in range(1, 4):
-            for var in streamOutput:
-                stream = dict()
-                stream[var] = self.getLeafs("\\Data\\Streams\\" + str(i) + "\\Output\\" + var)
-            self.streamOutput[str(i)] = stream
-
-        self.feed_flow_rate = self.getValue("\\Data\\Streams\\1\\Input\\TOTFLOW\\MIXED")
-        self.stream_input_pres = self.getValue("\\Data\\Streams\\1\\Input\\PRES\\MIXED")
+        start_time = time.time()
+        with mt.phase(self.metrics, "run2"):
+            self.obj.Run2()
+        self.run_time = time.time() - start_time
 
-        self.T_stage = list(self.blockOutput["B_TEMP"].values())
-        self.P_stage = list(self.blockOutput["B_PRES"].values())
-        self.molecular_weight_liquid = list(self.blockOutput["HYD_MWL"].values())
-        self.molecular_weight_vapour = list(self.blockOutput["HYD_MWV"].values())
-        self.density_liquid = list(self.blockOutput["HYD_RHOL"].values()) # gm_cc
-        self.density_vapour = list(self.blockOutput["HYD_RHOV"].values()) # gm_cc
-        self.volume_flow_vapour = list(self.blockOutput["HYD_VVF"].values()) #l_min
-        self.volume_flow_liquid = list(self.blockOutput["HYD_LVF"].values()) #l_min
-        self.Q_cond = self.blockOutput["COND_DUTY"] # cal_sec
-        self.Q_reb = self.blockOutput["REB_DUTY"] #  cal_sec
-        self.D = list(self.blockOutput["PROD_LFLOW"].values()) #kmol_hr
-        self.A_c = max(self.trayOutput["TOT_AREA"].values()) #sqm
-        self.A_d = max(self.trayOutput["SIDE_AREA"].values()) # sqm
-        self.weir_length = self.trayOutput["DCLENG1"]
-        self.diameter = self.trayOutput["DIAM4"]
-
-        self.K = dict()
-        self.recovery = dict()
-        self.purity = dict()
-        self.mole_frac = dict()
-        self.mole_flow = dict()
-        for component in self.components:
-            self.recovery[component] = self.streamOutput["2"]["STR_MAIN"]["MOLEFLOW"]["MIXED"][component] \
-                / (self.streamOutput["2"]["STR_MAIN"]["MOLEFLOW"]["MIXED"][component] \
-                    +self.streamOutput["3"]["STR_MAIN"]["MOLEFLOW"]["MIXED"][component])
-            self.purity[component] = self.streamOutput["2"]["STR_MAIN"]["MOLEFLOW"]["MIXED"][component] \
-                / self.streamOutput["2"]["STR_MAIN"]["MOLEFLMX"]["MIXED"]
-            self.K[component] = self.blockOutput["B_K"][str(self.feed_stage)][component]
-            self.mole_flow[component] = self.getValue("\\Data\\Streams\\1\\Input\\FLOW\\MIXED\\" + component)
-            self.mole_frac[component] = self.mole_flow[component]/self.streamOutput["1"]["STR_MAIN"]["MOLEFLMX"]["MIXED"]
+        with mt.phase(self.metrics, "readback"):
+            self.read_outputs()
+        self.converged_state = state
+        self.record_run()
 
         # Order K by compoenent K
         self.K = collections.OrderedDict(sorted(self.K.items(), key=lambda t: t[1]))
         self.LK = self.main_component
         self.HK = list(self.K.items())[list(self.K).index(self.main_component) - 1][0]
 
-    def calc_energy_cost(self, steam_type):
-        energy_cost = 0.0
-        # Energy cost
-        energy_cost = 0.354 * conversions.calPerSec_to_GJPerYear(abs(self.Q_cond))
-        if steam_type == "hp":
-            energy_cost += 9.88 * conversions.calPerSec_to_GJPerYear(abs(self.Q_reb))
-        else:
-            energy_cost += 7.78 * conversions.calPerSec_to_GJPerYear(abs(self.Q_reb))
-
-        return energy_cost
-
-    def calc_tac(self):
-        # Calculate Total Annualized Cost
-        # Cooling Water
-        t_in_hot_cond = self.T_stage[1]
-        t_out_cold_cond = 35.0
-        t_out_hot_cond = self.T_stage[0]
-        t_in_cold_cond = 25.0
-        
-        # Steam
-        t_in_cold_reb = self.T_stage[-2]
-        t_out_cold_reb = self.T_stage[-1]
-        # T_in_cold_reb must be at least 10 deg C below T_in_cold_reb
-        if t_in_cold_reb > 160.0 - 10.0:
-            # Use hp steam temp
-            steam = "hp"
-            t_in_hot_reb = 254.0
-            t_out_hot_reb = 253.0
-        else:
-            # Use lp steam temp
-            steam = "lp"
-            t_in_hot_reb = 160.0
-            t_out_hot_reb = 159.0
-
-        del_t_mean_cond = (0.5 * (t_in_hot_cond - t_out_cold_cond) * (t_out_hot_cond - t_in_cold_cond) * (t_in_hot_cond - t_out_cold_cond + t_out_hot_cond - t_in_cold_cond)) ** (1./3)
-        del_t_mean_reb = (0.5 * (t_in_hot_reb - t_out_cold_reb) * (t_out_hot_reb - t_in_cold_reb) * (t_in_hot_reb - t_out_cold_reb + t_out_hot_reb - t_in_cold_reb)) ** (1./3)
+    def column_state(self):
+        """
+        Inputs that determine the converged column profile. Tray sizing inputs
+        are left out as they do not affect it.
+        :return: tuple of inputs that must match to warm start, array of continuous inputs
+        """
+        return (self.N, self.feed_stage, self.hydraulics), \
+            np.array([self.RR, self.distilate_rate, self.P_cond, self.P_drop_1, self.P_drop_2, self.tray_eff_1, self.tray_eff_2], dtype=float)
+
+    def near_converged_state(self, state):
+        if self.converged_state is None or state[0] != self.converged_state[0]:
+            return False
+        last = self.converged_state[1]
+        step = np.abs(state[1] - last) / np.maximum(np.abs(last), 1e-3)
+        return step.max() <= self.warm_start_step
+
+    def record_run(self):
+        mode = "warm" if self.warm else "cold"
+        self.run_stats[mode + "_runs"] += 1
+        self.run_stats[mode + "_time"] += self.run_time
+        if self.iterations is not None:
+            self.run_stats[mode + "_iterations"] += self.iterations
+
+    def warm_start_summary(self):
+        """
+        Number of warm and cold started runs with their mean Run2 time [s] and
+        mean solver iterations (when reported by the backend).
+        """
+        summary = dict()
+        for mode in ["warm", "cold"]:
+            runs = self.run_stats[mode + "_runs"]
+            summary[mode] = dict(
+                runs = runs,
+                time = self.run_stats[mode + "_time"] / runs if runs else None,
+                iterations = self.run_stats[mode + "_iterations"] / runs if runs and mode + "_iterations" in self.run_stats else None,
+            )
+        return summary
+
+    def read_outputs(self):
+        """
+        Read the results of the last run. Each output subtree is resolved once
+        and walked through its node handles (see snapshot.py).
+        :param K_stage: K values of each stage, stages x components
+        :param stream_flows: component flows of streams 1 (feed), 2 (distillate) and 3 (bottoms) [kmol_hr]
+        """
+        tree = self.obj.Tree
+        block = "\\Data\\Blocks\\B1\\Output\\"
+        tray = "\\Data\\Blocks\\B1\\Subobjects\\Tray Sizing\\1\\Output\\"
+
+        iterations = tree.FindNode(block + "ITERATIONS") # Only reported by the mesh backend
+        self.iterations = iterations.Value if iterations is not None else None
+        self.Q_cond = tree.FindNode(block + "COND_DUTY").Value # cal_sec
+        self.Q_reb = tree.FindNode(block + "REB_DUTY").Value #  cal_sec
+        self.T_stage = snapshot.read_vector(tree.FindNode(block + "B_TEMP"))[1]
+        self.P_stage = snapshot.read_vector(tree.FindNode(block + "B_PRES"))[1]
+        self.D = snapshot.read_vector(tree.FindNode(block + "PROD_LFLOW"))[1] #kmol_hr
+        self.molecular_weight_liquid = snapshot.read_vector(tree.FindNode(block + "HYD_MWL"))[1]
+        self.molecular_weight_vapour = snapshot.read_vector(tree.FindNode(block + "HYD_MWV"))[1]
+        self.density_liquid = snapshot.read_vector(tree.FindNode(block + "HYD_RHOL"))[1] # gm_cc
+        self.density_vapour = snapshot.read_vector(tree.FindNode(block + "HYD_RHOV"))[1] # gm_cc
+        self.volume_flow_vapour = snapshot.read_vector(tree.FindNode(block + "HYD_VVF"))[1] #l_min
+        self.volume_flow_liquid = snapshot.read_vector(tree.FindNode(block + "HYD_LVF"))[1] #l_min
+        stages, self.K_stage = snapshot.read_matrix(tree.FindNode(block + "B_K"), self.components)
+
+        self.A_c = snapshot.read_vector(tree.FindNode(tray + "TOT_AREA\\1"))[1].max() #sqm
+        self.A_d = snapshot.read_vector(tree.FindNode(tray + "SIDE_AREA\\1"))[1].max() # sqm
+        self.weir_length = tree.FindNode(tray + "DCLENG1\\1").Value
+        self.diameter = tree.FindNode(tray + "DIAM4\\1").Value
+
+        self.stream_flows = np.zeros((3, len(self.components)))
+        for i in range(3):
+            names, flows = snapshot.read_vector(tree.FindNode("\\Data\\Streams\\%d\\Output\\STR_MAIN\\MOLEFLOW\\MIXED" % (i + 1)))
+            self.stream_flows[i, [self.components.index(name) for name in names]] = flows
+        distillate_total = tree.FindNode("\\Data\\Streams\\2\\Output\\STR_MAIN\\MOLEFLMX\\MIXED").Value
+        feed_total = tree.FindNode("\\Data\\Streams\\1\\Output\\STR_MAIN\\MOLEFLMX\\MIXED").Value
+
+        names, mole_flow = snapshot.read_vector(self.node("\\Data\\Streams\\1\\Input\\FLOW\\MIXED"))
+        self.feed_flow_rate = self.getValue("\\Data\\Streams\\1\\Input\\TOTFLOW\\MIXED")
+        self.stream_input_pres = self.getValue("\\Data\\Streams\\1\\Input\\PRES\\MIXED")
 
-        U_cond = 0.852
-        U_reb = 0.568
-        A_cond = abs(conversions.calPerSec_to_kJPerSec(self.Q_cond))/(U_cond * del_t_mean_cond)
-        A_reb = abs(conversions.calPerSec_to_kJPerSec(self.Q_reb))/(U_reb * del_t_mean_reb)
+        feed_row = self.K_stage[stages.index(str(self.feed_stage))]
+        distillate, bottoms = self.stream_flows[1], self.stream_flows[2]
+        self.K = dict(zip(self.components, feed_row))
+        self.recovery = dict(zip(self.components, distillate / (distillate + bottoms)))
+        self.purity = dict(zip(self.components, distillate / distillate_total))
+        self.mole_flow = dict(zip(names, mole_flow))
+        self.mole_frac = dict((component, self.mole_flow[component] / feed_total) for component in self.components)
+        self.version += 1
 
-        self.height = 1.2 * self.tray_spacing * self.N * 0.5 * (self.tray_eff_1 + self.tray_eff_2)
+    def export_results(self):
+        """
+        Results of the last run, as a picklable dict.
+        """
+        return dict((name, getattr(self, name)) for name in RESULTS)
 
-        C_cap_cond = 7296 * (A_cond ** 0.65)
-        C_cap_reb = 7296 * (A_reb ** 0.65)
-        C_cap_hx = C_cap_cond + C_cap_reb
-        C_cap_col = 17640 * (self.diameter ** 1.066) * (self.height ** 0.802)
-        if self.tray_type == "SIEVE":
-            C_cap_tray = 130 + 440 * (self.diameter ** (1.8)) * self.N * 0.5 * (self.tray_eff_1 + self.tray_eff_2)
-        elif self.tray_type == "CAPS":
-            C_cap_tray = 340 + 640 * (self.diameter ** (1.9)) * self.N * 0.5 * (self.tray_eff_1 + self.tray_eff_2)
+    def load_results(self, results):
+        """
+        Restore results saved with export_results, as if the run had just been made.
+        """
+        for name in RESULTS:
+            setattr(self, name, results[name])
+        self.version += 1
 
-        self.energy_cost = self.calc_energy_cost(steam)
+    def calc_energy_cost(self, steam_type):
+        # Energy cost, see costing.energy_cost
+        return float(costing.energy_cost(self.Q_cond, self.Q_reb, steam_type == "hp"))
 
-        self.TAC = ((C_cap_hx + C_cap_col + C_cap_tray) / self.n_years) + self.energy_cost
+    def calc_tac(self):
+        # Calculate Total Annualized Cost, see costing.tac
+        design = costing.inputs(dict(Q_cond=self.Q_cond, Q_reb=self.Q_reb, T_stage=self.T_stage, diameter=self.diameter))
+        design.update(N=self.N, tray_spacing=self.tray_spacing, tray_eff_1=self.tray_eff_1, tray_eff_2=self.tray_eff_2, tray_type=self.tray_type)
+        costs = costing.tac(design, n_years=self.n_years)
+        if not costs["valid"]:
+            raise ValueError("Condenser or reboiler temperatures cross, no heat exchanger area")
+        self.height = float(costs["height"])
+        self.energy_cost = float(costs["energy_cost"])
+        self.TAC = float(costs["TAC"])
 
     def run(self):
         start_time = time.time()
         self.simulate()
-        self.calc_tac()
+        with mt.phase(self.metrics, "calc_tac"):
+            self.calc_tac()
         return (time.time() - start_time)
 
     def close(self):
-        self.obj.Close()
\ No newline at end of file
+        self.invalidate_nodes()
+        self.pushed.clear()
+        if self.lease is not None:
+            # Hand the running simulator back to its manager
+            self.lease.release()
+        else:
+            self.obj.Close()
\ No newline at end of file
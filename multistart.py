@@ -0,0 +1,218 @@
+"""
+Multi-start optimization: independent SLSQP runs from diverse start points,
+sharing the simulator workers of one scheduler.Scheduler.
+
+The first start is the usual initialize estimate, the others are a Latin
+hypercube sample of the optimizer bounds. Each start is an SLSQP run in a
+thread of its own, on a copy of the model, whose simulations all go to the
+shared scheduler: the workers are busy with whichever start has a design to
+evaluate, and the scheduler deadlines apply to every start. Each start
+reports its iterations, and a start whose objective stays above the best
+feasible TAC found so far by more than margin for patience iterations is
+cancelled, making room for the next start.
+
+    with multistart.MultiStart(model, starts=8, opt_tolerance=1e-3) as search:
+        result = search.run()
+
+    search = multistart.MultiStart(model, pool=scheduler, starts=8)  # on the workers of an existing scheduler
+
+Scripts running a MultiStart must guard their entry point with
+if __name__ == "__main__": as workers are spawned processes on Windows.
+"""
+import copy
+import time
+import queue
+import threading
+import collections
+import numpy as np
+import scipy.optimize as opt
+import scipy.stats.qmc as qmc
+import model as m
+import optimize
+import evaluator
+import scheduler
+import cache
+import history
+
+# Optimizer options holding an object every start would share across threads
+SHARED = ("cache", "history", "checkpoint", "pool", "failure_index")
+
+def replica(model):
+    """
+    Copy of model for a start: it never runs, the results of the designs
+    simulated on the pool are loaded into it.
+    """
+    output = copy.copy(model)
+    output.nodes, output.pushed, output.run_stats = dict(), dict(), collections.Counter()
+    output.metrics = None
+    return output
+
+class Start:
+    """
+    One SLSQP run, from its start point until it finishes or is cancelled.
+    """
+    def __init__(self, index, x0):
+        self.index = index
+        self.x0 = x0
+        self.thread = None
+        self.cancel = threading.Event()
+        self.iterations = 0
+        self.fun = None
+        self.maxcv = None
+        self.worse = 0 # Consecutive iterations above the cancellation threshold
+        self.status = "pending"
+        self.result = None
+
+class MultiStart:
+    def __init__(self, model: m.Model, starts: int = 8, workers: int = None, pool: scheduler.Scheduler = None, seed: int = 0,
+            margin: float = 0.05, patience: int = 3, feasibility_tol: float = 1e-4, cache_path: str = None, history_path: str = None,
+            **options):
+        """
+        :param model: model, already run, whose case and settings every start uses
+        :param starts: number of start points, the initialize estimate included
+        :param workers: worker processes of the scheduler started for the search when there is no pool, default one per CPU
+        :param pool: scheduler.Scheduler every start simulates on, left open by close; as many starts as it has workers run at once
+        :param seed: seed of the Latin hypercube sample
+        :param margin: relative excess over the best feasible TAC above which a start counts as dominated
+        :param patience: dominated iterations in a row before a start is cancelled
+        :param feasibility_tol: largest total constraint violation of a feasible design, SLSQP stops within its tolerance of the bounds
+        :param cache_path: evaluation cache file shared by the starts, None for no cache
+        :param history_path: run history file every start records its evaluations in, as a run of its own, None for no history
+        :param options: keyword arguments of optimize.Optimizer for every start, except the objects of SHARED:
+            each start opens its own cache and history from cache_path and history_path
+        """
+        shared = [name for name in SHARED if name in options]
+        if shared:
+            raise ValueError("MultiStart starts cannot share %s, give cache_path or history_path instead" % ", ".join(shared))
+        self.model = model
+        self.starts = starts
+        self.owned = pool is None
+        self.pool = pool if pool is not None else scheduler.Scheduler.from_model(model, workers)
+        self.size = self.pool.size
+        self.seed = seed
+        self.margin = margin
+        self.patience = patience
+        self.feasibility_tol = feasibility_tol
+        self.cache_path = cache_path
+        self.history_path = history_path
+        self.options = dict(options, verbose=False)
+        self.messages = queue.Queue()
+
+    def start_points(self):
+        optimizer = optimize.Optimizer(self.model, **self.options)
+        x0, constraints, bounds = optimizer.problem()
+        lb, ub = np.asarray(bounds.lb, dtype=float), np.asarray(bounds.ub, dtype=float)
+        sample = qmc.LatinHypercube(d=len(x0), seed=self.seed).random(self.starts - 1)
+        # keep_feasible bounds: start strictly inside them
+        points = lb + (ub - lb) * np.clip(sample, 1e-6, 1 - 1e-6)
+        return [np.asarray(x0, dtype=float)] + list(points)
+
+    def best_feasible(self, starts):
+        values = [s.fun for s in starts if s.fun is not None and s.maxcv is not None and s.maxcv <= self.feasibility_tol]
+        return min(values) if values else None
+
+    def start_main(self, start):
+        # SLSQP run of start, reporting to run() through the message queue
+        # The cache and history connections are opened and used by this thread only
+        try:
+            optimizer = optimize.Optimizer(replica(self.model), pool=self.pool,
+                cache=cache.EvaluationCache(self.cache_path) if self.cache_path is not None else None,
+                history=history.History(self.history_path) if self.history_path is not None else None, **self.options)
+            optimizer.evaluator = evaluator.Evaluator(optimizer, remote=True)
+            def callback(x):
+                # Progress of the iterate, which the evaluator has just simulated
+                evaluation = optimizer.evaluator.evaluate(x)
+                start.iterations += 1
+                self.messages.put((start, "progress", (start.iterations, evaluation.objective, float(np.sum(np.maximum(0.0, -evaluation.vector))))))
+                if start.cancel.is_set():
+                    raise StopIteration
+            optimizer.callback = callback
+            begin = time.time()
+            result = optimizer.optimize(start.x0)
+            evaluation = optimizer.evaluator.evaluate(result.x)
+            if optimizer.cache is not None:
+                optimizer.cache.close()
+            if optimizer.history is not None:
+                optimizer.history.close()
+            self.messages.put((start, "done", dict(
+                x = np.asarray(result.x, dtype=float),
+                fun = evaluation.objective,
+                maxcv = float(np.sum(np.maximum(0.0, -evaluation.vector))),
+                success = bool(result.success),
+                message = str(result.message),
+                nit = int(result.nit),
+                simulations = optimizer.evaluator.stats["simulations"],
+                time = time.time() - begin,
+            )))
+        except Exception as e:
+            self.messages.put((start, "error", "%s: %s" % (type(e).__name__, e)))
+
+    def launch(self, start):
+        start.thread = threading.Thread(target=self.start_main, args=(start,), name="start-%d" % start.index, daemon=True)
+        start.thread.start()
+        start.status = "running"
+
+    def run(self):
+        """
+        Run every start and return the best design found, feasible first, as
+        a scipy OptimizeResult with a summary of every start in result.starts.
+        """
+        wall = time.time()
+        starts = [Start(i, x0) for i, x0 in enumerate(self.start_points())]
+        pending = list(starts)
+        running = []
+        print ('{0:5s}   {1:>10s}   {2:>10s}   {3:>11s}   {4:>11s}   {5:>11s}'.format('Start', 'Status', 'Iterations', 'TAC', 'Violation', 'Simulations'))
+        while pending or running:
+            while pending and len(running) < self.size:
+                start = pending.pop(0)
+                self.launch(start)
+                running.append(start)
+            start, message, payload = self.messages.get()
+            if message == "progress":
+                start.iterations, start.fun, start.maxcv = payload
+                best = self.best_feasible(starts)
+                start.worse = start.worse + 1 if best is not None and start.fun > (1 + self.margin) * best else 0
+                if start.worse >= self.patience and not start.cancel.is_set():
+                    start.cancel.set()
+                continue
+            if message == "done":
+                start.result = payload
+                start.fun, start.maxcv = payload["fun"], payload["maxcv"]
+                start.status = "cancelled" if start.cancel.is_set() else "done"
+            else:
+                start.result = None
+                start.status = "error"
+                print (payload)
+            start.thread.join()
+            running.remove(start)
+            print ('{0:5d}   {1:>10s}   {2:10d}   {3:>11s}   {4:>11s}   {5:>11s}'.format(start.index, start.status, start.iterations,
+                "%.2f" % (start.fun * 1000000) if start.fun is not None else "----",
+                "%.6f" % start.maxcv if start.maxcv is not None else "----",
+                str(start.result["simulations"]) if start.result is not None else "----"))
+
+        finished = [start for start in starts if start.result is not None]
+        if not finished:
+            raise RuntimeError("All %d starts failed" % len(starts))
+        best = min(finished, key=lambda s: (s.result["maxcv"] > self.feasibility_tol, s.result["maxcv"] if s.result["maxcv"] > self.feasibility_tol else s.result["fun"]))
+        return opt.OptimizeResult(
+            x = best.result["x"],
+            fun = best.result["fun"],
+            success = best.result["maxcv"] <= self.feasibility_tol,
+            message = "Best of %d starts: start %d, %s" % (len(starts), best.index, best.result["message"]),
+            nfev = sum(start.result["simulations"] for start in finished),
+            nit = best.result["nit"],
+            maxcv = best.result["maxcv"],
+            start = best.index,
+            starts = [dict(index=s.index, x0=s.x0, x=s.result["x"] if s.result is not None else None, status=s.status, iterations=s.iterations, fun=s.fun, maxcv=s.maxcv) for s in starts],
+            time = time.time() - wall,
+        )
+
+    def close(self):
+        if self.owned:
+            self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -3,240 +3,107 @@ import pandas as pd
 import model
 import scipy.optimize as opt
 import conversions
-import graph
 import initialize
 import time
+import cache
+import pool
+import history
+import hydraulics
+import surrogate
+import evaluator
+import integer
+import pareto
+import failures
+import checkpoint
+import metrics
+
+# Names of the purity and recovery bound constraints, which come first in every constraint set
+RESULT_CONSTRAINTS = ("purityLB", "purityUB", "recoveryLB", "recoveryUB")
 
 class Optimizer():
     def __init__(self, model: model.Model, opt_tolerance: float = 1e-5, \
         purityLB: float = 0.99, purityUB: float = 1.0,\
-            recoveryLB: float = 0.99, recoveryUB: float = 1.0):
+            recoveryLB: float = 0.99, recoveryUB: float = 1.0, cache: cache.EvaluationCache = None, \
+                pool: pool.SimulatorPool = None, fd_step: float = 1.4901161193847656e-08, history: history.History = None, \
+                    stage_hydraulics: bool = False, failure_index: failures.FailureIndex = None, \
+                        checkpoint: checkpoint.Checkpoint = None, verbose: bool = True):
+        """
+        :param cache: evaluation cache, designs found in it are not simulated again
+        :param pool: simulator workers (pool.SimulatorPool or scheduler.Scheduler), finite difference gradients are evaluated on them in parallel
+        :param fd_step: finite difference step of the parallel gradient (SLSQP default)
+        :param history: run history store, every evaluation is recorded in it
+        :param stage_hydraulics: check the tray hydraulics of every stage instead of the top and bottom stages
+        :param failure_index: failed designs, designs near them fail at once instead of being simulated
+        :param checkpoint: where the run state is saved every few iterations, see run(resume=True)
+        :param verbose: print the iterations and the simulation errors as the optimization goes
+        """
         self.opt_tolerance = opt_tolerance
         self.model = model
+        self.cache = cache
+        self.pool = pool
+        self.fd_step = fd_step
+        self.history = history
+        self.failure_index = failure_index
+        self.checkpoint = checkpoint
+        self.verbose = verbose
+        self.run_id = None
+        self.evaluations = 0
         self.time = 0
         self.start_time = time.time()
         self.func_iter = 0
         self.opt_iter = 0
+        self.failed = False
 
         self.purityLB = purityLB
         self.purityUB = purityUB
         self.recoveryLB = recoveryLB
         self.recoveryUB = recoveryUB
 
-        self.h_w = 50 #mm (Assumption)
-        self.hole_diameter = 5 #mm (Assumption)
-        self.plate_thickness = 5 #mm (Assumption)
-        self.frac_appr_flooding = 0.8 #Assumption
-
-        # Assumptions from "Design of equilibrium stage processes" Pg 527 Table 14.3
-        self.slot_shape_ratio = 0.5 #Assume trapezoidal slots
-        self.slot_height = conversions.inch_to_m(1.250) #Assume 1.25 inch slot height
-        self.riser_area_per_tray = conversions.sqft_to_m2(18.7) #Assume 18.7 sq ft riser area per tray
-        self.static_seal = conversions.inch_to_m(0.5) #Assume 0.5 inch static seal
-        self.annular_riser_area_ratio = 1.25 #Assume 1.25:1 annular riser area ratio
-        self.A_da = conversions.sqft_to_m2(1.0) # Minimum area under downflow apron = 1sqft
-        self.slot_area_per_tray = conversions.sqft_to_m2(31.5) #Assume 31.5 sq ft total slot area per tray
-
-    def func_net_area(self):
-        return self.model.A_c - self.model.A_d
-
-    def func_active_area(self):
-        return self.func_net_area() - self.model.A_d
-    
-    def func_hole_area(self):
-        return 0.1 * self.func_active_area()
-
-    def func_L(self, section):
-        if section == "top":
-            return self.model.RR * self.model.D[0]
-        elif section == "bottom":
-            return self.model.RR * self.model.D[0] + self.model.feed_flow_rate
-        else:
-            raise AssertionError("Section must be either top or bottom")
-    
-    def func_max_liquid_flow_rate(self, section):
-        molecular_weight_liquid = self.model.molecular_weight_liquid[0] if section == "top" else self.model.molecular_weight_liquid[-1]
-        return self.func_L(section) * molecular_weight_liquid / 3600 # Conversion from kmol/hr to kg/s
-    
-    def func_min_liquid_flow_rate(self, section):
-        return 0.7 * self.func_max_liquid_flow_rate(section)
+        # Tray hydraulics of the current model state, shared by the hydraulic constraints
+        self.hydraulics_engine = hydraulics.HydraulicsEngine(stages=stage_hydraulics)
+        # Objective and constraints of a design from one simulation
+        self.evaluator = evaluator.Evaluator(self)
 
-    def func_density_liquid(self, section):
-        return conversions.gmCc_to_kgM3(self.model.density_liquid[0] if section == "top" else self.model.density_liquid[-1])
-    
-    def func_density_vapour(self, section):
-        return conversions.gmCc_to_kgM3(self.model.density_vapour[0] if section == "top" else self.model.density_vapour[-2])
-
-    def func_volume_flow_vapour(self, section):
-        return conversions.lMin_to_m3Sec(self.model.volume_flow_vapour[0] if section == "top" else self.model.volume_flow_vapour[-2])
-        
-    def func_h_ow(self, value, section):
-        if value == 'max':
-            return ((self.func_max_liquid_flow_rate(section) / (self.func_density_liquid(section) * self.model.weir_length)) ** (2./3)) * 1000  # Conversion to mm
-        else:
-            return ((self.func_min_liquid_flow_rate(section) / (self.func_density_liquid(section) * self.model.weir_length)) ** (2./3)) * 1000  # Conversion to mm
+        if self.model.metrics is not None:
+            self.model.metrics.register("evaluator", lambda: self.evaluator.stats)
+            self.model.metrics.register("hydraulics", lambda: self.hydraulics_engine.stats)
+            if self.cache is not None:
+                self.model.metrics.register("cache", lambda: dict(self.cache.stats, hit_rate=self.cache.hit_rate()))
+            if self.failure_index is not None:
+                self.model.metrics.register("failure_index", lambda: self.failure_index.report())
+            if self.pool is not None:
+                self.model.metrics.register("pool", lambda: self.pool.stats)
 
-    def func_h_w_h_ow_min(self, section):
-        return self.h_w + self.func_h_ow('min', section)
-
-    def func_actual_min_vapour_vel(self, section):
-        return 0.7 * self.func_volume_flow_vapour(section) / self.func_hole_area()
-
-    def func_min_vapour_vel(self, section):
-         return (graph.K2(self.func_h_w_h_ow_min(section))-0.9*(25.4-self.hole_diameter))/(self.func_density_vapour(section)**(1./2))
-    
-    def func_A_ap(self):
-        return (self.h_w - 10) * self.model.weir_length * (10 ** -3) # Change to m
-
-    def func_h_dc(self, section):
-        if self.model.tray_type == 'SIEVE':
-            return 166 * ((self.func_max_liquid_flow_rate(section) / (self.func_density_liquid(section) * (self.model.A_d if self.model.A_d<self.func_A_ap() else self.func_A_ap())))**2)
-        elif self.model.tray_type == 'CAPS':
-            return self.func_h_t(section) + self.h_w + self.func_h_ow('max', section) + self.func_delta() + self.func_h_da(section)
-
-    def func_h_da(self, section):
-        Lw = conversions.m3Sec_to_gpm(self.func_q(section))
-        A_da = conversions.m2_to_sqft(self.A_da)
-        return conversions.inch_to_m(0.03 * (Lw/2/100/A_da) ** 2)
-
-    def func_max_vapour_vel(self, section):
-        return self.func_volume_flow_vapour(section) / self.func_hole_area()
-
-    def func_h_d(self, section):
-        # TODO: Bubble Cap Change for Orifice
-        orifice_coeff = graph.orifice((self.func_hole_area()/self.func_active_area()), self.plate_thickness/self.hole_diameter)
-        return 51 * ((self.func_max_vapour_vel(section) / orifice_coeff) **2) * (self.func_density_vapour(section)/self.func_density_liquid(section))
-
-    def func_h_r(self, section):
-        return 12500 / self.func_density_liquid(section)
-
-    def func_h_t(self, section):
-        if self.model.tray_type == 'SIEVE':
-            return self.func_h_d(section) + self.h_w + self.func_h_ow('max', section) + self.func_h_r(section)
-        elif self.model.tray_type == 'CAPS':
-            return self.func_h_cd(section) + self.func_h_so(section) + self.func_h_al(section)
-
-    def func_h_al(self, section):
-        volume_flow_vapour = conversions.m3Sec_to_cfs(self.func_volume_flow_vapour(section))
-        active_area = conversions.m2_to_sqft(self.func_active_area())
-        density_vapour = conversions.kgM3_to_lbFt3(self.func_density_vapour(section))
-        F_va = volume_flow_vapour / active_area * (density_vapour ** (1./2))
-        return graph.aeration_factor(F_va) # Fig 14.15
-
-    def func_h_b(self, section):
-        # NOTE: Need to round up h_dc?
-        return self.h_w + self.func_h_ow('max', section) + self.func_h_t(section) + self.func_h_dc(section)
-
-    def func_v(self):
-        return self.model.D[0] * (1 + self.model.RR)
-
-    def func_f_lv(self, section):
-        return (self.func_L(section) / self.func_v()) * ((self.func_density_vapour(section) / self.func_density_liquid(section)) ** (1./2))
-
-    def func_flooding_vapour_velocity(self, section):
-        return graph.K1(self.func_f_lv(section), self.model.tray_spacing, self.model.tray_type) * (((self.func_density_liquid(section) - self.func_density_vapour(section))/self.func_density_vapour(section)) ** (1./2))
-
-    def func_u_n(self, section):
-        return self.frac_appr_flooding * self.func_flooding_vapour_velocity(section)
-
-    def func_net_area_required(self):
-        return max(self.func_volume_flow_vapour(section)/self.func_u_n(section) for section in ['top', 'bottom'])
-
-    def func_percent_flooding(self, section):
-        u_v = self.func_volume_flow_vapour(section) / self.func_net_area_required()
-        return u_v / self.func_flooding_vapour_velocity(section)
-
-    def func_q_max(self, section):
-        As = 0.12 * conversions.m2_to_sqft(self.slot_area_per_tray)
-        Rs = self.slot_shape_ratio
-        slot_height = conversions.m_to_inch(self.slot_height)
-        density_liquid = conversions.kgM3_to_lbFt3(self.func_density_liquid(section))
-        density_vapour = conversions.kgM3_to_lbFt3(self.func_density_vapour(section))
-        qMax = 2.36 * As * ((2./3) * (Rs/(1+Rs)) + (4./15) * ((1-Rs)/(1+Rs))) * ((slot_height * (density_liquid - density_vapour)/ density_vapour) ** (1./2))
-        return conversions.cfs_to_m3Sec(qMax)
-
-    def func_h_cd(self, section):
-        density_liquid = conversions.kgM3_to_lbFt3(self.func_density_liquid(section))
-        density_vapour = conversions.kgM3_to_lbFt3(self.func_density_vapour(section))
-        volume_flow_vapour = conversions.m3Sec_to_cfs(self.func_volume_flow_vapour(section))
-        riser_area = conversions.m2_to_sqft(self.riser_area_per_tray)
-        h_cd = graph.dry_cap_coeff(self.annular_riser_area_ratio) * density_vapour/density_liquid * (volume_flow_vapour/riser_area)**2
-        return conversions.inch_to_m(h_cd)
-
-    def func_h_so(self, section):
-        vapour_load = self.func_volume_flow_vapour(section) / self.func_q_max(section)
-        slot_opening_slot_height = graph.slot_opening_corelation(vapour_load) # Fuig 14.6 Pg 504
-        return self.slot_height * slot_opening_slot_height
-
-    def func_weeping_check(self, section):
-        return self.func_percent_flooding(section) > 0.5
-
-    def func_delta(self):
-        return conversions.inch_to_m(1.3) #Assume delta of 1.3 inches
-    
-    def func_q(self, section):
-        A_da = conversions.m2_to_sqft(self.A_da)
-        h_da = conversions.m_to_inch(self.func_h_da(section))
-        g = conversions.m_to_ft(9.81)
-        q = 0.6 * A_da * ((2 * g * h_da / 12)**(1./2))
-        return conversions.cfs_to_m3Sec(q)
-
-    def func_t_dc (self, section):
-        A_d = conversions.m2_to_sqft(self.model.A_d)
-        h_dc = conversions.m_to_inch(self.func_h_dc(section))
-        t_dc = A_d * h_dc / (12 * conversions.m3Sec_to_cfs(self.func_q(section)))
-        return t_dc
-
-    def func_h_c(self, section):
-        return self.func_h_cd(section) + self.func_h_so(section)
-
-    def func_h_ds(self, section):
-        static_slot_seal = conversions.m_to_inch(self.static_seal)
-        h_ow = conversions.m_to_inch(self.func_h_ow('max', section)/1000)
-        delta = conversions.m_to_inch(self.func_delta())
-        return conversions.inch_to_m(static_slot_seal + h_ow + delta/2)
-
-    def func_h_fd(self, section):
-        return self.func_h_dc(section) / 0.5
+    def hydraulic_constraint(self, name, section):
+        return self.hydraulics_engine.evaluate(self.model)[name][hydraulics.SECTIONS[section]]
 
     def entrainmentCheck(self, section):
-        return self.frac_appr_flooding - self.func_percent_flooding(section) # percent of flooding should be less than frac_appr_flooding
+        return self.hydraulic_constraint("entrainment", section)
 
     def entrainmentFracCheck(self, section):
-        frac_entrainment = graph.frac(self.func_f_lv(section), self.func_percent_flooding(section),self.model.tray_type)
-        return 0.1 - frac_entrainment # frac_entrainment should be less than 0.1
+        return self.hydraulic_constraint("entrainment_frac", section)
 
     def slotOpeningCheck(self, section):
-        vapour_load = self.func_volume_flow_vapour(section) / self.func_q_max(section)
-        slot_opening_slot_height = graph.slot_opening_corelation(vapour_load) # Fig 14.6 Pg 504
-        return 1 - slot_opening_slot_height
+        return self.hydraulic_constraint("slot_opening", section)
 
     def slotSealLBCheck(self, section):
-        return conversions.m_to_inch(self.func_h_ds(section)) - 1.0
+        return self.hydraulic_constraint("slot_seal_LB", section)
 
     def slotSealUBCheck(self, section):
-        return (2.6 - conversions.m_to_inch(self.func_h_ds(section)))/10.0 # Scale for constraints
+        return self.hydraulic_constraint("slot_seal_UB", section)
 
     def vapourDistRatioCheck(self, section):
-        return (0.5 - (self.func_delta() / self.func_h_c(section)))/10.0 # Scale for constraints
+        return self.hydraulic_constraint("vapour_dist_ratio", section)
 
     def weepingCheck(self, section):
-        # actual_min_vapour_vel > min_vapour_vel
-        return (self.func_actual_min_vapour_vel(section) - self.func_min_vapour_vel(section))/5.0 # Scale for constraints
+        return self.hydraulic_constraint("weeping", section)
 
     def downcomerLiquidBackupCheck(self, section):
-        if self.model.tray_type == 'SIEVE':
-            return  0.5 * (self.model.tray_spacing + (self.h_w/1000)) - self.func_h_b(section)/1000 # Should be larger than 0 (pg 882 towler sinnot)
-        elif self.model.tray_type == 'CAPS':
-            return self.model.tray_spacing + (self.h_w/1000) - self.func_h_fd(section)/1000 # Should be larger than 0
-    
+        return self.hydraulic_constraint("downcomer_liquid_backup", section)
+
     def downcomerResidenceTimeCheck(self, section):
-        if self.model.tray_type == 'SIEVE':
-            self.residence_time = (self.model.A_d * self.func_h_b(section) * (10 ** -3) * self.func_density_liquid(section)) / (self.func_max_liquid_flow_rate(section))
-            return (self.residence_time - 3)/100.0 # Should be larger than 3s # Scale for constraints
-        elif self.model.tray_type == 'CAPS':
-            self.residence_time = self.func_t_dc(section)
-            return (self.residence_time - 3)/1000.0 # Should be larger than 3s # Scale for constraints
+        self.residence_time = self.hydraulic_constraint("residence_time", section)
+        return self.hydraulic_constraint("downcomer_residence_time", section)
 
     def slotOpeningCheckTop(self, x):
         return self.slotOpeningCheck('top')
@@ -296,19 +163,32 @@ class Optimizer():
         try:
             diff = self.model.stream_input_pres - self.model.P_stage[self.model.feed_stage-1]
         except IndexError as e:
-            print (e)
+            self.log(e)
             diff = 0.01
         return diff
 
+    def log(self, *args):
+        # Progress output, silenced when not verbose
+        if self.verbose:
+            print (*args)
+
     def callback(self, x):
         self.func_iter = 0
         if self.model.hydraulics:
-            print ('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}   {7:3.9f}   {8:3.9f}   {9:3.9f}'.format(self.opt_iter, x[0], x[1], x[2], x[3], x[4], x[5], x[6], self.model.TAC, self.time))
+            self.log('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}   {7:3.9f}   {8:3.9f}   {9:3.9f}'.format(self.opt_iter, x[0], x[1], x[2], x[3], x[4], x[5], x[6], self.model.TAC, self.time))
         else:
-            print ('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}'.format(self.opt_iter, x[0], x[1], x[2], x[3], self.model.TAC, self.time))
+            self.log('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}'.format(self.opt_iter, x[0], x[1], x[2], x[3], self.model.TAC, self.time))
         self.opt_iter += 1
-
-    def optimize(self):
+        if self.checkpoint is not None and self.opt_iter % self.checkpoint.every == 0:
+            self.checkpoint.save(self, x)
+        if self.model.metrics is not None:
+            self.model.metrics.export()
+
+    def problem(self):
+        """
+        Start point, constraints and bounds of the optimization, for the
+        current model settings. The run is registered in the history.
+        """
         self.model.distilate_rate = initialize.distilate_rate(self.model, recovery_LB=self.recoveryLB)
         if self.model.hydraulics:
             x0 = [
@@ -368,8 +248,9 @@ class Optimizer():
                     {'type': 'ineq', 'fun': self.downcomerResidenceTimeCheckBottom},
                 )
             bounds = opt.Bounds([1.013, 0.01, 0.01, initialize.min_RR(self.model), 0.02, 0.02, 0.15], [10.0, 1.0, 1.0, 1.2 * initialize.min_RR(self.model), 1.0, 1.0, 1.0], keep_feasible=True)
-            print ('{0:4s}   {1:11s}   {2:11s}   {3:11s}   {4:11s}   {5:11s}   {6:11s}   {7:11s}   {8:11s}   {9:11s}'.format('Iter', ' P_cond', 'P_drop_1', 'P_drop_2', 'RR', 'tray_eff_1', 'tray_eff_2', 'tray_spacing', 'TAC', 'Runtime'))
-            print ('{0:4s}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}   {7:3.9f}   {8:11s}   {9:3.9f}'.format("Init", x0[0], x0[1], x0[2], x0[3], x0[4], x0[5], x0[6], "----", self.time))
+            self.bounds = bounds
+            self.log('{0:4s}   {1:11s}   {2:11s}   {3:11s}   {4:11s}   {5:11s}   {6:11s}   {7:11s}   {8:11s}   {9:11s}'.format('Iter', ' P_cond', 'P_drop_1', 'P_drop_2', 'RR', 'tray_eff_1', 'tray_eff_2', 'tray_spacing', 'TAC', 'Runtime'))
+            self.log('{0:4s}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}   {7:3.9f}   {8:11s}   {9:3.9f}'.format("Init", x0[0], x0[1], x0[2], x0[3], x0[4], x0[5], x0[6], "----", self.time))
         else:
             x0 = [
                 self.model.P_cond,
@@ -387,49 +268,235 @@ class Optimizer():
                 {'type': 'ineq', 'fun': self.inputPresCheck},
                 )
             bounds = opt.Bounds([1.013, initialize.min_RR(self.model), 0.02, 0.02], [10.0, 1.2 * initialize.min_RR(self.model), 1.0, 1.0], keep_feasible=True)
-            print ('{0:4s}   {1:11s}   {2:11s}   {3:11s}   {4:11s}   {5:11s}   {6:11s}'.format('Iter', ' P_cond', 'RR', 'tray_eff_1', 'tray_eff_2', 'TAC', 'Runtime'))
-            print ('{0:4s}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:11s}   {6:3.9f}'.format("Init", x0[0], x0[1], x0[2], x0[3], "----", self.time))
-
+            self.bounds = bounds
+            self.log('{0:4s}   {1:11s}   {2:11s}   {3:11s}   {4:11s}   {5:11s}   {6:11s}'.format('Iter', ' P_cond', 'RR', 'tray_eff_1', 'tray_eff_2', 'TAC', 'Runtime'))
+            self.log('{0:4s}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:11s}   {6:3.9f}'.format("Init", x0[0], x0[1], x0[2], x0[3], "----", self.time))
+
+        self.constraints = constraints
+        if self.failure_index is not None and self.failure_index.scale is None:
+            self.failure_index.scale = np.asarray(bounds.ub) - np.asarray(bounds.lb)
+        if self.history is not None and self.run_id is None:
+            self.run_id = self.history.start_run(self.model, x0=x0, bounds=[list(bounds.lb), list(bounds.ub)], hydraulics=self.model.hydraulics,
+                tray_type=self.model.tray_type, purityLB=self.purityLB, recoveryLB=self.recoveryLB, opt_tolerance=self.opt_tolerance)
+        return x0, constraints, bounds
+
+    def optimize(self, x0=None, resume=False):
+        """
+        :param x0: start point, the initialize estimates by default
+        :param resume: restart from the iterate of the last checkpoint, if there is one,
+            or return the result of the run when the checkpoint is of a finished one
+        """
+        state = self.checkpoint.restore(self) if resume and self.checkpoint is not None else None
+        x0 = state["x"] if state is not None else x0
+        start, constraints, bounds = self.problem()
+        x0 = start if x0 is None else x0
+        if state is not None and state["finished"]:
+            self.log("%s is the checkpoint of a finished run, not optimizing again" % self.checkpoint.filepath)
+            self.evaluator.restore(x0)
+            return opt.OptimizeResult(x=np.array(x0, dtype=float), **state["result"])
+        # The constraints of x are read from the simulation of x, shared with the objective
         result = opt.minimize(
-            self.objective,
+            self.evaluator.objective,
             x0, 
-            constraints = constraints,
+            jac = self.gradient if self.pool is not None else None,
+            constraints = {'type': 'ineq', 'fun': self.evaluator.constraints, 'jac': self.constraint_jacobian if self.pool is not None else None},
             bounds = bounds,
             callback = self.callback,
             method='SLSQP', 
-            options={'disp': True, 'maxiter':2000}, 
+            options={'disp': self.verbose, 'maxiter':2000}, 
             tol = self.opt_tolerance
         )
+        self.evaluator.restore(result.x)
+        if self.checkpoint is not None:
+            self.checkpoint.save(self, result.x, result=result)
         return result
 
+    def design(self, x):
+        """
+        Model attributes set by the design vector x. The distillate rate set
+        by problem() and the stage numbers go with it, so that pool workers
+        simulate the same column.
+        """
+        if self.model.hydraulics == True:
+            return dict(
+                P_cond = float(x[0]),
+                P_drop_1 = float(x[1]),
+                P_drop_2 = float(x[2]),
+                RR = float(x[3]),
+                tray_eff_1 = float(x[4]),
+                tray_eff_2 = float(x[5]),
+                tray_spacing = float(x[6]),
+                distilate_rate = self.model.distilate_rate,
+                N = self.model.N,
+                feed_stage = self.model.feed_stage,
+            )
+        else:
+            return dict(
+                P_cond = float(x[0]),
+                P_drop_1 = 0.06,
+                RR = float(x[1]),
+                tray_eff_1 = float(x[2]),
+                tray_eff_2 = float(x[3]),
+                distilate_rate = self.model.distilate_rate,
+                N = self.model.N,
+                feed_stage = self.model.feed_stage,
+            )
+
+    def set_design(self, x):
+        for name, value in self.design(x).items():
+            setattr(self.model, name, value)
+
+    def evaluate_batch(self, xs):
+        """
+        Evaluate several design vectors at once on the pool workers, going to
+        the cache first when there is one.
+        :return: list of model results (see model.Model.export_results), None where the simulation failed
+        """
+        designs, keys, output = [], [], [None] * len(xs)
+        for i, x in enumerate(xs):
+            failure = self.known_failure(x)
+            if failure is not None:
+                self.set_design(x)
+                self.record(x, "skipped", error=failure)
+                continue
+            self.set_design(x)
+            key = self.cache.key(self.model) if self.cache is not None else None
+            output[i] = self.cache.get(key) if key is not None else None
+            if output[i] is None:
+                designs.append((i, self.design(x)))
+                keys.append(key)
+        evaluations = self.pool.evaluate([design for i, design in designs])
+        for (i, design), key, evaluation in zip(designs, keys, evaluations):
+            if isinstance(evaluation, Exception):
+                self.log(evaluation)
+                if self.model.metrics is not None:
+                    self.model.metrics.count("simulation_failures")
+                self.add_failure(xs[i], failures.classify(evaluation))
+                self.record(xs[i], "error", error=str(evaluation))
+                continue
+            output[i], runtime = evaluation
+            self.time += runtime
+            if key is not None:
+                self.cache.put(key, output[i])
+            if self.history is not None:
+                self.set_design(xs[i])
+                self.model.load_results(output[i])
+                self.record(xs[i], "ok", runtime)
+        return output
+
+    def probes(self, x):
+        """
+        Evaluations of x and of its forward difference probes, all simulated
+        in parallel. Probes that would leave the bounds step backwards instead.
+        """
+        x = np.asarray(x, dtype=float)
+        steps = np.where(x + self.fd_step > self.bounds.ub, -self.fd_step, self.fd_step)
+        probes = [x]
+        for i in range(len(x)):
+            probe = x.copy()
+            probe[i] += steps[i]
+            probes.append(probe)
+        evaluations = self.evaluator.evaluate_batch(probes)
+        if evaluations[0].failed:
+            evaluations[0] = self.evaluator.evaluate(x)
+        return evaluations[0], evaluations[1:], steps
+
+    def gradient(self, x):
+        """
+        Forward difference gradient of the objective, see probes.
+        """
+        center, probes, steps = self.probes(x)
+        # Failed probes give a zero derivative
+        return np.array([(probe.objective - center.objective) / step if not probe.failed else 0.0 for probe, step in zip(probes, steps)])
+
+    def constraint_jacobian(self, x):
+        """
+        Forward difference Jacobian of the constraints, from the same probes as the gradient.
+        """
+        center, probes, steps = self.probes(x)
+        return np.array([(probe.vector - center.vector) / step if not probe.failed else np.zeros(len(center.constraints)) for probe, step in zip(probes, steps)]).T
+
+    def constraint_names(self):
+        """
+        Names of the active constraints, in order.
+        """
+        names = [constraint['fun'].__name__ for constraint in self.constraints]
+        return [RESULT_CONSTRAINTS[i] if name == "<lambda>" else name for i, name in enumerate(names)]
+
+    def constraint_values(self, x):
+        """
+        Value of every active constraint for the current model state.
+        :raises ValueError: a constraint is not a finite real number; the other evaluator.CONSTRAINT_ERRORS
+            are raised by the constraints themselves on the results of a bad simulation
+        """
+        values = dict()
+        for name, constraint in zip(self.constraint_names(), self.constraints):
+            with metrics.phase(self.model.metrics, "constraint." + name):
+                value = constraint['fun'](x)
+            if np.iscomplexobj(value) or not np.isfinite(value):
+                raise ValueError("Constraint %s is %s" % (name, value))
+            values[name] = float(value)
+        return values
+
+    def record(self, x, status, runtime=None, error=None):
+        # Store the evaluation of x in the run history
+        if self.history is None:
+            return
+        constraints = None
+        if status not in ("error", "skipped"):
+            try:
+                constraints = self.constraint_values(x)
+            except evaluator.CONSTRAINT_ERRORS as e:
+                status, error = "error", str(e)
+        self.history.record(self.run_id, self.evaluations, self.model, status, runtime, error, constraints)
+        self.evaluations += 1
+
+    def known_failure(self, x):
+        # Failure class of a recorded failure near x, None if there is none or no index
+        if self.failure_index is None:
+            return None
+        return self.failure_index.find(x, (self.model.N, self.model.feed_stage))
+
+    def add_failure(self, x, failure, runtime=None):
+        if self.failure_index is not None:
+            self.failure_index.add(x, failure, runtime, (self.model.N, self.model.feed_stage))
+
     def objective(self, x):
+        self.failed = False
+        failure = self.known_failure(x)
+        if failure is not None:
+            # Near a design that failed: same penalty, no simulation
+            self.failed = True
+            self.set_design(x)
+            self.record(x, "skipped", error=failure)
+            self.func_iter += 1
+            return self.model.TAC/1000000 + 2 * self.opt_tolerance
+        start = time.time()
         try:
-            if self.model.hydraulics == True:
-                self.model.P_cond = float(x[0])
-                self.model.P_drop_1 = float(x[1])
-                self.model.P_drop_2 = float(x[2])
-                self.model.RR = float(x[3])
-                self.model.tray_eff_1 = float(x[4])
-                self.model.tray_eff_2 = float(x[5])
-                self.model.tray_spacing = float(x[6])
+            self.set_design(x)
+            if self.cache is None or not self.cache.load(self.model):
+                runtime = self.model.run()
+                self.time += runtime
+                if self.cache is not None:
+                    self.cache.store(self.model)
+                self.record(x, "ok", runtime)
             else:
-                self.model.P_cond = float(x[0])
-                self.model.P_drop_1 = 0.06
-                self.model.RR = float(x[1])
-                self.model.tray_eff_1 = float(x[2])
-                self.model.tray_eff_2 = float(x[3])
-            runtime = self.model.run()
-            self.time += runtime
+                self.record(x, "cached")
             self.func_iter += 1
             return self.model.TAC/1000000
         except Exception as e:
+            self.failed = True
+            if self.model.metrics is not None:
+                self.model.metrics.count("simulation_failures")
+            self.add_failure(x, failures.classify(e), time.time() - start)
+            self.record(x, "error", error=str(e))
             # If simulation cannot be run, return a large number
             if self.model.hydraulics:
-                print ('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}   {7:3.9f}   {8:11s}   {9:3.9f}'.format(self.func_iter, x[0], x[1], x[2], x[3], x[4], x[5], x[6], "ERROR", self.time))
+                self.log('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:3.9f}   {6:3.9f}   {7:3.9f}   {8:11s}   {9:3.9f}'.format(self.func_iter, x[0], x[1], x[2], x[3], x[4], x[5], x[6], "ERROR", self.time))
             else:
-                print ('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:11s}   {6:3.9f}'.format(self.func_iter, x[0], x[1], x[2], x[3], "ERROR", self.time))
+                self.log('{0:4d}   {1:3.9f}   {2:3.9f}   {3:3.9f}   {4:3.9f}   {5:11s}   {6:3.9f}'.format(self.func_iter, x[0], x[1], x[2], x[3], "ERROR", self.time))
 
-            print (e)
+            self.log(e)
             self.func_iter += 1
             return self.model.TAC/1000000 + 2 * self.opt_tolerance
 
@@ -452,6 +519,9 @@ class Optimizer():
             P_drop_1 = 0
             P_cond = x[0]
             tray_spacing = self.model.tray_spacing
+        if "N" in self.result:
+            # Integer search, the stage numbers are not encoded in x
+            num_stage, feed_stage = self.result.N, self.result.feed_stage
         diameter = self.model.diameter
         Q_cond = conversions.calPerSec_to_kJPerSec(abs(self.model.Q_cond))
         Q_reb = conversions.calPerSec_to_kJPerSec(abs(self.model.Q_reb))
@@ -466,6 +536,11 @@ class Optimizer():
         print ("Computational Time: %.2f seconds"%self.time)
         print ("Total ElapsedTime: %.2f seconds"%(time.time() - self.start_time))
         print ("Converged: %s"%self.result.success)
+        if self.cache is not None:
+            print ("Cache Hit Rate: %.1f%% (%d memory, %d disk, %d simulated)"%(100 * self.cache.hit_rate(), self.cache.stats["memory_hits"], self.cache.stats["disk_hits"], self.cache.stats["misses"]))
+        if self.failure_index is not None:
+            report = self.failure_index.report()
+            print ("Known Failures: %d recorded, %d evaluations skipped (%.1f%%), %.2f seconds saved"%(report["failures"], report["hits"], 100 * report["hit_rate"], report["saved_time"]))
 
         print ("\n==========")
         print ("General")
@@ -492,14 +567,43 @@ class Optimizer():
             print ("Column Pressure Drop: %.3f bar"%P_drop_1)
 
 
-    def run(self):
-        self.result = self.optimize()
+    def print_front(self):
+        print ("\n==========")
+        print ("Pareto Front")
+        print ("==========\n")
+        print ('{0:>14s}   {1:>14s}   {2:>14s}   {3:>8s}   {4:>8s}'.format('TAC', 'Capital', 'Energy', 'Purity', 'Recovery'))
+        for design in self.result.front:
+            print ('{0:14.2f}   {1:14.2f}   {2:14.2f}   {3:8.5f}   {4:8.5f}'.format(design["TAC"], design["TAC"] - design["energy_cost"],
+                design["energy_cost"], design["purity"], design["recovery"]))
+
+    def run(self, method: str = "slsqp", resume: bool = False, **options):
+        """
+        :param method: "slsqp" to run SLSQP on the simulator, "surrogate" for the
+            surrogate-assisted trust region search (options go to surrogate.SurrogateSearch),
+            "integer" for the search over integer stage numbers (options go to integer.StageSearch),
+            "pareto" for the capital, energy and purity trade-off front (options go to pareto.ParetoSearch)
+        :param resume: continue an SLSQP run from its last checkpoint, the other methods are not checkpointed
+        """
+        if resume and method != "slsqp":
+            raise ValueError("Only SLSQP runs resume from a checkpoint, not %s runs" % method)
+        if method == "surrogate":
+            self.result = surrogate.SurrogateSearch(self, **options).optimize()
+        elif method == "integer":
+            self.result = integer.StageSearch(self, **options).optimize()
+        elif method == "pareto":
+            self.result = pareto.ParetoSearch(self, **options).optimize()
+        else:
+            self.result = self.optimize(resume=resume)
         print (self.result)
         self.process_results()
+        if "front" in self.result:
+            self.print_front()
+        if self.history is not None:
+            self.history.flush()
+        if self.model.metrics is not None:
+            print ("\n==========")
+            print ("Metrics")
+            print ("==========\n")
+            print (self.model.metrics.summary())
+            self.model.metrics.export()
         self.model.close()
-
-
-
-        
-
-
@@ -0,0 +1,272 @@
+"""
+Multi-objective optimization: the trade-off front between annualized capital,
+energy cost and product purity, by an NSGA-II style genetic algorithm.
+
+The single-objective optimizer minimizes TAC with purity and recovery as hard
+bounds, so a trade-off curve takes one SLSQP run per purityLB. ParetoSearch
+evolves a population of design vectors instead and keeps the non-dominated
+ones: children are made by simulated binary crossover and polynomial mutation
+within the optimizer bounds, and parents and children compete on constrained
+domination (feasible designs first, then rank of non-domination, then
+crowding distance). When purity is an objective its bounds are not
+constraints; the recovery and hydraulic constraints still are.
+
+Each generation is simulated as one batch, on the optimizer pool when it has
+one. Designs are evaluated once per search, and with an evaluation cache,
+simulations repeated across searches are not run again either.
+
+    optimizer = optimize.Optimizer(model, cache=cache.EvaluationCache(), pool=workers)
+    optimizer.run("pareto", population=24, generations=20)
+"""
+import numpy as np
+import scipy.optimize as opt
+import scipy.stats.qmc as qmc
+
+# Objectives, minimized, from the results of a simulation (see model.Model.export_results)
+OBJECTIVES = dict(
+    TAC = lambda results, main: results["TAC"],
+    capital = lambda results, main: results["TAC"] - results["energy_cost"], # Annualized
+    energy = lambda results, main: results["energy_cost"],
+    impurity = lambda results, main: 1 - results["purity"][main],
+    unrecovered = lambda results, main: 1 - results["recovery"][main],
+)
+# Constraints that an objective replaces
+REPLACED = dict(impurity=("purityLB", "purityUB"), unrecovered=("recoveryLB", "recoveryUB"))
+
+def non_dominated_sort(F):
+    """
+    Fronts of non-domination of the rows of F, as lists of row indices, best first.
+    """
+    dominates = np.all(F[:, None, :] <= F[None, :, :], axis=2) & np.any(F[:, None, :] < F[None, :, :], axis=2)
+    count = dominates.sum(axis=0) # Number of rows dominating each row
+    fronts = []
+    front = list(np.flatnonzero(count == 0))
+    while front:
+        fronts.append(front)
+        count[front] = -1
+        count -= dominates[front].sum(axis=0)
+        front = list(np.flatnonzero(count == 0))
+    return fronts
+
+def crowding_distance(F):
+    """
+    Crowding distance of the rows of F, one front; infinite for the extremes of every objective.
+    """
+    n, m = F.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        return np.full(n, np.inf)
+    for j in range(m):
+        order = np.argsort(F[:, j])
+        span = F[order[-1], j] - F[order[0], j]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (F[order[2:], j] - F[order[:-2], j]) / span
+    return distance
+
+class ParetoSearch:
+    def __init__(self, optimizer, objectives=("capital", "energy", "impurity"), population: int = 24, generations: int = 20,
+            crossover: float = 0.9, crossover_eta: float = 15.0, mutation_eta: float = 20.0, feasibility_tol: float = 1e-6, seed: int = 0):
+        """
+        :param optimizer: optimize.Optimizer whose design vector, constraints and bounds are searched
+        :param objectives: names of the objectives minimized, see OBJECTIVES
+        :param population: designs per generation
+        :param generations: generations after the initial population
+        :param crossover: probability that two parents are crossed over
+        :param crossover_eta: distribution index of the simulated binary crossover, larger keeps children closer to their parents
+        :param mutation_eta: distribution index of the polynomial mutation
+        :param feasibility_tol: largest violation of a constraint still taken as feasible
+        """
+        for name in objectives:
+            if name not in OBJECTIVES:
+                raise ValueError("Unknown objective %s, expected one of %s" % (name, ", ".join(OBJECTIVES)))
+        self.optimizer = optimizer
+        self.objectives = tuple(objectives)
+        self.population = population
+        self.generations = generations
+        self.crossover = crossover
+        self.crossover_eta = crossover_eta
+        self.mutation_eta = mutation_eta
+        self.feasibility_tol = feasibility_tol
+        self.rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.ignored = set(name for objective in self.objectives for name in REPLACED.get(objective, ()))
+        self.evaluations = dict() # Design vector -> (objectives, violation, TAC, results)
+        self.simulations = 0
+        self.failures = 0
+
+    def evaluate(self, X):
+        """
+        Objectives and total constraint violation of every row of X, simulated
+        as one batch; designs evaluated before are not simulated again.
+        :return: (F, V) arrays, failed simulations with infinite violation
+        """
+        keys = [tuple(float(v) for v in x) for x in X]
+        missing = list(dict.fromkeys(key for key in keys if key not in self.evaluations))
+        if missing:
+            evaluator = self.optimizer.evaluator
+            xs = [np.array(key) for key in missing]
+            if self.optimizer.pool is not None:
+                evaluations = evaluator.evaluate_batch(xs)
+            else:
+                evaluations = [evaluator.evaluate(x) for x in xs]
+            main = self.optimizer.model.main_component
+            for key, evaluation in zip(missing, evaluations):
+                self.simulations += 1
+                if evaluation.failed or evaluation.results is None:
+                    self.failures += 1
+                    self.evaluations[key] = (np.full(len(self.objectives), np.inf), np.inf, None, None)
+                    continue
+                f = np.array([OBJECTIVES[name](evaluation.results, main) for name in self.objectives], dtype=float)
+                if np.any(np.isnan(f)):
+                    self.failures += 1
+                    self.evaluations[key] = (np.full(len(self.objectives), np.inf), np.inf, None, None)
+                    continue
+                c = np.array([value for name, value in evaluation.constraints.items() if name not in self.ignored], dtype=float)
+                violation = float(np.sum(np.maximum(0.0, -c)))
+                self.evaluations[key] = (f, violation, evaluation.results["TAC"], evaluation.results)
+        F = np.array([self.evaluations[key][0] for key in keys])
+        V = np.array([self.evaluations[key][1] for key in keys])
+        return F, V
+
+    def rank(self, F, V):
+        """
+        Constrained domination rank and crowding distance of every design:
+        feasible designs by front of non-domination, infeasible ones after
+        them by violation.
+        """
+        n = len(F)
+        rank = np.zeros(n, dtype=int)
+        crowding = np.zeros(n)
+        feasible = np.flatnonzero(V <= self.feasibility_tol)
+        fronts = non_dominated_sort(F[feasible]) if len(feasible) else []
+        for r, front in enumerate(fronts):
+            indices = feasible[front]
+            rank[indices] = r
+            crowding[indices] = crowding_distance(F[indices])
+        infeasible = np.flatnonzero(V > self.feasibility_tol)
+        # Less violation is better: one rank per distinct violation
+        rank[infeasible] = len(fronts) + np.unique(V[infeasible], return_inverse=True)[1]
+        return rank, crowding
+
+    def unique(self, U):
+        # Index of the first row of every distinct design of U, in order
+        first = dict()
+        for i, x in enumerate(self.unscale(U)):
+            first.setdefault(tuple(float(v) for v in x), i)
+        return np.array(sorted(first.values()), dtype=int)
+
+    def select(self, rank, crowding, size):
+        # Best size designs, by rank then decreasing crowding distance
+        return np.lexsort((-crowding, rank))[:size]
+
+    def tournament(self, rank, crowding):
+        # Parent index by binary tournament
+        a, b = self.rng.integers(len(rank), size=2)
+        if rank[a] != rank[b]:
+            return a if rank[a] < rank[b] else b
+        return a if crowding[a] >= crowding[b] else b
+
+    def sbx(self, p1, p2):
+        """
+        Simulated binary crossover of two parents, scaled to the unit box.
+        """
+        c1, c2 = p1.copy(), p2.copy()
+        if self.rng.random() > self.crossover:
+            return c1, c2
+        for i in range(len(p1)):
+            if self.rng.random() > 0.5 or abs(p1[i] - p2[i]) < 1e-14:
+                continue
+            u = self.rng.random()
+            beta = (2 * u) ** (1 / (self.crossover_eta + 1)) if u <= 0.5 else (1 / (2 * (1 - u))) ** (1 / (self.crossover_eta + 1))
+            c1[i] = 0.5 * ((1 + beta) * p1[i] + (1 - beta) * p2[i])
+            c2[i] = 0.5 * ((1 - beta) * p1[i] + (1 + beta) * p2[i])
+        return np.clip(c1, 0.0, 1.0), np.clip(c2, 0.0, 1.0)
+
+    def mutate(self, u):
+        """
+        Polynomial mutation, one variable on average.
+        """
+        u = u.copy()
+        for i in range(len(u)):
+            if self.rng.random() > 1.0 / len(u):
+                continue
+            r = self.rng.random()
+            delta = (2 * r) ** (1 / (self.mutation_eta + 1)) - 1 if r < 0.5 else 1 - (2 * (1 - r)) ** (1 / (self.mutation_eta + 1))
+            u[i] = u[i] + delta
+        return np.clip(u, 0.0, 1.0)
+
+    def scale(self, X):
+        return (np.asarray(X, dtype=float) - self.lb) / (self.ub - self.lb)
+
+    def unscale(self, U):
+        # Strictly inside the bounds, which keep_feasible asks of every design
+        return self.lb + np.clip(U, 1e-9, 1 - 1e-9) * (self.ub - self.lb)
+
+    def optimize(self):
+        """
+        Evolve the population and return the non-dominated feasible designs.
+        :return: scipy OptimizeResult with the lowest TAC design of the front in x and fun (TAC in million USD),
+            as for the other methods, and the whole front in front_x, front_f and front
+        """
+        optimizer = self.optimizer
+        x0, constraints, bounds = optimizer.problem()
+        self.lb, self.ub = np.asarray(bounds.lb, dtype=float), np.asarray(bounds.ub, dtype=float)
+
+        sample = qmc.LatinHypercube(d=len(x0), seed=self.seed).random(self.population - 1)
+        U = np.vstack([self.scale(x0)[None, :], sample])
+        X = self.unscale(U)
+        F, V = self.evaluate(X)
+        rank, crowding = self.rank(F, V)
+        print ('{0:10s}   {1:>11s}   {2:>8s}   {3:>11s}   {4:>11s}'.format('Generation', 'Simulations', 'Feasible', 'Front size', 'Min TAC'))
+
+        for generation in range(self.generations + 1):
+            if generation > 0:
+                children = []
+                while len(children) < self.population:
+                    p1, p2 = self.tournament(rank, crowding), self.tournament(rank, crowding)
+                    for child in self.sbx(U[p1], U[p2]):
+                        children.append(self.mutate(child))
+                children = np.array(children[:self.population])
+                F_children, V_children = self.evaluate(self.unscale(children))
+                U, F, V = np.vstack([U, children]), np.vstack([F, F_children]), np.concatenate([V, V_children])
+                # A child equal to a parent or another child competes once
+                distinct = self.unique(U)
+                U, F, V = U[distinct], F[distinct], V[distinct]
+                rank, crowding = self.rank(F, V)
+                survivors = self.select(rank, crowding, self.population)
+                U, F, V = U[survivors], F[survivors], V[survivors]
+                rank, crowding = self.rank(F, V)
+            front = np.flatnonzero((rank == 0) & (V <= self.feasibility_tol))
+            TAC = [self.evaluations[tuple(float(v) for v in x)][2] for x in self.unscale(U[front])]
+            print ('{0:10d}   {1:11d}   {2:8d}   {3:11d}   {4:>11s}'.format(generation, self.simulations,
+                int(np.sum(V <= self.feasibility_tol)), len(front), "%.2f" % min(TAC) if TAC else "----"))
+
+        X = self.unscale(U)
+        front = np.flatnonzero((rank == 0) & (V <= self.feasibility_tol))
+        # Distinct designs of the front sorted by TAC, the lowest leaves the model in its state
+        front = front[np.isin(front, self.unique(U))]
+        entries = sorted(((self.evaluations[tuple(float(v) for v in X[i])], X[i]) for i in front), key=lambda entry: entry[0][2])
+        if entries:
+            x = entries[0][1]
+            optimizer.set_design(x)
+            optimizer.model.load_results(entries[0][0][3])
+        else:
+            x = X[np.argmin(V)]
+            optimizer.evaluator.restore(x)
+        main = optimizer.model.main_component
+        return opt.OptimizeResult(
+            x = x,
+            fun = optimizer.model.TAC / 1000000,
+            success = bool(entries),
+            status = 0 if entries else 1,
+            message = "%d non-dominated feasible designs" % len(entries) if entries else "No feasible design found",
+            nfev = self.simulations,
+            nit = self.generations,
+            objectives = self.objectives,
+            front_x = np.array([entry[1] for entry in entries]),
+            front_f = np.array([entry[0][0] for entry in entries]),
+            front = [dict(x=entry[1], TAC=entry[0][2], energy_cost=entry[0][3]["energy_cost"],
+                purity=entry[0][3]["purity"][main], recovery=entry[0][3]["recovery"][main]) for entry in entries],
+            failures = self.failures,
+        )
@@ -0,0 +1,239 @@
+"""
+Pool of simulator worker processes.
+
+Each worker owns a model.Model opened on its own copy of the case file (Aspen
+locks the archive it has open) and evaluates designs sent to it: a dict of
+Model attributes to set before Model.run(). SimulatorPool.evaluate spreads a
+batch over the workers and returns the results in order. Workers that die or
+stop answering are replaced and their design resubmitted.
+
+Scripts creating a pool must guard their entry point with
+if __name__ == "__main__": as workers are spawned processes on Windows.
+"""
+import os
+import time
+import pickle
+import shutil
+import tempfile
+import collections
+import multiprocessing
+import multiprocessing.connection
+import model as m
+
+# Model settings copied from a model to the workers of SimulatorPool.from_model
+SETTINGS = ("main_component", "hydraulics", "P_cond", "P_drop_1", "P_drop_2", "RR", "distilate_rate", "N", "feed_stage",
+    "tray_spacing", "tray_type", "num_pass", "tray_eff_1", "tray_eff_2", "n_years", "backend", "warm_start", "warm_start_step")
+
+class WorkerError(RuntimeError):
+    """
+    A worker process died or timed out while evaluating a design.
+    """
+
+def portable(e):
+    """
+    Exception e as sent back by a worker: e itself when it survives pickling,
+    so the pool raises the same type, a RuntimeError naming its type otherwise.
+    """
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return RuntimeError("%s: %s" % (type(e).__name__, e))
+
+def worker_main(conn, filepath, settings):
+    model = m.Model(filepath, **settings)
+    conn.send(("ready", os.getpid()))
+    while True:
+        message, payload = conn.recv()
+        if message == "close":
+            break
+        elif message == "ping":
+            conn.send(("pong", None))
+        elif message == "run":
+            try:
+                for name, value in payload.items():
+                    setattr(model, name, value)
+                runtime = model.run()
+                conn.send(("ok", (model.export_results(), runtime)))
+            except Exception as e:
+                conn.send(("error", portable(e)))
+    model.close()
+    conn.close()
+
+class Worker:
+    def __init__(self, filepath, settings, directory, context):
+        # Private copy of the case, opened by this worker only
+        self.filepath = os.path.join(directory, os.path.basename(filepath))
+        shutil.copy(filepath, self.filepath)
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child, self.filepath, settings), daemon=True)
+        self.process.start()
+        child.close()
+        self.job = None
+        self.started = None
+
+    def wait_ready(self, timeout):
+        if not self.conn.poll(timeout):
+            raise WorkerError("Worker did not start in %.0f seconds" % timeout)
+        message, payload = self.conn.recv()
+        if message != "ready":
+            raise WorkerError("Worker failed to start: %s" % payload)
+
+    def submit(self, job, design):
+        self.job = job
+        self.started = time.time()
+        self.conn.send(("run", design))
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self, timeout=5.0):
+        try:
+            self.conn.send(("close", None))
+        except (OSError, EOFError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+class WorkerPool:
+    """
+    Worker processes, each with its own copy of the case, started and replaced
+    together. SimulatorPool and scheduler.Scheduler dispatch designs to them.
+    """
+    prefix = "pool-"
+
+    def __init__(self, filepath: str, workers: int = None, timeout: float = None, startup_timeout: float = 300.0, \
+        retries: int = 1, **settings):
+        """
+        :param filepath: path to the model file
+        :param workers: number of worker processes, default one per CPU
+        :param timeout: seconds a single evaluation may take before its worker is replaced, None for no limit
+        :param retries: number of times a design is resubmitted after its worker died
+        :param settings: keyword arguments of model.Model for the workers
+        """
+        self.filepath = filepath
+        self.size = workers if workers is not None else os.cpu_count()
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.retries = retries
+        self.settings = settings
+        self.directory = tempfile.mkdtemp(prefix=self.prefix)
+        self.context = multiprocessing.get_context()
+        self.stats = collections.Counter()
+        self.workers = [self.spawn(i) for i in range(self.size)]
+        for worker in self.workers:
+            worker.wait_ready(self.startup_timeout)
+
+    @classmethod
+    def from_model(cls, model, workers: int = None, **kwargs):
+        """
+        Pool whose workers start with the settings of model.
+        """
+        settings = dict((name, getattr(model, name)) for name in SETTINGS)
+        return cls(model.filepath, workers, **dict(settings, **kwargs))
+
+    def spawn(self, i):
+        directory = os.path.join(self.directory, str(i))
+        os.makedirs(directory, exist_ok=True)
+        return Worker(self.filepath, self.settings, directory, self.context)
+
+    def respawn(self, i):
+        self.workers[i].stop(timeout=0)
+        self.workers[i] = self.spawn(i)
+        self.workers[i].wait_ready(self.startup_timeout)
+        self.stats["respawns"] += 1
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class SimulatorPool(WorkerPool):
+    """
+    Batches of designs spread over the workers, see evaluate.
+    """
+    def check(self, timeout: float = 10.0):
+        """
+        Ping every idle worker and replace those that do not answer.
+        :return: number of workers replaced
+        """
+        replaced = 0
+        for i, worker in enumerate(self.workers):
+            if worker.job is not None:
+                continue
+            try:
+                worker.conn.send(("ping", None))
+                healthy = worker.conn.poll(timeout) and worker.conn.recv()[0] == "pong"
+            except (OSError, EOFError):
+                healthy = False
+            if not healthy:
+                self.respawn(i)
+                replaced += 1
+        return replaced
+
+    def evaluate(self, designs):
+        """
+        Evaluate a batch of designs concurrently.
+        :param designs: list of dicts of Model attributes
+        :return: list, in the order of designs, of (results, runtime) tuples, or
+            exceptions for designs that failed (as raised by the worker, see portable) or lost their worker (WorkerError)
+        """
+        pending = collections.deque(range(len(designs)))
+        attempts = collections.Counter()
+        output = [None] * len(designs)
+        remaining = len(designs)
+        while remaining:
+            for i, worker in enumerate(self.workers):
+                if worker.job is None and pending:
+                    job = pending.popleft()
+                    try:
+                        worker.submit(job, designs[job])
+                    except (OSError, EOFError):
+                        remaining -= self.lost(i, job, attempts, pending, output, "Worker died")
+            busy = dict((worker.conn, i) for i, worker in enumerate(self.workers) if worker.job is not None)
+            ready = multiprocessing.connection.wait(list(busy), timeout=self.timeout if self.timeout is not None else 1.0)
+            for conn in ready:
+                i = busy[conn]
+                worker = self.workers[i]
+                job = worker.job
+                try:
+                    message, payload = conn.recv()
+                except (OSError, EOFError):
+                    remaining -= self.lost(i, job, attempts, pending, output, "Worker died")
+                    continue
+                worker.job = None
+                output[job] = payload
+                self.stats["evaluations"] += 1
+                self.stats["failures"] += message != "ok"
+                remaining -= 1
+            # Workers that died without closing their pipe or overran the timeout
+            for i, worker in enumerate(self.workers):
+                job = worker.job
+                if job is None:
+                    continue
+                timed_out = self.timeout is not None and time.time() - worker.started > self.timeout
+                if timed_out or not worker.alive():
+                    self.stats["timeouts"] += timed_out
+                    remaining -= self.lost(i, job, attempts, pending, output, "Evaluation timed out" if timed_out else "Worker died")
+        return output
+
+    def lost(self, i, job, attempts, pending, output, reason):
+        # Replace the worker and resubmit its design, or give up on the design
+        # Returns the number of designs finished (given up)
+        self.respawn(i)
+        attempts[job] += 1
+        if attempts[job] > self.retries:
+            output[job] = WorkerError("%s evaluating design %d" % (reason, job))
+            self.stats["failures"] += 1
+            return 1
+        pending.appendleft(job)
+        return 0
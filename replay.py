@@ -0,0 +1,284 @@
+"""
+Record and replay simulator sessions.
+
+RecordingBackend wraps another backend and captures every node read, write and
+Run2 of the documents it opens. Reads are filed under the inputs written so far
+(the input state) of the run they follow, and saved to a gzipped pickle when the
+document is closed. ReplayBackend serves a recording from memory, looking runs
+up by input state, so model.Model, the optimizer constraints and calc_tac can be
+run and profiled on realistic results with no simulator at all:
+
+    model = m.Model("Simulation 1.bkp", backend=replay.RecordingBackend("aspen", "sim1.replay"))
+    ... evaluate designs, model.close()
+    model = m.Model("Simulation 1.bkp", backend=replay.ReplayBackend("sim1.replay"))
+    ... evaluate the same designs, in any order
+
+Values below Input nodes follow the writes made during replay; everything else
+must have been read after a recorded run with the same input state. Both
+backends have start() and load(), so sessions.SessionManager can lease their
+engines, a recording engine holding the runs of a single case.
+"""
+import os
+import gzip
+import time
+import pickle
+import simulator
+
+VERSION = 1
+
+class ReplayMiss(LookupError):
+    """
+    The recording has no value for a node, or no run for the current inputs.
+    """
+
+def join(path, name):
+    return path + "\\" + name.strip("\\")
+
+def is_input(path):
+    return "\\Input\\" in path or path.endswith("\\Input")
+
+def facts():
+    return dict(values=dict(), children=dict(), attributes=dict(), missing=set(), run_time=None)
+
+class Recording:
+    """
+    Node reads of a case: those made before the first run or below Input
+    nodes (base), and those made after each run, keyed by input state.
+    """
+    def __init__(self, case=None):
+        self.case = case
+        self.base = facts()
+        self.runs = dict()
+        self.begin()
+
+    def begin(self):
+        # A new document starts from the archive
+        self.writes = dict()
+        self.current = None
+
+    def key(self):
+        return tuple(sorted(self.writes.items(), key=lambda item: item[0]))
+
+    def scope(self, path):
+        return self.base if self.current is None or is_input(path) else self.current
+
+    @classmethod
+    def load(cls, filepath):
+        with gzip.open(filepath, "rb") as f:
+            data = pickle.load(f)
+        if data["version"] != VERSION:
+            raise ValueError("%s is a version %s recording, expected %d" % (filepath, data["version"], VERSION))
+        recording = cls(data["case"])
+        recording.base, recording.runs = data["base"], data["runs"]
+        return recording
+
+    def save(self, filepath):
+        with gzip.open(filepath, "wb") as f:
+            pickle.dump(dict(version=VERSION, case=self.case, base=self.base, runs=self.runs), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+class RecordingNode:
+    def __init__(self, node, path, recording):
+        self._node = node
+        self._path = path
+        self._recording = recording
+
+    def FindNode(self, path):
+        node = self._node.FindNode(path)
+        full = join(self._path, path)
+        if node is None:
+            self._recording.scope(full)["missing"].add(full)
+            return None
+        return RecordingNode(node, full, self._recording)
+
+    @property
+    def Name(self):
+        return self._node.Name
+
+    @property
+    def Value(self):
+        value = self._node.Value
+        if self._path not in self._recording.writes:
+            self._recording.scope(self._path)["values"].setdefault(self._path, value)
+        return value
+
+    @Value.setter
+    def Value(self, value):
+        self._node.Value = value
+        self._recording.writes[self._path] = value
+
+    @property
+    def Elements(self):
+        elements = list(self._node.Elements)
+        names = [node.Name for node in elements]
+        self._recording.scope(self._path)["children"].setdefault(self._path, names)
+        return [RecordingNode(node, join(self._path, name), self._recording) for node, name in zip(elements, names)]
+
+    def AttributeValue(self, attribute):
+        value = self._node.AttributeValue(attribute)
+        self._recording.scope(self._path)["attributes"].setdefault((self._path, attribute), value)
+        return value
+
+class RecordingDocument:
+    def __init__(self, obj, recording, filepath):
+        self.obj = obj
+        self.recording = recording
+        self.filepath = filepath
+        self.Tree = RecordingNode(obj.Tree, "", recording)
+        recording.begin()
+
+    def Reinit(self):
+        self.obj.Reinit()
+
+    def Run2(self):
+        start = time.perf_counter()
+        self.obj.Run2()
+        run_time = time.perf_counter() - start
+        self.recording.current = self.recording.runs.setdefault(self.recording.key(), facts())
+        self.recording.current["run_time"] = run_time
+
+    def save(self):
+        self.recording.save(self.filepath)
+
+    def Close(self):
+        self.save()
+        self.obj.Close()
+
+class RecordingBackend:
+    """
+    Backend recording the documents of another backend to a file. Runs are
+    added to the recording already in the file, if any.
+    """
+    def __init__(self, backend, filepath: str):
+        """
+        :param backend: backend to record, "aspen", "mesh" or a simulator backend instance
+        :param filepath: recording file
+        """
+        self.backend = simulator.get_backend(backend)
+        self.name = self.backend.name
+        self.filepath = filepath
+
+    def recording(self, filepath=None):
+        if os.path.exists(self.filepath):
+            return Recording.load(self.filepath)
+        return Recording(os.path.basename(filepath) if filepath is not None else None)
+
+    def open(self, filepath):
+        return RecordingDocument(self.backend.open(filepath), self.recording(filepath), self.filepath)
+
+    def start(self, visible=False):
+        """
+        Start an engine of the recorded backend, recording once a case is loaded.
+        """
+        return RecordingDocument(self.backend.start(visible), self.recording(), self.filepath)
+
+    def load(self, obj, filepath):
+        """
+        Load a case into a started recording engine, from its archive. A recording holds a single case.
+        """
+        case = os.path.basename(filepath)
+        if obj.recording.case is None:
+            obj.recording.case = case
+        elif obj.recording.case != case:
+            raise ValueError("%s records %s, not %s" % (self.filepath, obj.recording.case, case))
+        self.backend.load(obj.obj, filepath)
+        obj.Tree = RecordingNode(obj.obj.Tree, "", obj.recording)
+        obj.recording.begin()
+
+class ReplayNode:
+    def __init__(self, document, path, name=None):
+        self._document = document
+        self._path = path
+        self.Name = name if name is not None else path.rsplit("\\", 1)[-1]
+
+    def FindNode(self, path):
+        full = join(self._path, path)
+        if full in self._document.scope(full)["missing"]:
+            return None
+        return ReplayNode(self._document, full)
+
+    @property
+    def Value(self):
+        return self._document.value(self._path)
+
+    @Value.setter
+    def Value(self, value):
+        self._document.writes[self._path] = value
+
+    @property
+    def Elements(self):
+        return [ReplayNode(self._document, join(self._path, name), name) for name in self._document.children(self._path)]
+
+    def AttributeValue(self, attribute):
+        attributes = self._document.scope(self._path)["attributes"]
+        if (self._path, attribute) in attributes:
+            return attributes[(self._path, attribute)]
+        raise ReplayMiss("No recorded attribute %d of %s" % (attribute, self._path))
+
+class ReplayDocument:
+    def __init__(self, recording):
+        self.recording = recording
+        self.writes = dict()
+        self.current = None
+        self.Tree = ReplayNode(self, "", "Root")
+        self.Visible = 0
+        self.SuppressDialogs = 1
+
+    def scope(self, path):
+        return self.recording.base if self.current is None or is_input(path) else self.current
+
+    def value(self, path):
+        if path in self.writes:
+            return self.writes[path]
+        values = self.scope(path)["values"]
+        if path not in values:
+            raise ReplayMiss("No recorded value of %s" % path)
+        return values[path]
+
+    def children(self, path):
+        recorded = self.scope(path)["children"].get(path)
+        if is_input(path):
+            # Entries written during replay, e.g. new pressure drop sections
+            names = list(recorded or [])
+            for written in self.writes:
+                name = written[len(path) + 1:]
+                if written.startswith(path + "\\") and "\\" not in name and name not in names:
+                    names.append(name)
+            return names
+        if recorded is None:
+            raise ReplayMiss("No recorded elements of %s" % path)
+        return recorded
+
+    def Reinit(self):
+        pass
+
+    def Run2(self):
+        key = tuple(sorted(self.writes.items(), key=lambda item: item[0]))
+        if key not in self.recording.runs:
+            raise ReplayMiss("No recorded run for the current inputs")
+        self.current = self.recording.runs[key]
+
+    def InitFromArchive2(self, filepath):
+        self.writes = dict()
+        self.current = None
+
+    def Close(self):
+        pass
+
+class ReplayBackend:
+    """
+    Backend serving a recording, no simulator needed.
+    """
+    name = "replay"
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.recording = Recording.load(filepath)
+
+    def open(self, filepath):
+        return ReplayDocument(self.recording)
+
+    def start(self, visible=False):
+        return ReplayDocument(self.recording)
+
+    def load(self, obj, filepath):
+        obj.InitFromArchive2(filepath)
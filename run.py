@@ -1,6 +1,7 @@
 import os
 import model as m
 import optimize as opt
+import cache
 
 model = m.Model ( 
     filepath = os.path.join(os.getcwd(), 'Simulation 3.bkp'), 
@@ -14,14 +15,23 @@ model = m.Model (
     feed_stage = 51,
     P_cond = 1.013,
     main_component = "BENZENE",
-    hydraulics = True
+    hydraulics = True,
+    # Backend: aspen, mesh (built-in equilibrium-stage model, no Aspen needed)
+    backend = "aspen",
+    # Start each run from the last converged column when the inputs moved little
+    warm_start = False
 )
 
 model.run()
 print (model.TAC)
 
+# Cache results next to the case file and reuse them in later runs. Entries are
+# pickled: only enable it on cache files written by your own runs (see cache.py)
+persistent_cache = False
+
 # Optimize
-optimizer = opt.Optimizer(model, opt_tolerance=1e-3, recoveryLB=0.95, purityLB=0.95)
+optimizer = opt.Optimizer(model, opt_tolerance=1e-3, recoveryLB=0.95, purityLB=0.95,
+    cache=cache.EvaluationCache(cache.default_path(model.filepath)) if persistent_cache else None)
 print (optimizer.run())
 
 # model.obj.Close()
\ No newline at end of file
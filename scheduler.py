@@ -0,0 +1,160 @@
+"""
+Asyncio scheduler of design evaluations on simulator worker processes.
+
+Model.run() blocks in Run2 until the simulator returns, which a hung or
+slowly diverging run may never do. The Scheduler runs every evaluation in a
+pool.Worker process and awaits its answer with a deadline: a run that
+overruns it is abandoned, its worker killed and replaced, and the evaluation
+fails with SimulationTimeout while the other jobs go on. Cancelling the task
+awaiting an evaluation replaces its worker the same way. At most one job runs
+per worker; the others wait in line for a free one.
+
+The scheduler runs its own event loop in a thread of its own, shared by every
+caller: coroutines of any loop and synchronous code of any thread, such as
+the starts of multistart.MultiStart, submit to the same workers. A running
+evaluation is waited for by a thread blocked on the worker pipe and process,
+so that the loop wakes up when the worker answers or dies, without polling.
+
+    scheduler = scheduler.Scheduler.from_model(model, workers=4, timeout=600)
+    results, runtime = await scheduler.submit(design)             # from a coroutine
+    evaluations = scheduler.evaluate([design, ...])              # from synchronous code
+    optimizer = optimize.Optimizer(model, pool=scheduler)        # as a SimulatorPool
+
+Scripts creating a scheduler must guard their entry point with
+if __name__ == "__main__": as workers are spawned processes on Windows.
+"""
+import asyncio
+import itertools
+import threading
+import concurrent.futures
+import multiprocessing.connection
+import pool
+
+class SimulationTimeout(pool.WorkerError):
+    """
+    An evaluation did not finish before its deadline.
+    """
+
+class Scheduler(pool.WorkerPool):
+    prefix = "scheduler-"
+
+    def __init__(self, filepath: str, workers: int = None, timeout: float = None, startup_timeout: float = 300.0, \
+        retries: int = 1, **settings):
+        """
+        :param filepath: path to the model file
+        :param workers: number of worker processes, the most evaluations run at once; default one per CPU
+        :param timeout: default seconds an evaluation may take, None for no limit
+        :param retries: number of times a design is resubmitted after its worker died; designs that time out are not
+        :param settings: keyword arguments of model.Model for the workers
+        """
+        super().__init__(filepath, workers, timeout, startup_timeout, retries, **settings)
+        self.jobs = itertools.count()
+        self.replacing = set()
+        # Idle workers, bound to the scheduler loop when it first uses them
+        self.idle = asyncio.Queue()
+        for i in range(self.size):
+            self.idle.put_nowait(i)
+        # Threads waiting for the running workers, one per worker
+        self.waiters = concurrent.futures.ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="scheduler-wait")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="scheduler-loop", daemon=True)
+        self.thread.start()
+
+    async def replace(self, i):
+        # Kill the worker and start another one, off the event loop
+        self.workers[i].stop(timeout=0)
+        def start():
+            worker = self.spawn(i)
+            worker.wait_ready(self.startup_timeout)
+            return worker
+        self.workers[i] = await self.loop.run_in_executor(None, start)
+        self.stats["respawns"] += 1
+        self.idle.put_nowait(i)
+
+    def replace_later(self, i):
+        task = self.loop.create_task(self.replace(i))
+        self.replacing.add(task)
+        task.add_done_callback(self.replacing.discard)
+
+    async def receive(self, worker, timeout):
+        # Wait in a waiter thread until the worker answers, dies or overruns timeout
+        ready = await self.loop.run_in_executor(self.waiters, multiprocessing.connection.wait,
+            [worker.conn, worker.process.sentinel], timeout)
+        if worker.conn in ready:
+            return worker.conn.recv()
+        if ready:
+            raise EOFError("Worker died")
+        raise SimulationTimeout("Evaluation did not finish in %.1f seconds" % timeout)
+
+    async def run(self, design, timeout):
+        # Evaluation of design on the scheduler loop, see submit
+        timeout = timeout if timeout is not None else self.timeout
+        job = next(self.jobs)
+        for attempt in range(self.retries + 1):
+            i = await self.idle.get()
+            worker = self.workers[i]
+            try:
+                worker.submit(job, design)
+                message, payload = await self.receive(worker, timeout)
+            except asyncio.CancelledError:
+                self.stats["cancelled"] += 1
+                self.replace_later(i)
+                raise
+            except SimulationTimeout:
+                self.stats["timeouts"] += 1
+                self.stats["failures"] += 1
+                await self.replace(i)
+                raise
+            except (OSError, EOFError):
+                await self.replace(i)
+                continue
+            worker.job = None
+            self.idle.put_nowait(i)
+            self.stats["evaluations"] += 1
+            if message != "ok":
+                self.stats["failures"] += 1
+                raise payload
+            return payload
+        self.stats["failures"] += 1
+        raise pool.WorkerError("Worker died evaluating design %d" % job)
+
+    async def run_all(self, designs, timeout):
+        return await asyncio.gather(*[self.run(design, timeout) for design in designs], return_exceptions=True)
+
+    async def submit(self, design, timeout: float = None):
+        """
+        Evaluate a design on the first free worker.
+        :param design: dict of Model attributes
+        :param timeout: seconds the evaluation may take, the scheduler timeout by default
+        :return: (results, runtime) of the run
+        :raises Exception: the simulation failed, as raised in the worker (see pool.portable)
+        :raises SimulationTimeout: the deadline passed, the worker has been replaced
+        :raises pool.WorkerError: the worker died more often than retries allows
+        """
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.run(design, timeout), self.loop))
+
+    async def map(self, designs, timeout: float = None):
+        """
+        Evaluate designs concurrently.
+        :return: list, in the order of designs, of (results, runtime) tuples or exceptions
+        """
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.run_all(designs, timeout), self.loop))
+
+    def evaluate(self, designs, timeout: float = None):
+        """
+        Synchronous map, interchangeable with pool.SimulatorPool.evaluate and
+        safe to call from several threads at once.
+        """
+        return asyncio.run_coroutine_threadsafe(self.run_all(designs, timeout), self.loop).result()
+
+    async def drain(self):
+        # Wait for the workers being replaced
+        await asyncio.gather(*self.replacing, return_exceptions=True)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.drain(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        super().close()
+        self.waiters.shutdown()
+        self.loop.close()
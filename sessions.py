@@ -0,0 +1,124 @@
+"""
+Simulator sessions shared by model.Model instances.
+
+Starting an engine (Dispatch of "Apwn.Document" with Aspen) costs much more
+than loading a case into a running one. A SessionManager keeps headless engine
+instances alive and leases them to models, loading the model's archive into a
+free session instead of starting a new engine for every case:
+
+    with sessions.SessionManager("aspen") as manager:
+        for case in cases:
+            model = m.Model(case, sessions=manager)
+            model.run()
+            model.close() # returns the session to the manager
+        print(manager.report())
+"""
+import time
+import collections
+import simulator
+
+class Session:
+    """
+    A running engine and the case last loaded into it.
+    """
+    def __init__(self, backend, visible):
+        start = time.perf_counter()
+        self.document = backend.start(visible)
+        self.startup_time = time.perf_counter() - start
+        self.filepath = None
+        self.leased = False
+
+class Lease:
+    """
+    Use of a session by one model, until released.
+    """
+    def __init__(self, manager, session):
+        self.manager = manager
+        self.session = session
+
+    @property
+    def document(self):
+        if self.session is None:
+            raise RuntimeError("Lease has been released")
+        return self.session.document
+
+    def release(self):
+        if self.session is not None:
+            self.manager.release(self.session)
+            self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+class SessionManager:
+    def __init__(self, backend="aspen", size: int = None, visible: bool = False):
+        """
+        :param backend: simulator backend, "aspen", "mesh" or a simulator backend instance
+        :param size: largest number of sessions, None for no limit
+        :param visible: show the engine user interface
+        """
+        self.backend = simulator.get_backend(backend)
+        self.size = size
+        self.visible = visible
+        self.sessions = []
+        self.stats = collections.Counter()
+
+    def acquire(self, filepath: str):
+        """
+        Lease a session with the case at filepath loaded, freshly from the
+        archive. Idle sessions are reused, a new one is started when all are leased.
+        """
+        session = next((s for s in self.sessions if not s.leased), None)
+        if session is None:
+            if self.size is not None and len(self.sessions) >= self.size:
+                raise RuntimeError("All %d simulator sessions are leased" % self.size)
+            session = Session(self.backend, self.visible)
+            self.sessions.append(session)
+            self.stats["starts"] += 1
+            self.stats["startup_time"] += session.startup_time
+        else:
+            self.stats["reuses"] += 1
+
+        start = time.perf_counter()
+        self.backend.load(session.document, filepath)
+        self.stats["loads"] += 1
+        self.stats["load_time"] += time.perf_counter() - start
+        session.filepath = filepath
+        session.leased = True
+        self.stats["leases"] += 1
+        return Lease(self, session)
+
+    def release(self, session):
+        session.leased = False
+
+    def report(self):
+        """
+        Engine startup cost against the cost of loading cases into running sessions.
+        """
+        starts, loads = self.stats["starts"], self.stats["loads"]
+        return dict(
+            sessions = len(self.sessions),
+            leases = self.stats["leases"],
+            starts = starts,
+            reuses = self.stats["reuses"],
+            startup_time = self.stats["startup_time"] / starts if starts else 0.0,
+            load_time = self.stats["load_time"] / loads if loads else 0.0,
+            saved_time = self.stats["reuses"] * (self.stats["startup_time"] / starts if starts else 0.0),
+        )
+
+    def close(self):
+        """
+        Shut down every session, leased or not.
+        """
+        for session in self.sessions:
+            session.document.Close()
+        self.sessions = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
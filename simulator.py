@@ -0,0 +1,137 @@
+"""
+Simulator backends behind model.Model.
+
+A backend opens a case file and returns a document exposing the subset of the
+Aspen Plus "Apwn.Document" automation interface used by model.Model:
+Tree.FindNode(path) (nodes with Name, Value, Elements and AttributeValue),
+Reinit(), Run2() and Close(). start() and load() split open() into starting the
+engine and loading a case into it, so an engine can be reused (see sessions.py).
+"""
+import collections
+import mesh
+
+class AspenBackend:
+    """
+    Aspen Plus through COM automation (Windows only).
+    """
+    name = "aspen"
+
+    def open(self, filepath):
+        import win32com.client as win32
+        obj = win32.Dispatch("Apwn.Document")
+        obj.InitFromArchive2(filepath)
+        obj.Visible = 1
+        obj.SuppressDialogs = 1
+        return obj
+
+    def start(self, visible=False):
+        """
+        Start a new engine instance with no case loaded, headless by default.
+        """
+        import win32com.client as win32
+        obj = win32.DispatchEx("Apwn.Document")
+        obj.Visible = int(visible)
+        obj.SuppressDialogs = 1
+        return obj
+
+    def load(self, obj, filepath):
+        """
+        Load a case into a started engine, replacing the one loaded before.
+        """
+        obj.InitFromArchive2(filepath)
+
+class MeshBackend:
+    """
+    Built-in equilibrium-stage column model (mesh.MeshDocument), runs anywhere.
+    """
+    name = "mesh"
+
+    def open(self, filepath):
+        return mesh.MeshDocument(filepath)
+
+    def start(self, visible=False):
+        return mesh.MeshDocument()
+
+    def load(self, obj, filepath):
+        obj.InitFromArchive2(filepath)
+
+BACKENDS = {
+    "aspen": AspenBackend,
+    "mesh": MeshBackend,
+}
+
+def get_backend(backend):
+    """
+    :param backend: name of a registered backend or a backend instance
+    """
+    if not isinstance(backend, str):
+        return backend
+    if backend not in BACKENDS:
+        raise AssertionError("Backend must be one of %s" % ", ".join(BACKENDS))
+    return BACKENDS[backend]()
+
+class CountingNode:
+    """
+    Tree node wrapper that counts every automation call made through it.
+    """
+    def __init__(self, node, calls):
+        self._node = node
+        self._calls = calls
+
+    def FindNode(self, path):
+        self._calls["FindNode"] += 1
+        node = self._node.FindNode(path)
+        return None if node is None else CountingNode(node, self._calls)
+
+    @property
+    def Name(self):
+        self._calls["Name"] += 1
+        return self._node.Name
+
+    @property
+    def Value(self):
+        self._calls["Value"] += 1
+        return self._node.Value
+
+    @Value.setter
+    def Value(self, value):
+        self._calls["Value"] += 1
+        self._node.Value = value
+
+    @property
+    def Elements(self):
+        # One call for the collection and one per element fetched from it
+        elements = list(self._node.Elements)
+        self._calls["Elements"] += 1 + len(elements)
+        return [CountingNode(node, self._calls) for node in elements]
+
+    def AttributeValue(self, attribute):
+        self._calls["AttributeValue"] += 1
+        return self._node.AttributeValue(attribute)
+
+class CountingDocument:
+    """
+    Document wrapper counting the automation calls made by model.Model. With
+    Aspen each of these is a cross-process COM round-trip.
+    """
+    def __init__(self, obj, calls=None):
+        """
+        :param calls: Counter the calls are added to, a new one by default
+        """
+        self.obj = obj
+        self.calls = calls if calls is not None else collections.Counter()
+        self.Tree = CountingNode(obj.Tree, self.calls)
+
+    def Reinit(self):
+        self.calls["Reinit"] += 1
+        self.obj.Reinit()
+
+    def Run2(self):
+        self.calls["Run2"] += 1
+        self.obj.Run2()
+
+    def Close(self):
+        self.obj.Close()
+
+    def total(self):
+        return sum(self.calls.values())
@@ -0,0 +1,42 @@
+"""
+Bulk readers for simulator output subtrees.
+
+model.Model.getLeafs resolves every node from its full path, one Tree.FindNode
+round-trip per node plus a child check. These readers resolve the root of a
+subtree once and walk it through the node handles, returning dense arrays.
+"""
+import numpy as np
+
+def read_leaves(node):
+    """
+    Names and values of the leaves directly below node.
+    """
+    names, values = [], []
+    for child in node.Elements:
+        names.append(child.Name)
+        values.append(child.Value)
+    return names, values
+
+def read_vector(node):
+    """
+    Read a one level subtree (e.g. stage profile) into an array.
+    :return: list of element names, array of values
+    """
+    names, values = read_leaves(node)
+    return names, np.array(values, dtype=float)
+
+def read_matrix(node, columns):
+    """
+    Read a two level subtree (e.g. stage x component) into a dense array.
+    :param columns: names of the second level elements, in the column order wanted
+    :return: list of first level element names, array of values
+    """
+    index = dict((name, i) for i, name in enumerate(columns))
+    names, rows = [], []
+    for child in node.Elements:
+        row = np.zeros(len(columns))
+        for leaf in child.Elements:
+            row[index[leaf.Name]] = leaf.Value
+        names.append(child.Name)
+        rows.append(row)
+    return names, np.array(rows)
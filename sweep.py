@@ -0,0 +1,254 @@
+"""
+Design-space sweeps: TAC and feasibility maps over a full factorial grid or
+a Latin hypercube sample of model settings (RR, N, feed_stage, P_cond, ...).
+
+Points are ordered so that consecutive runs are close: variables are nested
+in the order given, N and feed_stage outermost as they change the column
+itself, and each dimension is walked back and forth (serpentine) instead of
+restarting at its lower end, so a warm started simulator moves one step at a
+time. Latin hypercube points are binned per dimension and walked the same way.
+
+With a pool the ordered points are split into one contiguous stretch per
+worker and submitted a batch of one point per worker at a time, so every
+worker keeps walking its own neighbourhood. Results are streamed to the output
+file as they arrive, a block of rows at a time: Parquet (row groups, needs
+pyarrow) when the file ends in .parquet, CSV otherwise. Rows carry the costing
+inputs, so a map can be re-priced with costing.tac without simulating again.
+
+    with pool.SimulatorPool.from_model(model, workers=4, warm_start=True) as workers:
+        sweep.Sweep(model, dict(RR=np.linspace(1, 3, 20), N=range(20, 61, 5), feed_stage=range(5, 40, 5)),
+            pool=workers).run("map.parquet")
+"""
+import io
+import csv
+import itertools
+import contextlib
+import collections
+import numpy as np
+import scipy.stats.qmc as qmc
+import model as m
+import optimize
+import failures
+import costing
+
+# Settings taking integer values
+INTEGERS = ("N", "feed_stage", "num_pass")
+# Settings that change the column itself, varied least often
+OUTER = ("N", "feed_stage")
+OUTPUTS = ("TAC", "energy_cost", "Q_cond", "Q_reb", "diameter", "height", "iterations", "T_cond_in", "T_cond_out", "T_reb_in", "T_reb_out")
+
+class CsvWriter:
+    def __init__(self, filepath, columns):
+        self.f = open(filepath, "w", newline="")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(columns)
+        self.columns = columns
+
+    def write(self, rows):
+        self.writer.writerows([[row[name] for name in self.columns] for row in rows])
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+class ParquetWriter:
+    def __init__(self, filepath, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        types = dict(index=pa.int64(), status=pa.string(), error=pa.string(), feasible=pa.bool_())
+        self.schema = pa.schema([(name, types.get(name, pa.float64())) for name in columns])
+        self.writer = pq.ParquetWriter(filepath, self.schema)
+
+    def write(self, rows):
+        columns = dict((field.name, [row[field.name] for row in rows]) for field in self.schema)
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+class Sweep:
+    def __init__(self, model: m.Model, variables: dict, method: str = "grid", points: int = None, seed: int = 0, \
+            pool = None, purityLB: float = 0.95, recoveryLB: float = 0.95, feasibility_tol: float = 1e-6, block: int = 256):
+        """
+        :param model: model, already run, whose other settings every point keeps
+        :param variables: dict of model setting -> values for "grid", (low, high) for "lhs"
+        :param method: "grid" for the full factorial design, "lhs" for a Latin hypercube sample
+        :param points: number of points of the "lhs" sample
+        :param seed: seed of the Latin hypercube sample
+        :param pool: pool.SimulatorPool or scheduler.Scheduler running the points, None to run them on model
+        :param purityLB: purity lower bound of the optimizer constraints the feasibility is checked against
+        :param recoveryLB: recovery lower bound, idem
+        :param feasibility_tol: largest violation of a constraint at a feasible point
+        :param block: rows written to the output file at a time
+        """
+        if method not in ("grid", "lhs"):
+            raise ValueError("Unknown sweep method %s" % method)
+        if method == "lhs" and points is None:
+            raise ValueError("A Latin hypercube sweep needs a number of points")
+        self.model = model
+        # Outer variables first, the others in the order given
+        self.names = [name for name in OUTER if name in variables] + [name for name in variables if name not in OUTER]
+        self.variables = variables
+        self.method = method
+        self.points = points
+        self.seed = seed
+        self.pool = pool
+        self.feasibility_tol = feasibility_tol
+        self.block = block
+        self.optimizer = optimize.Optimizer(model, purityLB=purityLB, recoveryLB=recoveryLB)
+        self.stats = collections.Counter()
+
+    def design_points(self):
+        """
+        Points of the sweep, unordered, as an array with a column per variable.
+        """
+        if self.method == "grid":
+            return np.array(list(itertools.product(*[np.asarray(self.variables[name], dtype=float) for name in self.names])))
+        sample = qmc.LatinHypercube(d=len(self.names), seed=self.seed).random(self.points)
+        low = np.array([self.variables[name][0] for name in self.names], dtype=float)
+        high = np.array([self.variables[name][1] for name in self.names], dtype=float)
+        points = low + (high - low) * sample
+        for j, name in enumerate(self.names):
+            if name in INTEGERS:
+                points[:, j] = np.round(points[:, j])
+        return points
+
+    def order(self, points):
+        """
+        Serpentine order of points: sorted on their bin in each variable, the
+        direction of a variable reversed whenever the bins of the variables
+        outside it sum to an odd number.
+        """
+        if len(points) < 2:
+            return np.arange(len(points))
+        if self.method == "grid":
+            bins = np.column_stack([np.unique(points[:, j], return_inverse=True)[1] for j in range(points.shape[1])])
+        else:
+            n = max(2, int(round(len(points) ** (1.0 / points.shape[1]))))
+            low, high = points.min(axis=0), points.max(axis=0)
+            u = (points - low) / np.where(high > low, high - low, 1.0)
+            bins = np.minimum((u * n).astype(int), n - 1)
+        keys = bins.copy()
+        top = bins.max(axis=0)
+        for j in range(1, bins.shape[1]):
+            odd = bins[:, :j].sum(axis=1) % 2 == 1
+            keys[odd, j] = top[j] - bins[odd, j]
+        if self.method == "lhs":
+            # Within the innermost bin, by the innermost variable itself
+            inner = np.where(keys[:, -1] == bins[:, -1], points[:, -1], -points[:, -1])
+            return np.lexsort((inner,) + tuple(keys[:, j] for j in reversed(range(keys.shape[1]))))
+        return np.lexsort(tuple(keys[:, j] for j in reversed(range(keys.shape[1]))))
+
+    def design(self, point):
+        # Model attributes of a point, with the distillate rate set by the optimizer
+        design = dict(distilate_rate=self.model.distilate_rate)
+        for name, value in zip(self.names, point):
+            design[name] = int(value) if name in INTEGERS else float(value)
+        return design
+
+    def valid(self, design):
+        N = design.get("N", self.model.N)
+        feed_stage = design.get("feed_stage", self.model.feed_stage)
+        return 2 <= feed_stage < N
+
+    def batches(self, order):
+        # Lists of point indices run at once: a point of each worker's stretch
+        if self.pool is None:
+            for i in order:
+                yield [i]
+            return
+        stretches = np.array_split(order, self.pool.size)
+        for k in range(max(len(stretch) for stretch in stretches)):
+            yield [stretch[k] for stretch in stretches if k < len(stretch)]
+
+    def row(self, index, design, status, error=None, runtime=None):
+        # Output row of a point, the model holding its results when status is "ok"
+        row = collections.OrderedDict(index=int(index))
+        for name in self.names:
+            row[name] = design[name]
+        row["status"] = status
+        row["error"] = error
+        row["runtime"] = runtime
+        if status == "ok":
+            temperatures = costing.inputs(dict(Q_cond=self.model.Q_cond, Q_reb=self.model.Q_reb, T_stage=self.model.T_stage, diameter=self.model.diameter))
+            for name in OUTPUTS:
+                row[name] = float(temperatures[name] if name in temperatures else getattr(self.model, name))
+            row["purity"] = float(self.model.purity[self.model.main_component])
+            row["recovery"] = float(self.model.recovery[self.model.main_component])
+            constraints = self.optimizer.constraint_values(None)
+            row.update(constraints)
+            row["feasible"] = all(value >= -self.feasibility_tol for value in constraints.values())
+        else:
+            for name in OUTPUTS + ("purity", "recovery") + self.constraint_names:
+                row[name] = None
+            row["feasible"] = False
+        return row
+
+    def evaluate(self, batch, points):
+        # Rows of a batch of points, run on the pool or on the model
+        designs = dict((i, self.design(points[i])) for i in batch)
+        valid = [i for i in batch if self.valid(designs[i])]
+        if self.pool is not None:
+            evaluations = dict(zip(valid, self.pool.evaluate([designs[i] for i in valid])))
+        rows = []
+        for i in batch:
+            design = designs[i]
+            if i not in valid:
+                self.stats["invalid"] += 1
+                rows.append(self.row(i, design, "invalid", "feed_stage must be between 2 and N - 1"))
+                continue
+            for name, value in design.items():
+                setattr(self.model, name, value)
+            try:
+                if self.pool is not None:
+                    if isinstance(evaluations[i], Exception):
+                        raise evaluations[i]
+                    results, runtime = evaluations[i]
+                    self.model.load_results(results)
+                else:
+                    runtime = self.model.run()
+                self.stats["simulations"] += 1
+                rows.append(self.row(i, design, "ok", runtime=runtime))
+            except Exception as e:
+                self.stats["failures"] += 1
+                self.stats["failures_" + failures.classify(e)] += 1
+                rows.append(self.row(i, design, "error", str(e)))
+        return rows
+
+    def run(self, filepath: str):
+        """
+        Run every point of the sweep, writing a row per point to filepath as the results come in.
+        :return: dict with the number of points, simulations, failures, invalid and feasible points,
+            and the row of the best feasible point (None if there is none)
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            x0, constraints, bounds = self.optimizer.problem()
+        self.constraint_names = tuple(self.optimizer.constraint_names())
+        columns = ["index"] + self.names + ["status", "error", "runtime"] + list(OUTPUTS) + ["purity", "recovery"] + \
+            list(self.constraint_names) + ["feasible"]
+        writer = ParquetWriter(filepath, columns) if filepath.endswith(".parquet") else CsvWriter(filepath, columns)
+
+        settings = dict((name, getattr(self.model, name)) for name in set(self.names) | {"distilate_rate"})
+        points = self.design_points()
+        order = self.order(points)
+        rows, best, feasible = [], None, 0
+        try:
+            for batch in self.batches(order):
+                for row in self.evaluate(batch, points):
+                    if row["feasible"]:
+                        feasible += 1
+                        if best is None or row["TAC"] < best["TAC"]:
+                            best = row
+                    rows.append(row)
+                if len(rows) >= self.block:
+                    writer.write(rows)
+                    rows = []
+            if rows:
+                writer.write(rows)
+        finally:
+            writer.close()
+            for name, value in settings.items():
+                setattr(self.model, name, value)
+        return dict(points=len(points), simulations=self.stats["simulations"], failures=self.stats["failures"],
+            invalid=self.stats["invalid"], feasible=feasible, best=best)
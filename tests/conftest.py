@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+@pytest.fixture
+def model():
+    """
+    Simulation 1 on the mesh backend, N=40, run once.
+    """
+    model = benchmark.load_model("Simulation 1.bkp", N=40, feed_stage=20)
+    model.run()
+    yield model
+    model.close()
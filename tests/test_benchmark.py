@@ -0,0 +1,14 @@
+import benchmark
+
+def test_slsqp_reaches_target_with_hydraulics():
+    N = benchmark.case_stages("Simulation 1.bkp")
+    result = benchmark.time_to_tac("Simulation 1.bkp", hydraulics=True, N=N, feed_stage=benchmark.FEED_STAGE)
+    assert result["converged"]
+    assert result["simulations_to_target"] is not None and result["simulations_to_target"] <= result["simulations"]
+
+def test_compare():
+    baseline = dict(cases={"A": dict(run=dict(evaluations_per_second=100.0, seconds=1.0, converged=True, TAC=5.0))})
+    current = dict(cases={"A": dict(run=dict(evaluations_per_second=80.0, seconds=0.5, converged=False, TAC=5.1))})
+    changes = dict((metric, regression) for case, name, metric, old, new, change, regression in benchmark.compare(baseline, current))
+    # Fewer evaluations per second is worse, less time better; booleans and small changes are not reported
+    assert changes == dict(evaluations_per_second=True, seconds=False)
@@ -0,0 +1,14 @@
+import pytest
+import benchmark
+import bkp
+
+@pytest.mark.parametrize("case", benchmark.CASES)
+def test_read_case(case):
+    setup = bkp.read_case(benchmark.case_path(case))
+    assert len(setup["components"]) >= 2
+    assert len(setup["feed_flow"]) == len(setup["components"])
+    assert sum(setup["feed_flow"]) > 0
+    assert set(setup["dbnames"]) == set(setup["components"])
+    assert 2 <= setup["feed_stage"] < setup["N"]
+    assert setup["P_cond"] > 0 and setup["feed_P"] > 0
+    assert setup["tray_type"] in ("SIEVE", "CAPS")
@@ -0,0 +1,29 @@
+import cache
+
+def test_round_trip(model, tmp_path):
+    filepath = str(tmp_path / "cache.sqlite")
+    evaluations = cache.EvaluationCache(filepath)
+    key = evaluations.key(model)
+    assert evaluations.get(key) is None
+    evaluations.put(key, model.export_results())
+    assert evaluations.get(key)["TAC"] == model.TAC
+    assert evaluations.stats["memory_hits"] == 1 and evaluations.stats["misses"] == 1
+
+    # Round-off below the resolution hits, a finite difference step misses
+    RR = model.RR
+    model.RR = RR + 1e-13
+    assert evaluations.key(model) == key
+    model.RR = RR + 1.4901161193847656e-08
+    assert evaluations.get(evaluations.key(model)) is None
+    model.RR = RR
+
+    # A new cache on the same file starts from its on-disk tier
+    reopened = cache.EvaluationCache(filepath)
+    assert reopened.get(reopened.key(model))["TAC"] == model.TAC
+    assert reopened.stats["disk_hits"] == 1
+
+def test_key_covers_main_component(model):
+    evaluations = cache.EvaluationCache()
+    key = evaluations.key(model)
+    model.main_component = model.components[1]
+    assert evaluations.key(model) != key
@@ -0,0 +1,54 @@
+import contextlib
+import io
+import numpy as np
+import pytest
+import cache
+import checkpoint
+import optimize
+
+class Crash(Exception):
+    pass
+
+def optimizer(model, path):
+    return optimize.Optimizer(model, opt_tolerance=1e-3, purityLB=0.95, recoveryLB=0.95,
+        cache=cache.EvaluationCache(), checkpoint=checkpoint.Checkpoint(str(path)))
+
+def test_resume_after_crash(model, tmp_path):
+    path = tmp_path / "run.ckpt"
+    first = optimizer(model, path)
+    callback = first.callback
+    def crashing(x):
+        callback(x)
+        if first.opt_iter == 2:
+            raise Crash()
+    first.callback = crashing
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(Crash):
+        first.optimize()
+    state = checkpoint.Checkpoint(str(path)).load()
+    assert not state["finished"] and state["opt_iter"] == 2
+
+    second = optimizer(model, path)
+    second.func_iter = 7
+    second.checkpoint.restore(second)
+    assert (second.opt_iter, second.func_iter) == (2, state["func_iter"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = second.optimize(resume=True)
+    assert result.nit > 0
+    assert second.opt_iter > 2 and second.run_id == first.run_id
+    # The checkpointed iterate comes back from the saved cache entries
+    assert second.cache.stats["memory_hits"] >= 1
+
+def test_finished_run_is_not_optimized_again(model, tmp_path):
+    path = tmp_path / "run.ckpt"
+    first = optimizer(model, path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = first.optimize()
+    second = optimizer(model, path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        resumed = second.optimize(resume=True)
+    np.testing.assert_array_equal(resumed.x, result.x)
+    assert resumed.fun == result.fun and resumed.nit == result.nit
+    assert second.opt_iter == first.opt_iter
+    assert second.evaluator.stats["simulations"] == 1
+    with pytest.raises(ValueError):
+        second.run("integer", resume=True)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import conversions
+import costing
+
+def baseline_tac(design, n_years=3):
+    # Model.calc_tac before costing.py, on a dict of its inputs
+    t_in_hot_cond, t_out_cold_cond, t_out_hot_cond, t_in_cold_cond = design["T_cond_in"], 35.0, design["T_cond_out"], 25.0
+    t_in_cold_reb, t_out_cold_reb = design["T_reb_in"], design["T_reb_out"]
+    if t_in_cold_reb > 160.0 - 10.0:
+        steam, t_in_hot_reb, t_out_hot_reb = "hp", 254.0, 253.0
+    else:
+        steam, t_in_hot_reb, t_out_hot_reb = "lp", 160.0, 159.0
+    del_t_mean_cond = (0.5 * (t_in_hot_cond - t_out_cold_cond) * (t_out_hot_cond - t_in_cold_cond) * (t_in_hot_cond - t_out_cold_cond + t_out_hot_cond - t_in_cold_cond)) ** (1./3)
+    del_t_mean_reb = (0.5 * (t_in_hot_reb - t_out_cold_reb) * (t_out_hot_reb - t_in_cold_reb) * (t_in_hot_reb - t_out_cold_reb + t_out_hot_reb - t_in_cold_reb)) ** (1./3)
+    A_cond = abs(conversions.calPerSec_to_kJPerSec(design["Q_cond"]))/(0.852 * del_t_mean_cond)
+    A_reb = abs(conversions.calPerSec_to_kJPerSec(design["Q_reb"]))/(0.568 * del_t_mean_reb)
+    N, diameter, efficiency = design["N"], design["diameter"], design["tray_eff_1"] + design["tray_eff_2"]
+    height = 1.2 * design["tray_spacing"] * N * 0.5 * efficiency
+    C_cap_hx = 7296 * (A_cond ** 0.65) + 7296 * (A_reb ** 0.65)
+    C_cap_col = 17640 * (diameter ** 1.066) * (height ** 0.802)
+    if design["tray_type"] == "SIEVE":
+        C_cap_tray = 130 + 440 * (diameter ** (1.8)) * N * 0.5 * efficiency
+    else:
+        C_cap_tray = 340 + 640 * (diameter ** (1.9)) * N * 0.5 * efficiency
+    energy_cost = 0.354 * conversions.calPerSec_to_GJPerYear(abs(design["Q_cond"]))
+    energy_cost += (9.88 if steam == "hp" else 7.78) * conversions.calPerSec_to_GJPerYear(abs(design["Q_reb"]))
+    return ((C_cap_hx + C_cap_col + C_cap_tray) / n_years) + energy_cost
+
+def designs(model):
+    # The simulated design, with CAPS trays, and with a reboiler on high pressure steam
+    design = costing.inputs(model.export_results())
+    design.update(N=model.N, tray_spacing=model.tray_spacing, tray_eff_1=model.tray_eff_1, tray_eff_2=model.tray_eff_2, tray_type=model.tray_type)
+    return [design, dict(design, tray_type="CAPS"), dict(design, T_reb_in=155.0, T_reb_out=158.0)]
+
+def test_tac_matches_baseline(model):
+    for design in designs(model):
+        assert float(costing.tac(design)["TAC"]) == baseline_tac(design)
+    assert model.TAC == baseline_tac(designs(model)[0])
+
+def test_tac_arrays_match_baseline(model):
+    stored = designs(model)
+    costs = costing.tac(costing.designs(stored), **costing.scenarios(n_years=[3, 5]))
+    assert costs["TAC"].shape == (2, len(stored))
+    expected = [[baseline_tac(design, n_years) for design in stored] for n_years in (3, 5)]
+    np.testing.assert_allclose(costs["TAC"], expected, rtol=1e-12)
+
+def test_tac_rejects_unknown_tray_type(model):
+    with pytest.raises(ValueError):
+        costing.tac(dict(designs(model)[0], tray_type="VALVE"))
+
+def test_tac_crossed_temperatures_are_invalid(model):
+    costs = costing.tac(dict(designs(model)[0], T_cond_in=20.0, T_cond_out=19.0))
+    assert not costs["valid"] and np.isnan(costs["TAC"])
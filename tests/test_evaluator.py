@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import evaluator
+import optimize
+import simulator
+
+@pytest.fixture
+def optimizer(model):
+    optimizer = optimize.Optimizer(model, purityLB=0.95, recoveryLB=0.95)
+    optimizer.x0 = np.array(optimizer.problem()[0], dtype=float)
+    model.obj = simulator.CountingDocument(model.obj)
+    model.invalidate_nodes()
+    return optimizer
+
+def test_one_simulation_per_x(optimizer):
+    x0 = optimizer.x0
+    f = optimizer.evaluator.objective(x0)
+    c = optimizer.evaluator.constraints(x0)
+    assert optimizer.evaluator.objective(x0) == f
+    assert optimizer.model.obj.calls["Run2"] == 1
+    # A finite difference probe is simulated once, and its constraints are its own
+    x1 = x0.copy()
+    x1[3] += 1e-4
+    c1 = optimizer.evaluator.constraints(x1)
+    optimizer.evaluator.objective(x1)
+    assert optimizer.model.obj.calls["Run2"] == 2
+    assert c1[0] != c[0]
+    np.testing.assert_array_equal(optimizer.evaluator.constraints(x0), c)
+    assert optimizer.model.obj.calls["Run2"] == 2
+
+def test_failed_design_violates_every_constraint(optimizer, monkeypatch):
+    x0 = optimizer.x0
+    optimizer.evaluator.evaluate(x0)
+    def run():
+        raise RuntimeError("Column did not converge in 200 iterations")
+    monkeypatch.setattr(optimizer.model, "run", run)
+    x1 = x0.copy()
+    x1[3] += 1e-4
+    evaluation = optimizer.evaluator.evaluate(x1)
+    assert evaluation.failed and evaluation.results is None
+    assert list(evaluation.constraints) == optimizer.constraint_names()
+    assert np.all(evaluation.vector == evaluator.FAILED_CONSTRAINT)
+
+def test_constraint_errors(optimizer):
+    def broken(x):
+        return 1.0 / 0.0
+    optimizer.constraints[4]['fun'] = broken
+    evaluation = optimizer.evaluator.evaluate(optimizer.x0)
+    assert evaluation.failed and np.all(evaluation.vector == evaluator.FAILED_CONSTRAINT)
+    assert optimizer.evaluator.stats["constraint_failures"] == 1
+    # Errors that are not those of a bad simulation are raised
+    def bug(x):
+        return optimizer.model.no_such_result
+    optimizer.constraints[4]['fun'] = bug
+    x1 = optimizer.x0.copy()
+    x1[3] += 1e-4
+    with pytest.raises(AttributeError):
+        optimizer.evaluator.evaluate(x1)
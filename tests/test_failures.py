@@ -0,0 +1,30 @@
+import failures
+import pool
+
+def test_classify_pool_errors(model):
+    designs = [dict(RR="x"), dict(RR=3.0, distilate_rate=1e6), dict(RR=3.0, distilate_rate=50.0)]
+    with pool.SimulatorPool.from_model(model, workers=1) as workers:
+        evaluations = workers.evaluate(designs)
+    assert failures.classify(evaluations[0]) == "ValueError"
+    assert failures.classify(evaluations[1]) == "RuntimeError"
+    assert not isinstance(evaluations[2], Exception)
+
+def test_classify():
+    assert failures.classify(IndexError("list index out of range")) == "index"
+    assert failures.classify(RuntimeError("Column did not converge in 200 iterations")) == "convergence"
+    assert failures.classify(pool.portable(KeyError("x"))) == "KeyError"
+
+def test_index_finds_failures_within_radius():
+    index = failures.FailureIndex(radius=1e-3, scale=[10.0, 1.0], rebuild=2)
+    index.add([1.0, 0.5], "convergence", runtime=2.0, context=(40, 20))
+    assert index.find([1.005, 0.5005], (40, 20)) == "convergence"
+    assert index.find([1.02, 0.5], (40, 20)) is None
+    # Other stage numbers are another column
+    assert index.find([1.0, 0.5], (41, 20)) is None
+    # Found through the k-d tree once rebuilt
+    index.add([5.0, 0.1], "index", context=(40, 20))
+    assert index.find([5.0, 0.1], (40, 20)) == "index"
+    assert index.trees[(40, 20)][1] == 2
+    report = index.report()
+    assert report["failures"] == 2 and report["hits"] == 2 and report["misses"] == 2
+    assert report["classes"] == dict(convergence=1, index=1) and report["saved_time"] == 4.0
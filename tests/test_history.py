@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+import history
+import optimize
+
+def test_every_evaluation_is_recorded(model, tmp_path, monkeypatch):
+    store = history.History(str(tmp_path / "history.db"), batch_size=10)
+    optimizer = optimize.Optimizer(model, purityLB=0.95, recoveryLB=0.95, history=store)
+    x0 = np.array(optimizer.problem()[0], dtype=float)
+    evaluation = optimizer.evaluator.evaluate(x0)
+    TAC = model.TAC
+    def run():
+        raise RuntimeError("Column did not converge in 200 iterations")
+    monkeypatch.setattr(model, "run", run)
+    x1 = x0.copy()
+    x1[3] *= 1.01
+    optimizer.evaluator.evaluate(x1)
+    # Buffered until batch_size records or a read
+    assert len(store.buffer) == 2
+    frame = store.frame(run_id=optimizer.run_id)
+    assert list(frame["status"]) == ["ok", "error"] and list(frame["evaluation"]) == [0, 1]
+    assert frame["TAC"][0] == pytest.approx(TAC) and np.isnan(frame["TAC"][1])
+    assert "did not converge" in frame["error"][1]
+    assert frame["RR"][1] == pytest.approx(x1[3])
+    for name, value in evaluation.constraints.items():
+        assert frame[name][0] == pytest.approx(value)
+    assert list(store.runs()["run_id"]) == [optimizer.run_id]
+    store.close()
@@ -0,0 +1,83 @@
+import pytest
+import conversions
+import graph
+import hydraulics
+import optimize
+
+def baseline_sieve(model, section):
+    # Sieve tray checks of the func_* chains of the baseline Optimizer, for section "top" or "bottom"
+    h_w, hole_diameter, plate_thickness, frac_appr_flooding = 50, 5, 5, 0.8
+    def flows(section):
+        i = 0 if section == "top" else 1
+        L = model.RR * model.D[0] + (model.feed_flow_rate if i else 0.0)
+        return dict(
+            L = L,
+            max_liquid = L * model.molecular_weight_liquid[-i] / 3600,
+            density_liquid = conversions.gmCc_to_kgM3(model.density_liquid[-i]),
+            density_vapour = conversions.gmCc_to_kgM3(model.density_vapour[-2 * i]),
+            volume_flow_vapour = conversions.lMin_to_m3Sec(model.volume_flow_vapour[-2 * i]),
+        )
+    def flooding_vapour_velocity(s):
+        f_lv = (s["L"] / (model.D[0] * (1 + model.RR))) * ((s["density_vapour"] / s["density_liquid"]) ** (1./2))
+        return f_lv, graph.K1(f_lv, model.tray_spacing, model.tray_type) * (((s["density_liquid"] - s["density_vapour"]) / s["density_vapour"]) ** (1./2))
+    s = flows(section)
+    net_area = model.A_c - model.A_d
+    active_area = net_area - model.A_d
+    hole_area = 0.1 * active_area
+    h_ow_max = ((s["max_liquid"] / (s["density_liquid"] * model.weir_length)) ** (2./3)) * 1000
+    h_ow_min = ((0.7 * s["max_liquid"] / (s["density_liquid"] * model.weir_length)) ** (2./3)) * 1000
+    f_lv, u_flood = flooding_vapour_velocity(s)
+    net_area_required = max(flows(name)["volume_flow_vapour"] / (frac_appr_flooding * flooding_vapour_velocity(flows(name))[1]) for name in ["top", "bottom"])
+    percent_flooding = s["volume_flow_vapour"] / net_area_required / u_flood
+    orifice_coeff = graph.orifice(hole_area / active_area, plate_thickness / hole_diameter)
+    h_d = 51 * ((s["volume_flow_vapour"] / hole_area / orifice_coeff) ** 2) * (s["density_vapour"] / s["density_liquid"])
+    h_t = h_d + h_w + h_ow_max + 12500 / s["density_liquid"]
+    A_ap = (h_w - 10) * model.weir_length * (10 ** -3)
+    h_dc = 166 * ((s["max_liquid"] / (s["density_liquid"] * (model.A_d if model.A_d < A_ap else A_ap))) ** 2)
+    h_b = h_w + h_ow_max + h_t + h_dc
+    min_vapour_vel = (graph.K2(h_w + h_ow_min) - 0.9 * (25.4 - hole_diameter)) / (s["density_vapour"] ** (1./2))
+    return dict(
+        entrainmentCheck = frac_appr_flooding - percent_flooding,
+        entrainmentFracCheck = 0.1 - graph.frac(f_lv, percent_flooding, model.tray_type),
+        weepingCheck = (0.7 * s["volume_flow_vapour"] / hole_area - min_vapour_vel) / 5.0,
+        downcomerLiquidBackupCheck = 0.5 * (model.tray_spacing + (h_w / 1000)) - h_b / 1000,
+        downcomerResidenceTimeCheck = ((model.A_d * h_b * (10 ** -3) * s["density_liquid"]) / s["max_liquid"] - 3) / 100.0,
+    )
+
+def test_sieve_checks_match_baseline(model):
+    optimizer = optimize.Optimizer(model)
+    for section in ["top", "bottom"]:
+        for name, value in baseline_sieve(model, section).items():
+            assert getattr(optimizer, name)(section) == pytest.approx(value, rel=1e-12, abs=1e-15)
+
+def test_state_computed_once_per_model_state(model):
+    engine = hydraulics.HydraulicsEngine()
+    state = engine.evaluate(model)
+    assert engine.evaluate(model) is state
+    assert engine.stats["evaluations"] == 1 and engine.stats["hits"] == 1
+    # New results and a changed input both recompute it
+    model.version += 1
+    engine.evaluate(model)
+    model.tray_spacing += 0.01
+    engine.evaluate(model)
+    assert engine.stats["evaluations"] == 3
+
+@pytest.mark.parametrize("tray_type", ["SIEVE", "CAPS"])
+def test_stage_profile_matches_stage_loop(model, tray_type):
+    model.tray_type = tray_type
+    engine = hydraulics.HydraulicsEngine(stages=True)
+    state = engine.evaluate(model)
+    # The same correlations stage by stage, on scalars
+    shared = engine.shared(model)
+    flows = engine.stage_flows(model)
+    stages = [engine.section(model, dict((name, float(values[j])) for name, values in flows.items()), shared) for j in range(model.N - 1)]
+    net_area_required = max(h["volume_flow_vapour"] / h["u_n"] for h in stages)
+    margins = []
+    for j, h in enumerate(stages):
+        h["percent_flooding"] = h["volume_flow_vapour"] / net_area_required / h["flooding_vapour_velocity"]
+        assert state["percent_flooding"][j] == pytest.approx(h["percent_flooding"], rel=1e-12)
+        margins.append(engine.constraints(model, h))
+    for name in margins[0]:
+        top = min(c[name] for c in margins[:model.feed_stage - 1])
+        bottom = min(c[name] for c in margins[model.feed_stage - 1:])
+        assert state[name] == pytest.approx((top, bottom), rel=1e-12, abs=1e-15)
@@ -0,0 +1,19 @@
+import contextlib
+import io
+import integer
+import optimize
+
+def test_stage_search_ends_at_local_optimum(model):
+    optimizer = optimize.Optimizer(model, opt_tolerance=1e-2, purityLB=0.95, recoveryLB=0.95)
+    search = integer.StageSearch(optimizer, N=30, feed_stage=15, step=2, min_N=27, max_N=33, maxiter=3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = search.optimize()
+    best = search.solutions[(result.N, result.feed_stage)]
+    assert (model.N, model.feed_stage) == (result.N, result.feed_stage)
+    assert result.fun == best["fun"] and result.nit == len(search.solutions)
+    # No solved column within the last step beats it
+    for (N, feed_stage), solution in search.solutions.items():
+        if abs(N - result.N) <= 1 and abs(feed_stage - result.feed_stage) <= 1:
+            assert solution["merit"] >= best["merit"]
+    # The model is left at the optimum of the best column
+    assert model.TAC / 1000000 == best["fun"]
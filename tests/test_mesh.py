@@ -0,0 +1,24 @@
+import pytest
+import numpy as np
+import mesh
+
+def test_simulation_1_converges(model):
+    assert model.iterations < 200
+    # Material balance: the components recovered in the distillate make up its flow
+    distillate = sum(model.recovery[c] * model.mole_flow[c] for c in model.components)
+    assert abs(distillate - model.distilate_rate) < 1e-6 * model.distilate_rate
+    assert model.purity["BENZENE"] > 0.99
+    assert model.Q_cond < 0 < model.Q_reb
+    assert np.all(np.diff(model.T_stage) > 0)
+
+def test_simulation_1_is_repeatable(model):
+    T_stage, TAC = np.array(model.T_stage), model.TAC
+    model.run()
+    np.testing.assert_allclose(model.T_stage, T_stage, atol=1e-8)
+    assert abs(model.TAC - TAC) < 1e-6 * TAC
+
+def test_missing_components_are_named():
+    props = mesh.component_properties(["B", "TOLUENE"], dict(B="BENZENE"))
+    assert props["MW"][0] == mesh.COMPONENTS["BENZENE"][0]
+    with pytest.raises(ValueError, match="components WATER, ETHANOL in mesh.COMPONENTS"):
+        mesh.component_properties(["BENZENE", "WATER", "ETHANOL"])
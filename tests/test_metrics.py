@@ -0,0 +1,28 @@
+import json
+import numpy as np
+import benchmark
+import metrics
+import optimize
+
+def test_phases_and_export(tmp_path):
+    registry = metrics.Metrics(str(tmp_path / "run.json"))
+    model = benchmark.load_model("Simulation 1.bkp", N=40, feed_stage=20, metrics=registry)
+    model.run()
+    optimizer = optimize.Optimizer(model, purityLB=0.95, recoveryLB=0.95)
+    optimizer.evaluator.evaluate(np.array(optimizer.problem()[0], dtype=float))
+    model.close()
+    registry.export()
+    with open(registry.filepath) as f:
+        snapshot = json.load(f)
+    phases = snapshot["phases"]
+    for name in ["inputs", "reinit", "run2", "readback", "calc_tac"]:
+        assert phases[name]["calls"] == 2
+    assert phases["constraint.inputPresCheck"]["calls"] == 1
+    assert snapshot["com_calls"]["Run2"] == 2
+    assert snapshot["sources"]["evaluator"]["simulations"] == 1
+    text = registry.prometheus()
+    assert 'distillation_phase_calls_total{phase="run2"} 2' in text
+    assert 'distillation_com_calls_total{call="Run2"} 2' in text
+
+def test_no_registry_is_a_no_op():
+    assert metrics.phase(None, "run2") is metrics.phase(None, "readback")
@@ -0,0 +1,34 @@
+import simulator
+
+RR = "\\Data\\Blocks\\B1\\Input\\BASIS_RR"
+
+def counted(model):
+    model.obj = counter = simulator.CountingDocument(model.obj)
+    model.invalidate_nodes()
+    return counter
+
+def test_node_handles_are_reused(model):
+    counter = counted(model)
+    node = model.node(RR)
+    assert model.node(RR) is node and model.getValue(RR) == node.Value
+    assert counter.calls["FindNode"] == 1
+    # A new stage count renumbers the stage inputs: every handle is resolved again
+    model.setValue("\\Data\\Blocks\\B1\\Input\\NSTAGE", model.N + 1)
+    assert model.nodes == dict()
+    model.node(RR)
+    assert counter.calls["FindNode"] == 3
+
+def test_unchanged_inputs_are_not_written(model):
+    counter = counted(model)
+    model.pushed.clear()
+    model.simulate()
+    first = counter.calls["Value"]
+    counter.calls.clear()
+    model.simulate()
+    # Only the outputs are read back, no input is sent again
+    read_back = counter.calls["Value"]
+    assert read_back < first and model.pushed[RR] == model.RR
+    counter.calls.clear()
+    model.RR += 1e-8
+    model.simulate()
+    assert counter.calls["Value"] == read_back + 1
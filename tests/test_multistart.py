@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import benchmark
+import cache
+import multistart
+import scheduler
+import simulator
+
+def test_starts_share_the_scheduler(model):
+    model.obj = simulator.CountingDocument(model.obj)
+    with scheduler.Scheduler.from_model(model, workers=2) as workers:
+        with multistart.MultiStart(model, starts=3, pool=workers, opt_tolerance=1e-3, purityLB=0.95, recoveryLB=0.95, feasibility_tol=1e-3) as search:
+            result = search.run()
+        # Every simulation of every start ran on the scheduler workers, none on the model
+        assert workers.stats["evaluations"] == result.nfev
+        assert model.obj.calls["Run2"] == 0
+    assert [start["index"] for start in result.starts] == [0, 1, 2]
+    assert all(start["status"] in ("done", "cancelled") and start["iterations"] >= 1 for start in result.starts)
+    # None feasible at N=40: the best is the least violated
+    assert not result.success and result.maxcv == min(start["maxcv"] for start in result.starts)
+
+def test_best_feasible_start():
+    N = benchmark.case_stages("Simulation 1.bkp")
+    model = benchmark.load_model("Simulation 1.bkp", N=N, feed_stage=benchmark.FEED_STAGE, hydraulics=True)
+    model.run()
+    try:
+        with multistart.MultiStart(model, starts=3, workers=2, opt_tolerance=1e-3, purityLB=0.95, recoveryLB=0.95, feasibility_tol=1e-3) as search:
+            result = search.run()
+    finally:
+        model.close()
+    feasible = [start for start in result.starts if start["status"] == "done" and start["maxcv"] <= 1e-3]
+    assert result.success and feasible
+    best = min(feasible, key=lambda s: s["fun"])
+    assert result.start == best["index"] and result.fun == best["fun"]
+    assert np.array_equal(result.x, best["x"])
+
+def test_shared_options_are_rejected(model, tmp_path):
+    # An sqlite connection cannot be used from the thread of every start
+    shared = cache.EvaluationCache(str(tmp_path / "cache.db"))
+    with pytest.raises(ValueError, match="cache"):
+        multistart.MultiStart(model, cache=shared)
+    shared.close()
+
+def test_dominated_starts_are_cancelled(model):
+    # One start at a time: the later starts are compared with the best earlier one
+    with scheduler.Scheduler.from_model(model, workers=1) as workers:
+        with multistart.MultiStart(model, starts=3, pool=workers, margin=0.0, patience=1, feasibility_tol=100.0,
+                opt_tolerance=1e-3, purityLB=0.95, recoveryLB=0.95) as search:
+            result = search.run()
+    statuses = [start["status"] for start in result.starts]
+    assert statuses[0] == "done" and "cancelled" in statuses
+    for start in result.starts:
+        if start["status"] == "cancelled":
+            assert start["fun"] > result.starts[0]["fun"]
@@ -0,0 +1,41 @@
+import numpy as np
+import optimize
+import pareto
+
+def dominated(a, b):
+    # a is dominated by b
+    return np.all(b <= a) and np.any(b < a)
+
+def test_non_dominated_sort():
+    rng = np.random.default_rng(0)
+    F = rng.integers(0, 5, size=(40, 3)).astype(float)
+    fronts = pareto.non_dominated_sort(F)
+    assert sorted(i for front in fronts for i in front) == list(range(len(F)))
+    for k, front in enumerate(fronts):
+        later = [i for other in fronts[k:] for i in other]
+        for i in front:
+            # Not dominated by its own or later fronts, dominated by the front before
+            assert not any(dominated(F[i], F[j]) for j in later)
+            if k:
+                assert any(dominated(F[i], F[j]) for j in fronts[k - 1])
+    # Equal designs share a front
+    F[1] = F[0]
+    ranks = dict((i, k) for k, front in enumerate(pareto.non_dominated_sort(F)) for i in front)
+    assert ranks[0] == ranks[1]
+
+def test_crowding_distance():
+    F = np.array([[0.0, 4.0], [1.0, 2.0], [2.0, 1.5], [4.0, 0.0]])
+    distance = pareto.crowding_distance(F)
+    assert np.isinf(distance[[0, 3]]).all()
+    np.testing.assert_allclose(distance[1:3], [2.0 / 4 + 2.5 / 4, 3.0 / 4 + 2.0 / 4])
+
+def test_rank_and_unique(model):
+    search = pareto.ParetoSearch(optimize.Optimizer(model), feasibility_tol=1e-6)
+    F = np.array([[1.0, 1.0], [0.0, 2.0], [2.0, 2.0], [0.0, 0.0], [0.0, 0.0]])
+    V = np.array([0.0, 0.0, 0.0, 0.5, 0.1])
+    rank, crowding = search.rank(F, V)
+    # Feasible fronts first, the infeasible designs after them by violation
+    assert list(rank) == [0, 0, 1, 3, 2]
+    search.lb, search.ub = np.zeros(2), np.ones(2)
+    U = np.array([[0.2, 0.4], [0.5, 0.5], [0.2, 0.4], [0.5, 0.5 + 1e-12]])
+    assert list(search.unique(U)) == [0, 1, 3]
@@ -0,0 +1,24 @@
+import pytest
+import pool
+
+def test_evaluate_in_order(model):
+    D = model.distilate_rate
+    designs = [dict(RR="x", distilate_rate=D), dict(RR=3.0, distilate_rate=1e6), dict(RR=3.5, distilate_rate=D), dict(RR=3.0, distilate_rate=D)]
+    with pool.SimulatorPool.from_model(model, workers=2) as workers:
+        evaluations = workers.evaluate(designs)
+        assert workers.stats["evaluations"] == 4 and workers.stats["failures"] == 2
+    # Worker exceptions come back with their type
+    assert isinstance(evaluations[0], ValueError)
+    assert isinstance(evaluations[1], RuntimeError) and not isinstance(evaluations[1], pool.WorkerError)
+    TAC = model.TAC
+    results, runtime = evaluations[3]
+    assert results["TAC"] == pytest.approx(TAC, rel=1e-9)
+    assert evaluations[2][0]["TAC"] != results["TAC"]
+
+def test_portable():
+    class Local(Exception):
+        pass
+    error = KeyError("x")
+    assert pool.portable(error) is error
+    unpicklable = pool.portable(Local("y"))
+    assert type(unpicklable) is RuntimeError and "Local: y" in str(unpicklable)
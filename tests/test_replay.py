@@ -0,0 +1,22 @@
+import pytest
+import benchmark
+import replay
+
+def evaluate(backend, designs):
+    model = benchmark.load_model("Simulation 1.bkp", N=40, feed_stage=20, backend=backend)
+    TAC = []
+    for RR in designs:
+        model.RR = RR
+        model.run()
+        TAC.append(model.TAC)
+    model.close()
+    return TAC
+
+def test_replay_matches_recording(tmp_path):
+    path = str(tmp_path / "sim1.replay")
+    recorded = evaluate(replay.RecordingBackend("mesh", path), [3.0, 3.5, 4.0])
+    # Runs are looked up by input state, in any order
+    replayed = evaluate(replay.ReplayBackend(path), [4.0, 3.0, 3.5])
+    assert replayed == [recorded[2], recorded[0], recorded[1]]
+    with pytest.raises(replay.ReplayMiss):
+        evaluate(replay.ReplayBackend(path), [5.0])
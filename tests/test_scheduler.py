@@ -0,0 +1,50 @@
+import time
+import asyncio
+import functools
+import threading
+import pytest
+import scheduler
+
+# A design whose run hangs: the worker calls model.run() after setting it
+HANG = dict(run=functools.partial(time.sleep, 30))
+
+@pytest.fixture
+def workers(model):
+    with scheduler.Scheduler.from_model(model, workers=2) as workers:
+        yield workers
+
+def test_timeout_replaces_worker(workers, model):
+    design = dict(RR=model.RR, distilate_rate=model.distilate_rate)
+    start = time.time()
+    evaluations = workers.evaluate([HANG, design], timeout=0.5)
+    assert time.time() - start < 10
+    assert isinstance(evaluations[0], scheduler.SimulationTimeout)
+    assert evaluations[1][0]["TAC"] == pytest.approx(model.TAC, rel=1e-9)
+    assert workers.stats["timeouts"] == 1 and workers.stats["respawns"] == 1
+
+def test_cancel(workers, model):
+    design = dict(RR=model.RR, distilate_rate=model.distilate_rate)
+    async def main():
+        task = asyncio.ensure_future(workers.submit(HANG))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await workers.map([design, design])
+    evaluations = asyncio.run(main())
+    assert all(results["TAC"] == pytest.approx(model.TAC, rel=1e-9) for results, runtime in evaluations)
+    assert workers.stats["cancelled"] == 1
+
+def test_threads_share_workers(workers, model):
+    designs = [dict(RR=model.RR * (1 + 0.01 * i), distilate_rate=model.distilate_rate) for i in range(3)]
+    output = dict()
+    def evaluate(i):
+        output[i] = workers.evaluate(designs)
+    threads = [threading.Thread(target=evaluate, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert workers.stats["evaluations"] == 9
+    for i in range(3):
+        assert [results["TAC"] for results, runtime in output[i]] == [results["TAC"] for results, runtime in output[0]]
@@ -0,0 +1,28 @@
+import pytest
+import benchmark
+import model as m
+import sessions
+
+def test_sessions_are_reused_across_cases():
+    with sessions.SessionManager("mesh", size=1) as manager:
+        TAC = dict()
+        for case in ["Simulation 1.bkp", "Simulation 3.bkp", "Simulation 1.bkp"]:
+            model = m.Model(benchmark.case_path(case), sessions=manager, N=40, feed_stage=20, RR=3.0)
+            model.distilate_rate = 0.5 * model.getValue("\\Data\\Streams\\1\\Input\\TOTFLOW\\MIXED")
+            model.run()
+            TAC.setdefault(case, []).append(model.TAC)
+            # A second model needs a second session
+            with pytest.raises(RuntimeError):
+                manager.acquire(model.filepath)
+            model.close()
+        report = manager.report()
+    assert report["starts"] == 1 and report["reuses"] == 2 and report["leases"] == 3
+    # The case is loaded afresh: the last run is not started from the previous case
+    assert TAC["Simulation 1.bkp"][1] == pytest.approx(TAC["Simulation 1.bkp"][0], rel=1e-9)
+
+def test_released_lease_is_closed():
+    with sessions.SessionManager("mesh") as manager:
+        lease = manager.acquire(benchmark.case_path("Simulation 1.bkp"))
+        lease.release()
+        with pytest.raises(RuntimeError):
+            lease.document
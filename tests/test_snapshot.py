@@ -0,0 +1,28 @@
+import numpy as np
+import benchmark
+import simulator
+import snapshot
+
+BLOCK = "\\Data\\Blocks\\B1\\Output\\"
+
+def test_readers_match_getleafs(model):
+    tree = model.obj.Tree
+    leaves = model.getLeafs(BLOCK + "B_TEMP")
+    names, values = snapshot.read_vector(tree.FindNode(BLOCK + "B_TEMP"))
+    assert names == list(leaves)
+    np.testing.assert_array_equal(values, [leaves[name] for name in names])
+    leaves = model.getLeafs(BLOCK + "B_K")
+    stages, K = snapshot.read_matrix(tree.FindNode(BLOCK + "B_K"), model.components)
+    assert stages == list(leaves)
+    np.testing.assert_array_equal(K, [[leaves[stage][component] for component in model.components] for stage in stages])
+
+def test_fewer_calls_than_getleafs(model):
+    model.obj = counter = simulator.CountingDocument(model.obj)
+    model.invalidate_nodes()
+    benchmark.legacy_read_outputs(model)
+    legacy = dict(counter.calls)
+    counter.calls.clear()
+    model.read_outputs()
+    # One FindNode per subtree instead of one per node
+    assert 10 * counter.calls["FindNode"] < legacy["FindNode"]
+    assert counter.total() < sum(legacy.values())
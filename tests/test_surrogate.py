@@ -0,0 +1,13 @@
+import benchmark
+
+def test_fewer_simulations_to_target():
+    result = benchmark.surrogate_search("Simulation 1.bkp")
+    slsqp, search = result["slsqp"], result["surrogate"]
+    assert search["simulations"] <= 60
+    # The measured gain, see the surrogate module: 7 times fewer, the first surrogate design being the 6th simulation
+    assert search["to_target"] is not None and 7 * search["to_target"] <= slsqp["to_target"]
+
+def test_initial_designs_around_failed_x0():
+    # None of the designs next to the Case Study 2 estimate simulate
+    result = benchmark.surrogate_search("Case Study 2.bkp")
+    assert result["surrogate"]["merit"] < float("inf")
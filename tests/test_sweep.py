@@ -0,0 +1,39 @@
+import csv
+import numpy as np
+import sweep
+
+def test_grid_order_is_serpentine(model):
+    search = sweep.Sweep(model, dict(RR=[2.0, 2.5, 3.0], N=[20, 25, 30], feed_stage=[5, 10]))
+    points = search.design_points()
+    order = search.order(points)
+    assert sorted(order) == list(range(len(points)))
+    # One variable moves one grid step at a time, N and feed_stage least often
+    steps = dict((name, np.diff(np.unique(points[:, j])).min()) for j, name in enumerate(search.names))
+    for a, b in zip(order[:-1], order[1:]):
+        moved = [name for j, name in enumerate(search.names) if points[a, j] != points[b, j]]
+        assert len(moved) == 1 and abs(points[a] - points[b]).max() == steps[moved[0]]
+    assert search.names == ["N", "feed_stage", "RR"]
+    assert sum(points[a, 0] != points[b, 0] for a, b in zip(order[:-1], order[1:])) == 2
+
+def test_lhs_order_is_a_permutation(model):
+    search = sweep.Sweep(model, dict(RR=(2.0, 3.0), N=(20, 30)), method="lhs", points=25)
+    points = search.design_points()
+    assert sorted(search.order(points)) == list(range(25))
+    assert np.all(points[:, 0] == np.round(points[:, 0]))
+
+def test_csv_rows(model, tmp_path):
+    RR = model.RR
+    path = str(tmp_path / "map.csv")
+    summary = sweep.Sweep(model, dict(N=[30, 34], feed_stage=[15, 32], RR=[2.5, 3.0, 3.5]), block=4,
+        feasibility_tol=10.0).run(path)
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert summary["points"] == len(rows) == 12 and summary["invalid"] == 3
+    assert summary["simulations"] + summary["failures"] + summary["invalid"] == 12
+    assert sorted(int(row["index"]) for row in rows) == list(range(12))
+    invalid = [row for row in rows if row["status"] == "invalid"]
+    assert all(row["N"] == "30" and row["feed_stage"] == "32" for row in invalid)
+    feasible = [row for row in rows if row["feasible"] == "True"]
+    assert len(feasible) == summary["feasible"] == summary["simulations"]
+    assert summary["best"]["TAC"] == min(float(row["TAC"]) for row in feasible)
+    assert model.RR == RR
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import benchmark
+import simulator
+
+@pytest.fixture
+def warm():
+    model = benchmark.load_model("Simulation 1.bkp", N=40, feed_stage=20, warm_start=True)
+    model.run()
+    model.obj = simulator.CountingDocument(model.obj)
+    model.invalidate_nodes()
+    yield model
+    model.close()
+
+def test_nearby_design_skips_reinit(warm, model):
+    iterations = model.iterations
+    warm.RR = model.RR = model.RR * (1 + 1e-4)
+    warm.run()
+    model.run()
+    assert warm.warm and warm.obj.calls["Reinit"] == 0
+    assert warm.iterations < iterations
+    # Same column as a cold start, to the solver tolerance
+    np.testing.assert_allclose(warm.T_stage, model.T_stage, rtol=1e-6)
+    assert warm.TAC == pytest.approx(model.TAC, rel=1e-6)
+
+def test_distant_or_reshaped_design_reinits(warm):
+    warm.RR *= 1 + 10 * warm.warm_start_step
+    warm.run()
+    assert not warm.warm
+    warm.N += 1
+    warm.run()
+    assert not warm.warm and warm.obj.calls["Reinit"] == 2
+    assert warm.warm_start_summary()["cold"]["runs"] == 3